@@ -0,0 +1,207 @@
+"""JSONL ファイルの推論をまとめて判定し、結果を NDJSON で書き出す
+
+    python batch.py arguments.jsonl -o results.ndjson [--workers 4] [--unordered]
+
+入力の各行は {"id": ..., "premises": [...], "conclusion": "..."} の形の JSON。
+出力の各行には入力の行番号 "line" と "id" を付け、grading.grade_argument の結果を続ける。
+出力ファイルが既にある場合は、書き出し済みの行を飛ばして続きから処理する。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+import grading
+
+# ワーカーに1度に渡す行数
+CHUNK_SIZE = 64
+
+
+def grade_record(line_number: int, text: str, max_atoms: Optional[int] = None) -> Dict[str, Any]:
+    """入力の1行を判定し、出力する辞書を返す"""
+    result: Dict[str, Any] = {"line": line_number, "id": None}
+    try:
+        record = json.loads(text)
+    except json.JSONDecodeError as e:
+        result["error"] = f"JSON として読めません: {e}"
+        return result
+    if not isinstance(record, dict):
+        result["error"] = "推論はオブジェクトで指定してください"
+        return result
+    result["id"] = record.get("id")
+    premises = record.get("premises", [])
+    conclusion = record.get("conclusion")
+    if not isinstance(conclusion, str) or not isinstance(premises, list) \
+            or not all(isinstance(premise, str) for premise in premises):
+        result["error"] = "premises (文字列のリスト) と conclusion (文字列) が必要です"
+        return result
+    result.update(grading.grade_argument(premises, conclusion, max_atoms))
+    return result
+
+
+def grade_chunk(chunk: List[Tuple[int, str]], max_atoms: Optional[int]) -> List[str]:
+    """ワーカープロセスで複数の行を判定し、出力する行を返す"""
+    return [
+        json.dumps(grade_record(line_number, text, max_atoms), ensure_ascii=False)
+        for line_number, text in chunk
+    ]
+
+
+class DoneLines:
+    """書き出し済みの入力の行番号
+
+    行番号 mark までは書き出し済みか空行で、above は mark より後で書き出し済みの行番号。
+    入力の順に書き出した出力なら above は空のままで、判定が終わった順に書き出した出力でも
+    above に残るのは、前回ワーカーに渡していた途中の範囲の行だけになる。
+
+    Attributes:
+        mark: ここまでの行はすべて処理済み
+        above: mark より後の書き出し済みの行番号
+        count: 書き出し済みの件数
+    """
+    def __init__(self):
+        self.mark = 0
+        self.above: Set[int] = set()
+        self.count = 0
+
+    def __contains__(self, line_number: int) -> bool:
+        return line_number <= self.mark or line_number in self.above
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def iter_chunks(stream: TextIO, done: DoneLines) -> Iterator[List[Tuple[int, str]]]:
+    """入力を読みながら、未処理の行を CHUNK_SIZE 行ずつまとめて返す (空行は飛ばす)"""
+    chunk: List[Tuple[int, str]] = []
+    for line_number, text in enumerate(stream, start=1):
+        if not text.strip() or line_number in done:
+            continue
+        chunk.append((line_number, text))
+        if len(chunk) >= CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_done(path: str, input_path: str) -> DoneLines:
+    """書き出し済みの行番号を集める
+
+    出力の行番号を読みながら入力を先頭から1行ずつ進め、書き出し済みの行と空行が
+    続くところまでを mark にまとめる。
+    前回の処理が途中で止まって最後の行が書きかけの場合は、その行を切り詰める。
+    """
+    done = DoneLines()
+    if not os.path.exists(path):
+        return done
+    valid_size = 0
+    with open(path, "rb") as f, open(input_path, encoding="utf-8") as source:
+        # 入力の mark + 1 行目 (読んでいなければ None)
+        following: Optional[str] = None
+
+        def advance():
+            nonlocal following
+            while True:
+                if following is None:
+                    following = source.readline()
+                    if not following:
+                        following = None
+                        return
+                if done.mark + 1 in done.above:
+                    done.above.remove(done.mark + 1)
+                elif following.strip():
+                    return
+                done.mark += 1
+                following = None
+
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                line_number = int(json.loads(raw)["line"])
+            except (ValueError, KeyError, TypeError):
+                break
+            valid_size += len(raw)
+            if line_number in done:
+                continue
+            done.above.add(line_number)
+            done.count += 1
+            advance()
+    if valid_size != os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(valid_size)
+    return done
+
+
+def run(input_path: str, output_path: str, workers: int, ordered: bool = True,
+        max_atoms: Optional[int] = None) -> Tuple[int, int, float]:
+    """入力ファイルの推論を判定して出力ファイルに追記する
+
+    メモリに持つのはワーカーに渡している途中の行だけ (workers * 2 チャンク) である。
+
+    Returns:
+        (今回判定した件数, 書き出し済みで飛ばした件数, 経過秒数)
+    """
+    done = load_done(output_path, input_path)
+    start = time.perf_counter()
+    count = 0
+    window = workers * 2
+    with open(input_path, encoding="utf-8") as source, \
+            open(output_path, "a", encoding="utf-8") as sink, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Deque[Future] = deque()
+
+        def write(lines: List[str]):
+            nonlocal count
+            sink.write("".join(line + "\n" for line in lines))
+            sink.flush()
+            count += len(lines)
+
+        for chunk in iter_chunks(source, done):
+            pending.append(pool.submit(grade_chunk, chunk, max_atoms))
+            if len(pending) < window:
+                continue
+            if ordered:
+                # 入力の順に書き出すため、先頭のチャンクが終わるまで待つ
+                write(pending.popleft().result())
+            else:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pending.remove(future)
+                    write(future.result())
+
+        while pending:
+            if ordered:
+                write(pending.popleft().result())
+            else:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pending.remove(future)
+                    write(future.result())
+    return count, len(done), time.perf_counter() - start
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="推論を1行に1件ずつ書いた JSONL ファイル")
+    parser.add_argument("-o", "--output", required=True, help="結果を追記する NDJSON ファイル")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="ワーカープロセスの数")
+    parser.add_argument("--unordered", action="store_true", help="入力の順ではなく判定が終わった順に書き出す")
+    parser.add_argument("--max-atoms", type=int, default=None, help="推論1件あたりの文記号の数の上限")
+    args = parser.parse_args(argv)
+
+    count, skipped, elapsed = run(
+        args.input, args.output, max(1, args.workers), not args.unordered, args.max_atoms
+    )
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"{count} records in {elapsed:.2f}s ({rate:.1f} records/sec), "
+          f"{skipped} already written", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
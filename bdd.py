@@ -0,0 +1,292 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import tree
+
+# 既約順序付き二分決定グラフ (ROBDD)
+#
+# 節点は整数の番号で表し、0 が偽、1 が真の終端節点である。
+# 内部節点は (変数の位置, 偽の枝, 真の枝) の組で、一意表により同じ組の節点は
+# 1つしか作らない。そのため同じ論理関数は必ず同じ番号になり、
+# 記号文の同値性は番号の比較、妥当性は「真の終端節点かどうか」で判定できる。
+#
+# 演算はすべて ITE (if-then-else) で行い、ITE の結果は計算表にキャッシュする。
+# ITE の再帰の深さは変数の数で抑えられる (記号文の深さにはよらない)。
+
+FALSE = 0
+TRUE = 1
+
+# 計算表に保持する ITE の結果の数 (超えたら計算表を空にする)
+CACHE_SIZE = 1 << 18
+# 既定の節点数の上限
+MAX_NODES = 1 << 21
+
+
+def order_atoms(nodes: Sequence[tree.Node], method: str = "connectivity") -> List[str]:
+    """BDD の変数順を決める
+
+    Args:
+        nodes: 変数順を決めるための記号文の木
+        method: "first" なら記号文を左から読んで最初に現れた順、
+                "connectivity" なら同じ小さな部分記号文に一緒に現れる原子文を
+                隣り合わせに並べる (最初に現れた原子文から始め、既に並べた原子文との
+                結び付きが最も強い原子文を順に追加する)
+
+    Returns:
+        変数順に並べた原子文
+    """
+    first: List[str] = []
+    seen = set()
+    for root in nodes:
+        # 行きがけ順に左から読む
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, tree.Atom):
+                if node.value not in seen:
+                    seen.add(node.value)
+                    first.append(node.value)
+            elif isinstance(node, tree.Operator):
+                stack.extend(reversed(node.args))
+    if method == "first":
+        return first
+    if method != "connectivity":
+        raise ValueError(f"未知の変数順の決め方です: {method}")
+
+    # 2つの原子文を含む部分記号文ごとに、その原子文の数が少ないほど強く結び付ける
+    weights: Dict[str, Dict[str, float]] = {atom: {} for atom in first}
+    done: set = set()
+    for root in nodes:
+        for node in tree.postorder(root, done):
+            done.add(node)
+            if not isinstance(node, tree.Operator) or not 1 < len(node.atoms) <= 8:
+                continue
+            weight = 1.0 / len(node.atoms)
+            for a in node.atoms:
+                for b in node.atoms:
+                    if a != b:
+                        weights[a][b] = weights[a].get(b, 0.0) + weight
+    rank = {atom: idx for idx, atom in enumerate(first)}
+    order = first[:1]
+    score = dict(weights[first[0]]) if first else {}
+    remaining = set(first[1:])
+    while remaining:
+        # 結び付きが同じなら最初に現れた順
+        atom = min(remaining, key=lambda a: (-score.get(a, 0.0), rank[a]))
+        remaining.remove(atom)
+        order.append(atom)
+        for other, weight in weights[atom].items():
+            score[other] = score.get(other, 0.0) + weight
+    return order
+
+
+class BDD:
+    """変数順を固定した BDD の節点を管理する
+
+    Args:
+        order: 変数順に並べた原子文 (後から add_atom で末尾に追加できる)
+        max_nodes: 節点数の上限。超えると MemoryError を送出する
+        cache_size: ITE の計算表に保持する結果の数
+    """
+    def __init__(self, order: Sequence[str] = (), max_nodes: int = MAX_NODES, cache_size: int = CACHE_SIZE):
+        self.order: List[str] = []
+        self.levels: Dict[str, int] = {}
+        self.max_nodes = max_nodes
+        self.cache_size = cache_size
+        # 節点の番号 -> 変数の位置・偽の枝・真の枝 (終端節点の位置は変数の数より大きいとみなす)
+        self._level: List[int] = [-1, -1]
+        self._low: List[int] = [FALSE, TRUE]
+        self._high: List[int] = [FALSE, TRUE]
+        self._unique: Dict[Tuple[int, int, int], int] = {}
+        self._cache: Dict[Tuple[int, int, int], int] = {}
+        # 記号文の部分木 -> 節点
+        self._built: Dict[tree.Node, int] = {}
+        for atom in order:
+            self.add_atom(atom)
+
+    def __len__(self) -> int:
+        """終端節点を含む節点の数"""
+        return len(self._level)
+
+    def add_atom(self, atom: str) -> int:
+        """原子文を変数順の末尾に追加し、その位置を返す (既にあればその位置)"""
+        if atom not in self.levels:
+            self.levels[atom] = len(self.order)
+            self.order.append(atom)
+        return self.levels[atom]
+
+    def _top(self, f: int) -> int:
+        level = self._level[f]
+        return level if level >= 0 else len(self.order)
+
+    def _make(self, level: int, low: int, high: int) -> int:
+        """一意表を引いて節点を作る (両方の枝が同じなら節点を作らない)"""
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self._unique.get(key)
+        if node is None:
+            if len(self._level) >= self.max_nodes:
+                raise MemoryError(f"BDD の節点数が上限 ({self.max_nodes}) を超えました")
+            node = len(self._level)
+            self._level.append(level)
+            self._low.append(low)
+            self._high.append(high)
+            self._unique[key] = node
+        return node
+
+    def var(self, atom: str) -> int:
+        """原子文そのものを表す節点"""
+        return self._make(self.add_atom(atom), FALSE, TRUE)
+
+    def ite(self, f: int, g: int, h: int) -> int:
+        """if f then g else h を表す節点"""
+        # 終端の場合
+        if f == TRUE:
+            return g
+        if f == FALSE:
+            return h
+        if g == h:
+            return g
+        if g == TRUE and h == FALSE:
+            return f
+        key = (f, g, h)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        # 最も上の変数で場合分けする (Shannon 展開)
+        level = min(self._top(f), self._top(g), self._top(h))
+        f0, f1 = self._cofactors(f, level)
+        g0, g1 = self._cofactors(g, level)
+        h0, h1 = self._cofactors(h, level)
+        result = self._make(level, self.ite(f0, g0, h0), self.ite(f1, g1, h1))
+        if len(self._cache) >= self.cache_size:
+            # 計算表が一杯になったら全て捨てる (結果は一意表から作り直せる)
+            self._cache.clear()
+        self._cache[key] = result
+        return result
+
+    def _cofactors(self, f: int, level: int) -> Tuple[int, int]:
+        if self._level[f] == level:
+            return self._low[f], self._high[f]
+        return f, f
+
+    def negate(self, f: int) -> int:
+        return self.ite(f, FALSE, TRUE)
+
+    def build(self, node: tree.Node) -> int:
+        """記号文の木を BDD の節点にする (新しい原子文は変数順の末尾に追加する)"""
+        built = self._built
+        for n in tree.postorder(node, built):
+            if isinstance(n, tree.Atom):
+                result = self.var(n.value)
+            elif isinstance(n, tree.Not):
+                result = self.negate(built[n.child])
+            else:
+                left = built[n.left]
+                right = built[n.right]
+                if isinstance(n, tree.And):
+                    result = self.ite(left, right, FALSE)
+                elif isinstance(n, tree.Or):
+                    result = self.ite(left, TRUE, right)
+                elif isinstance(n, tree.Implies):
+                    result = self.ite(left, right, TRUE)
+                elif isinstance(n, tree.Equivalence):
+                    result = self.ite(left, right, self.negate(right))
+                else:
+                    raise ValueError(f"未知の結合子です: {n!r}")
+            built[n] = result
+        return built[node]
+
+    def count(self, f: int, atoms: Optional[Sequence[str]] = None) -> int:
+        """f を真にする割り当ての数を、行を数え上げずに求める
+
+        Args:
+            f: 節点
+            atoms: 割り当てを数える原子文 (省略時は変数順の全ての原子文)。
+                   f が依存する原子文を全て含んでいなければならない
+        """
+        counted = set(self.order if atoms is None else atoms)
+        for atom in self.order:
+            if atom not in counted and self._depends_on(f, self.levels[atom]):
+                raise ValueError(f"数える原子文に {atom} が含まれていません")
+        # 節点 -> その節点の変数から下の変数についての割り当ての数
+        counts: Dict[int, int] = {FALSE: 0, TRUE: 1}
+        stack = [f]
+        while stack:
+            g = stack[-1]
+            if g in counts:
+                stack.pop()
+                continue
+            low, high = self._low[g], self._high[g]
+            pending = [child for child in (low, high) if child not in counts]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            level = self._level[g]
+            # 枝が飛ばした変数はどちらの値でもよい
+            counts[g] = (counts[low] << (self._top(low) - level - 1)) \
+                + (counts[high] << (self._top(high) - level - 1))
+        total = counts[f] << self._top(f)
+        # 変数順にあるが数えない原子文の分を割り、変数順にない原子文の分を掛ける
+        skipped = sum(1 for atom in self.order if atom not in counted)
+        extra = len(counted - set(self.order))
+        return (total >> skipped) << extra
+
+    def _depends_on(self, f: int, level: int) -> bool:
+        seen = set()
+        stack = [f]
+        while stack:
+            g = stack.pop()
+            if g in seen or g <= TRUE:
+                continue
+            seen.add(g)
+            if self._level[g] == level:
+                return True
+            if self._level[g] < level:
+                stack += [self._low[g], self._high[g]]
+        return False
+
+    def cube(self, f: int) -> Optional[Dict[str, bool]]:
+        """f を真にする部分的な割り当て (根から真の終端節点への1本の経路) を返す
+
+        各節点では偽の枝を優先するので、現れない原子文を偽とみなせば
+        変数順で辞書順最小の割り当てになる。f が偽なら None。
+        """
+        if f == FALSE:
+            return None
+        cube: Dict[str, bool] = {}
+        while f != TRUE:
+            atom = self.order[self._level[f]]
+            if self._low[f] != FALSE:
+                cube[atom] = False
+                f = self._low[f]
+            else:
+                cube[atom] = True
+                f = self._high[f]
+        return cube
+
+    def cubes(self, f: int) -> Iterator[Dict[str, bool]]:
+        """f を真にする割り当てを、互いに重ならない部分的な割り当てに分けて順に返す
+
+        根から真の終端節点への経路を、偽の枝を優先して1本ずつたどる。経路に現れない
+        原子文はどちらの値でもよいので、1つの部分的な割り当てが 2^(現れない数) 通りの
+        割り当てをまとめて表す。最初に返すものは cube(f) と同じ。
+        """
+        # (節点, それまでの経路で決めた (原子文, 値) の組)
+        stack: List[Tuple[int, Tuple[Tuple[str, bool], ...]]] = [(f, ())]
+        while stack:
+            g, path = stack.pop()
+            if g == FALSE:
+                continue
+            if g == TRUE:
+                yield dict(path)
+                continue
+            atom = self.order[self._level[g]]
+            stack.append((self._high[g], path + ((atom, True),)))
+            stack.append((self._low[g], path + ((atom, False),)))
+
+
+def equivalent(a: tree.Node, b: tree.Node) -> bool:
+    """2つの記号文が論理的に同値かを BDD の節点の比較で判定する"""
+    manager = BDD(order_atoms([a, b]))
+    return manager.build(a) == manager.build(b)
@@ -0,0 +1,65 @@
+"""記号文のコンパイルによる評価の高速化を計測する
+
+    python -m benchmarks.bench_compile [--depth 200] [--atoms 8] [--seed 0]
+"""
+import argparse
+import random
+import time
+from itertools import product
+
+import tree
+import compiler
+
+BINARY = (tree.And, tree.Or, tree.Implies, tree.Equivalence)
+
+
+def deep_formula(rng: random.Random, atoms: list, depth: int) -> tree.Node:
+    """深さ depth の記号文をランダムに作る (各段で左右どちらかに入れ子にする)"""
+    node: tree.Node = tree.Atom(rng.choice(atoms))
+    for _ in range(depth):
+        if rng.random() < 0.2:
+            node = tree.Not(node)
+        elif rng.random() < 0.5:
+            node = rng.choice(BINARY)(tree.Atom(rng.choice(atoms)), node)
+        else:
+            node = rng.choice(BINARY)(node, tree.Atom(rng.choice(atoms)))
+    return node
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=200)
+    parser.add_argument("--atoms", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    atoms = [f"P_{i}" for i in range(args.atoms)]
+    node = deep_formula(rng, atoms, args.depth)
+    rows = list(product((False, True), repeat=len(atoms)))
+    envs = [dict(zip(atoms, values)) for values in rows]
+
+    start = time.perf_counter()
+    expected = [node.evaluate(env) for env in envs]
+    tree_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    function = compiler.compile_node(node, atoms)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [function(*values) for values in rows]
+    compiled_time = time.perf_counter() - start
+
+    if actual != expected:
+        raise SystemExit("コンパイルした関数の結果が Node.evaluate と一致しません")
+
+    print(f"depth={args.depth} atoms={args.atoms} rows={len(rows)}")
+    print(f"Node.evaluate : {tree_time * 1000:9.2f} ms")
+    print(f"compile       : {compile_time * 1000:9.2f} ms")
+    print(f"compiled      : {compiled_time * 1000:9.2f} ms")
+    print(f"speedup       : {tree_time / compiled_time:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
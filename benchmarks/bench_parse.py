@@ -0,0 +1,119 @@
+"""記号文の字句解析・構文解析のスループットを計測する
+
+    python -m benchmarks.bench_parse [--count 3000] [--depth 6] [--seed 0]
+
+1回のトークン化を両パーサで共有する現在の Formula と、変更前の方式 (パーサごとに
+字句解析器を作り、作るたびに記号表と正規表現を作り直して、公式→非公式の順にパースし直す) を比べる。
+"""
+import argparse
+import random
+import re
+import time
+
+from inference import Formula
+from tokenizer import TOKEN_DEFINITIONS, FormalParser, InformalParser, LexerGenerator, TokenStream, TokenType
+
+ATOMS = ["P", "Q", "R", "S", "T", "P_1"]
+BINARY = ["&", "|", "->", "<->"]
+
+
+def formal_text(rng: random.Random, depth: int) -> str:
+    """深さ depth 以下の公式な記号文をランダムに作る"""
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(ATOMS)
+    if rng.random() < 0.2:
+        return "~" + formal_text(rng, depth - 1)
+    return f"({formal_text(rng, depth - 1)}{rng.choice(BINARY)}{formal_text(rng, depth - 1)})"
+
+
+def informal_text(rng: random.Random, depth: int) -> str:
+    """外側の括弧を省き、丸括弧を一部角括弧にした非公式な記号文を作る"""
+    text = formal_text(rng, depth)
+    if text.startswith("(") and text.endswith(")"):
+        text = text[1:-1]
+    return text.replace("(", "[", 1).replace(")", "]", 1) if rng.random() < 0.5 else text
+
+
+class BaselineLexer(TokenStream):
+    """変更前の LexerGenerator の写し (インスタンスごとに記号表と正規表現を作り直す)
+
+    現在のパーサが読めるように、Token のリストの代わりに種類と文字列の配列に入れる
+    (変更前より少し速くなるので、比べた倍率は控えめに出る)。
+    """
+    def __init__(self, text: str):
+        self.symbol_map: dict[str, TokenType] = {}
+        self._build_map()
+        self.pattern = self._build_regex()
+        self.pos = 0
+        self.types: list[TokenType] = []
+        self.values: list[str] = []
+        self.tokenize(text)
+
+    def _build_map(self):
+        for token_type, symbols in TOKEN_DEFINITIONS.items():
+            for s in symbols:
+                if s in self.symbol_map:
+                    if self.symbol_map[s] != token_type:
+                        raise ValueError(f"定義エラー: 記号 '{s}' が重複しています")
+                self.symbol_map[s] = token_type
+
+    def _build_regex(self):
+        sorted_symbols = sorted(self.symbol_map.keys(), key=len, reverse=True)
+        escaped_symbols = [re.escape(s) for s in sorted_symbols]
+        ops_pattern = '|'.join(escaped_symbols)
+        atom_pattern = r'[P-Z](?:_[0-9]+)?'
+        return re.compile(f'\\s*({ops_pattern}|{atom_pattern})\\s*')
+
+    def tokenize(self, text: str):
+        raw_tokens = [t for t in self.pattern.split(text) if t]
+        for raw in raw_tokens:
+            if raw in self.symbol_map:
+                self.types.append(self.symbol_map[raw])
+            elif re.match(r'^[P-Z](?:_[0-9]+)?$', raw):
+                self.types.append(TokenType.ATOM)
+            else:
+                raise ValueError(f"未知のトークン: '{raw}'")
+            self.values.append(raw)
+
+
+def two_pass(text: str):
+    """変更前の Formula と同じく、検査用・公式・非公式のパーサごとに字句解析器を作る方式"""
+    BaselineLexer(text)
+    try:
+        return FormalParser(BaselineLexer(text)).parse()
+    except ValueError:
+        return InformalParser(BaselineLexer(text)).parse()
+
+
+def throughput(function, texts) -> float:
+    start = time.perf_counter()
+    for text in texts:
+        try:
+            function(text)
+        except ValueError:
+            pass
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=3000)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    inputs = {
+        "formal": [formal_text(rng, args.depth) for _ in range(args.count)],
+        "informal": [informal_text(rng, args.depth) for _ in range(args.count)],
+    }
+    print(f"{'input':10} {'tokenize':>12} {'two-pass':>12} {'Formula':>12}  (formulas/sec)")
+    for name, texts in inputs.items():
+        lex = throughput(LexerGenerator, texts)
+        old = throughput(two_pass, texts)
+        new = throughput(Formula, texts)
+        print(f"{name:10} {lex:12.0f} {old:12.0f} {new:12.0f}  x{new / old:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""ベンチマーク用の記号文と推論を、シードを固定してランダムに作る"""
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import tree
+
+# 結合子の名前 -> 木の節点のクラス
+CONNECTIVES = {
+    "not": tree.Not,
+    "and": tree.And,
+    "or": tree.Or,
+    "implies": tree.Implies,
+    "equiv": tree.Equivalence,
+}
+
+# 非公式な記法での結合の強さ (値が大きいほど強い)
+PRECEDENCE = {tree.And: 2, tree.Or: 2, tree.Implies: 1, tree.Equivalence: 1}
+
+
+@dataclass
+class FormulaConfig:
+    """作る記号文の設定
+
+    Attributes:
+        atoms: 文記号の数 (P_0, P_1, ... を使う)
+        depth: 記号文の木の深さ
+        connectives: 結合子の名前 -> 選ばれる重み
+        notation: "formal" (公式な記号文) または "informal" (非公式な記号文)
+        premises: 推論の前提の数
+    """
+    atoms: int = 4
+    depth: int = 4
+    connectives: Dict[str, float] = field(default_factory=lambda: {name: 1.0 for name in CONNECTIVES})
+    notation: str = "formal"
+    premises: int = 3
+
+    def atom_names(self) -> List[str]:
+        return [f"P_{i}" for i in range(self.atoms)]
+
+
+def random_formula(rng: random.Random, config: FormulaConfig,
+                   atoms: Optional[List[str]] = None) -> tree.Node:
+    """深さ config.depth の記号文をランダムに作る"""
+    atoms = atoms or config.atom_names()
+    names = list(config.connectives)
+    weights = [config.connectives[name] for name in names]
+    # 各節点の深さを決めながら上から作り、子を作り終えたら親を組み立てる
+    stack: List[Tuple[int, Optional[type], list]] = [(config.depth, None, [])]
+    while True:
+        depth, node_type, children = stack[-1]
+        if node_type is None:
+            stack.pop()
+            if depth <= 0:
+                node: tree.Node = tree.Atom(rng.choice(atoms))
+            else:
+                chosen = CONNECTIVES[rng.choices(names, weights)[0]]
+                stack.append((depth, chosen, []))
+                stack.append((depth - 1, None, []))
+                continue
+        else:
+            arity = 1 if node_type is tree.Not else 2
+            if len(children) < arity:
+                stack.append((depth - 1, None, []))
+                continue
+            stack.pop()
+            node = node_type(*children)
+        if not stack:
+            return node
+        stack[-1][2].append(node)
+
+
+def render(node: tree.Node, notation: str = "formal", rng: Optional[random.Random] = None) -> str:
+    """記号文を公式または非公式な記法の文字列にする
+
+    非公式な記法では、外側の括弧・∧∨を囲む→↔の内側の括弧・同じ∧(∨)の左寄せの括弧を省き、
+    残った括弧の一部を角括弧にする。
+    """
+    if notation == "formal":
+        return repr(node)
+    rng = rng or random.Random(0)
+    # 部分木 -> 外側の括弧を省いた文字列
+    bare: Dict[tree.Node, str] = {}
+
+    def operand(child: tree.Node, parent_type: type, is_left: bool) -> str:
+        child_type = type(child)
+        if child_type not in PRECEDENCE:
+            return bare[child]
+        if parent_type in PRECEDENCE:
+            if PRECEDENCE[child_type] > PRECEDENCE[parent_type]:
+                return bare[child]
+            if is_left and child_type is parent_type and parent_type in (tree.And, tree.Or):
+                return bare[child]
+        if rng.random() < 0.3:
+            return f"[{bare[child]}]"
+        return f"({bare[child]})"
+
+    for n in tree.postorder(node):
+        if isinstance(n, tree.Atom):
+            bare[n] = n.value
+        elif isinstance(n, tree.Not):
+            bare[n] = f"~{operand(n.child, tree.Not, False)}"
+        else:
+            left = operand(n.left, type(n), True)
+            right = operand(n.right, type(n), False)
+            bare[n] = f"{left}{n.symbol}{right}"
+    return bare[node]
+
+
+def random_argument(rng: random.Random, config: FormulaConfig) -> Tuple[List[str], str]:
+    """前提と結論の文字列を作る (全ての文記号がどこかに現れるようにする)"""
+    atoms = config.atom_names()
+    formulas = [random_formula(rng, config, atoms) for _ in range(config.premises + 1)]
+    used = set()
+    for formula in formulas:
+        used |= formula.atoms
+    unused = [atom for atom in atoms if atom not in used]
+    if unused:
+        # 使われなかった文記号を選言でつないで、いずれかの記号文に加える
+        extra: tree.Node = tree.Atom(unused[0])
+        for atom in unused[1:]:
+            extra = tree.Or(extra, tree.Atom(atom))
+        k = rng.randrange(len(formulas))
+        formulas[k] = tree.Or(formulas[k], extra)
+    texts = [render(formula, config.notation, rng) for formula in formulas]
+    return texts[:-1], texts[-1]
@@ -0,0 +1,161 @@
+"""字句解析・構文解析・妥当性判定の各段階を計測し、ベースラインと比べる
+
+    python -m benchmarks.suite [--atoms 2 4 8 12 16] [--depth 4] [--notation formal]
+                               [--save baseline.json] [--compare baseline.json --tolerance 0.25]
+
+文記号の数ごとに同じシードで推論を作り、段階ごとの所要時間 (繰り返しの最小値) を表にする。
+--compare を指定すると、ベースラインより tolerance 以上遅くなった段階を報告して終了コード 1 を返す。
+"""
+import argparse
+import dataclasses
+import json
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.generator import CONNECTIVES, FormulaConfig, random_argument
+from inference import Formula, Inference
+from tokenizer import FormalParser, InformalParser, LexerGenerator, TokenStream
+
+STAGES = ["lexer", "formal_parser", "informal_parser", "formula", "truth_table", "validity"]
+
+
+def best_of(function: Callable[[], object], repeat: int) -> float:
+    """function を repeat 回実行した所要時間の最小値 (秒)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(config: FormulaConfig, seed: int, arguments: int, repeat: int) -> Dict[str, float]:
+    """1つの設定で各段階の所要時間を計測する"""
+    rng = random.Random(seed)
+    texts = [random_argument(rng, config) for _ in range(arguments)]
+    strings = [s for premises, conclusion in texts for s in premises + [conclusion]]
+    # FormalParser は公式な記号文しか読めないので、同じシードで公式な記法の推論も作る
+    formal_config = dataclasses.replace(config, notation="formal")
+    formal_rng = random.Random(seed)
+    formal_strings = [
+        s for premises, conclusion in (random_argument(formal_rng, formal_config) for _ in range(arguments))
+        for s in premises + [conclusion]
+    ]
+    formal_streams = [TokenStream(s) for s in formal_strings]
+    streams = [TokenStream(s) for s in strings]
+    formulas = [([Formula(p) for p in premises], Formula(conclusion)) for premises, conclusion in texts]
+
+    def parse_all(parser_class, token_streams):
+        for stream in token_streams:
+            stream.reset()
+            parser_class(stream).parse()
+
+    return {
+        "lexer": best_of(lambda: [LexerGenerator(s) for s in strings], repeat),
+        "formal_parser": best_of(lambda: parse_all(FormalParser, formal_streams), repeat),
+        "informal_parser": best_of(lambda: parse_all(InformalParser, streams), repeat),
+        "formula": best_of(lambda: [Formula(s) for s in strings], repeat),
+        "truth_table": best_of(lambda: [Inference(p, c).generate_truth_table() for p, c in formulas], repeat),
+        "validity": best_of(lambda: [Inference(p, c).is_semantically_valid() for p, c in formulas], repeat),
+    }
+
+
+def run_suite(args) -> Dict:
+    results: Dict[str, Dict[str, float]] = {stage: {} for stage in STAGES}
+    for atoms in args.atoms:
+        config = FormulaConfig(
+            atoms=atoms, depth=args.depth, notation=args.notation,
+            premises=args.premises, connectives=args.connectives,
+        )
+        timings = measure(config, args.seed, args.arguments, args.repeat)
+        for stage, seconds in timings.items():
+            results[stage][str(atoms)] = seconds
+    return {
+        "config": {
+            "atoms": args.atoms, "depth": args.depth, "notation": args.notation,
+            "premises": args.premises, "connectives": args.connectives,
+            "arguments": args.arguments, "seed": args.seed, "repeat": args.repeat,
+        },
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def print_table(report: Dict):
+    atoms = [str(n) for n in report["config"]["atoms"]]
+    print(f"{'stage':16}" + "".join(f"{'n=' + n:>12}" for n in atoms) + "   (ms)")
+    for stage in STAGES:
+        row = report["results"][stage]
+        print(f"{stage:16}" + "".join(f"{row[n] * 1000:12.3f}" for n in atoms))
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """ベースラインより tolerance の割合以上遅くなった段階を列挙する"""
+    regressions = []
+    for stage in STAGES:
+        for n, seconds in report["results"][stage].items():
+            base = baseline["results"].get(stage, {}).get(n)
+            if base is not None and seconds > base * (1 + tolerance):
+                regressions.append(
+                    f"{stage} n={n}: {base * 1000:.3f} ms -> {seconds * 1000:.3f} ms "
+                    f"(+{(seconds / base - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def parse_connectives(text: str) -> Dict[str, float]:
+    """"and=2,or=1,not=0.5" の形の文字列を結合子の重みにする"""
+    weights = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in CONNECTIVES:
+            raise argparse.ArgumentTypeError(f"未知の結合子です: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--atoms", type=int, nargs="+", default=[2, 4, 8, 12, 16])
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--notation", choices=["formal", "informal"], default="formal")
+    parser.add_argument("--premises", type=int, default=3)
+    parser.add_argument("--connectives", type=parse_connectives,
+                        default={name: 1.0 for name in CONNECTIVES},
+                        help="結合子の重み (例: and=2,or=1,implies=1,equiv=0.5,not=1)")
+    parser.add_argument("--arguments", type=int, default=20, help="文記号の数ごとに作る推論の数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="結果を JSON で保存するファイル")
+    parser.add_argument("--compare", help="比べるベースラインの JSON ファイル")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="遅くなったとみなす割合")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        # ベースラインと同じ条件で計測する
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for key, value in baseline["config"].items():
+            setattr(args, key, value)
+
+    report = run_suite(args)
+    print_table(report)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("ベースラインからの劣化はありません")
+
+
+if __name__ == "__main__":
+    main()
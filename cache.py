@@ -0,0 +1,218 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import tree
+
+# 推論の妥当性の判定結果を、文記号の名前の付け替えと前提の並べ替えによらずに再利用する
+#
+# キーは推論の正規形の文字列である。
+# 1. 二重否定を取り除き、∧・∨・↔ の左右を文記号の名前によらない形 (文記号を全て同じ記号に
+#    置き換えた表記) の順に並べる
+# 2. 前提も同じ形の順に並べ、重複した前提は1つにまとめる
+# 3. 結論、前提の順に左から読み、文記号を最初に現れた順に P_0, P_1, ... と付け替える
+# 形が同じで区別できない部分の順は元の順のままにするので、同じ推論が別のキーになることは
+# あるが、キーが同じなら文記号の付け替えを除いて同じ推論である。
+#
+# 反例は正規形の文記号の名前で保存し、取り出すときに呼び出し側の名前に戻す。
+# 文記号の並びが変わるので、真偽値表の最初の行の反例とは限らない。
+#
+# SQLite のファイルには PRAGMA user_version に FORMAT_VERSION を記録する。正規形や保存する
+# 値の形を変えたら FORMAT_VERSION を上げること。開いたファイルの版が違えば、古い形の
+# キーで別の推論の結果を返さないように、保存済みの判定結果を捨てる。
+
+# メモリに保持する判定結果の数
+MAX_ENTRIES = 4096
+# 正規形のキーと保存する値の形の版
+FORMAT_VERSION = 1
+
+Verdict = Tuple[bool, Optional[Dict[str, bool]]]
+
+
+def _normalize(node: tree.Node, memo: Dict[tree.Node, Tuple[tree.Node, str]]) -> Tuple[tree.Node, str]:
+    """(正規化した木, 文記号の名前によらない形) を返す"""
+    for n in tree.postorder(node, memo):
+        if isinstance(n, tree.Atom):
+            memo[n] = (n, "A")
+        elif isinstance(n, tree.Not):
+            child, shape = memo[n.child]
+            if isinstance(child, tree.Not):
+                # ~~X は X と同値
+                memo[n] = (child.child, shape[1:])
+            else:
+                memo[n] = (tree.Not(child), "~" + shape)
+        else:
+            left, left_shape = memo[n.left]
+            right, right_shape = memo[n.right]
+            cls = type(n)
+            if isinstance(n, (tree.And, tree.Or, tree.Equivalence)) and right_shape < left_shape:
+                # 可換な結合子は左右の形の順に並べる
+                left, right, left_shape, right_shape = right, left, right_shape, left_shape
+            memo[n] = (cls(left, right), f"({left_shape}{n.symbol}{right_shape})")
+    return memo[node]
+
+
+def _rename(node: tree.Node, names: Dict[str, str]) -> str:
+    """文記号を最初に現れた順に付け替えた公式な表記を返す (names に付け替えを追加する)"""
+    parts: List[str] = []
+    stack: List[object] = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            parts.append(item)
+        elif isinstance(item, tree.Atom):
+            if item.value not in names:
+                names[item.value] = f"P_{len(names)}"
+            parts.append(names[item.value])
+        elif isinstance(item, tree.Not):
+            parts.append("~")
+            stack.append(item.child)
+        elif isinstance(item, tree.Operator):
+            parts.append("(")
+            stack += [")", item.right, item.symbol, item.left]
+    return "".join(parts)
+
+
+def canonicalize(premises: Sequence[tree.Node], conclusion: tree.Node) -> Tuple[str, Dict[str, str]]:
+    """推論の正規形のキーと、{呼び出し側の文記号: 正規形の文記号} を返す"""
+    memo: Dict[tree.Node, Tuple[tree.Node, str]] = {}
+    normalized_conclusion, _ = _normalize(conclusion, memo)
+    normalized = sorted((_normalize(premise, memo) for premise in premises), key=lambda item: item[1])
+    names: Dict[str, str] = {}
+    parts = [_rename(normalized_conclusion, names)]
+    seen = set()
+    for node, _ in normalized:
+        if node not in seen:
+            seen.add(node)
+            parts.append(_rename(node, names))
+    return "|-".join([",".join(parts[1:]), parts[0]]), names
+
+
+class ValidityCache:
+    """正規形をキーにした妥当性の判定結果の LRU キャッシュ (SQLite のファイルにも保存する)
+
+    Args:
+        path: 判定結果を保存する SQLite のファイル (None ならメモリだけに保持する)
+        max_entries: メモリに保持する判定結果の数
+    """
+    def __init__(self, path: Optional[str] = None, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Verdict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            # 複数のワーカープロセスから同じファイルを使う
+            self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # 版を確かめてから表を作り直すまでを、他のプロセスと重ならないように行う
+            self._db.execute("BEGIN IMMEDIATE")
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            if version != FORMAT_VERSION:
+                self._db.execute("DROP TABLE IF EXISTS verdicts")
+                self._db.execute(f"PRAGMA user_version = {FORMAT_VERSION}")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts "
+                "(key TEXT PRIMARY KEY, valid INTEGER NOT NULL, counterexample TEXT)"
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remember(self, key: str, verdict: Verdict):
+        self._entries[key] = verdict
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get(self, key: str) -> Optional[Verdict]:
+        with self._lock:
+            verdict = self._entries.get(key)
+            if verdict is not None:
+                self._entries.move_to_end(key)
+                return verdict
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT valid, counterexample FROM verdicts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            verdict = (bool(row[0]), None if row[1] is None else json.loads(row[1]))
+            self._remember(key, verdict)
+            return verdict
+
+    def _put(self, key: str, verdict: Verdict):
+        with self._lock:
+            self._remember(key, verdict)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO verdicts (key, valid, counterexample) VALUES (?, ?, ?)",
+                    (key, int(verdict[0]), None if verdict[1] is None else json.dumps(verdict[1])),
+                )
+                self._db.commit()
+            except sqlite3.OperationalError:
+                # 他のプロセスが書き込み中で待ちきれなかった場合はメモリにだけ残す
+                self._db.rollback()
+
+    def lookup(self, premises: Sequence[tree.Node], conclusion: tree.Node) -> Optional[Verdict]:
+        """判定結果があれば (妥当か, 呼び出し側の文記号の名前で表した反例の割り当て) を返す"""
+        key, names = canonicalize(premises, conclusion)
+        verdict = self._get(key)
+        if verdict is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        valid, assignment = verdict
+        if assignment is None:
+            return valid, None
+        return valid, {atom: assignment[name] for atom, name in names.items()}
+
+    def store(self, premises: Sequence[tree.Node], conclusion: tree.Node,
+              valid: bool, counterexample: Optional[Dict[str, bool]]):
+        """判定結果を保存する
+
+        Args:
+            counterexample: 反例の各文記号の値 (呼び出し側の文記号の名前で表す)
+        """
+        key, names = canonicalize(premises, conclusion)
+        assignment = None
+        if counterexample is not None:
+            assignment = {name: counterexample[atom] for atom, name in names.items()}
+        self._put(key, (valid, assignment))
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# Inference が既定で引くキャッシュ (はじめはメモリだけに保持する)
+_default_cache: Optional[ValidityCache] = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> ValidityCache:
+    """このプロセスで Inference が既定で使う判定結果のキャッシュを返す"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ValidityCache()
+        return _default_cache
+
+
+def set_default_cache(validity_cache: ValidityCache):
+    """このプロセスで Inference が既定で使う判定結果のキャッシュを差し替える (前のものは閉じる)"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is not None and _default_cache is not validity_cache:
+            _default_cache.close()
+        _default_cache = validity_cache
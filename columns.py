@@ -0,0 +1,87 @@
+from typing import Dict, Iterable, List, Optional
+import tree
+
+# 真偽値表の1列を多倍長整数のビット列として表す。
+# 第 i 行の真偽値は整数の i ビット目(最下位ビットが第0行)に対応する。
+# 行の並びは Inference.generate_truth_table と同じく、
+# 原子文をソートした順に左から上位ビットとして読む。
+
+
+def table_mask(n: int) -> int:
+    """2^n 行すべてのビットが立った整数を返す"""
+    return (1 << (1 << n)) - 1
+
+
+def atom_column(index: int, n: int) -> int:
+    """ソート済みの原子文のうち index 番目の原子文の列を作る
+
+    第 i 行で原子文が真になるのは (i >> (n - 1 - index)) & 1 が 1 のとき。
+    つまり 2^b 行ずつ偽と真が交互に並ぶ (b = n - 1 - index)。
+    """
+    if not 0 <= index < n:
+        raise ValueError(f"原子文の位置が範囲外です: {index}")
+    block = 1 << (n - 1 - index)
+    # 偽が block 行、真が block 行続く1周期分のパターン
+    column = ((1 << block) - 1) << block
+    length = block << 1
+    total = 1 << n
+    # 周期を倍々に複製して 2^n 行まで伸ばす
+    while length < total:
+        column |= column << length
+        length <<= 1
+    return column
+
+
+def atom_columns(atoms: List[str]) -> Dict[str, int]:
+    """ソート済みの原子文のリストから {原子文: 列} の辞書を作る"""
+    n = len(atoms)
+    return {atom: atom_column(j, n) for j, atom in enumerate(atoms)}
+
+
+def evaluate_column(node: tree.Node, columns: Dict[str, int], mask: int,
+                    memo: Optional[Dict[tree.Node, int]] = None) -> int:
+    """記号文の木を列単位のビット演算で評価する
+
+    Args:
+        node: 評価する記号文の木
+        columns: 各原子文の列
+        mask: 真偽値表の全行のビットが立った整数 (否定に使う)
+        memo: 計算済みの部分木の列。複数の記号文で共有すると、
+              共通の部分木を一度だけ計算できる
+
+    Returns:
+        各行での記号文の真偽値を並べた列
+    """
+    if memo is None:
+        memo = {}
+    for n in tree.postorder(node, memo):
+        if isinstance(n, tree.Atom):
+            result = columns[n.value]
+        elif isinstance(n, tree.Not):
+            result = memo[n.child] ^ mask
+        else:
+            left = memo[n.left]
+            right = memo[n.right]
+            if isinstance(n, tree.And):
+                result = left & right
+            elif isinstance(n, tree.Or):
+                result = left | right
+            elif isinstance(n, tree.Implies):
+                result = (left ^ mask) | right
+            elif isinstance(n, tree.Equivalence):
+                result = (left ^ right) ^ mask
+            else:
+                raise ValueError(f"未知の結合子です: {n!r}")
+        memo[n] = result
+    return memo[node]
+
+
+def pack_column(values: Iterable[bool]) -> int:
+    """第0行から順に並んだ真偽値を列にする"""
+    bits = "".join("1" if value else "0" for value in values)
+    return int(bits[::-1], 2) if bits else 0
+
+
+def lowest_row(column: int) -> int:
+    """列の中で最初に真になる行番号を返す (なければ -1)"""
+    return (column & -column).bit_length() - 1
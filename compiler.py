@@ -0,0 +1,87 @@
+from functools import lru_cache
+from typing import Callable, Dict, List, Sequence, Tuple
+import tree
+
+# 記号文の木を1つの Python 関数に変換する。
+# 例: (P->(Q&R)) は lambda _a0, _a1, _a2: ((not _a0) or (_a1 and _a2)) 相当の関数になる。
+# 原子文には述語の原子式 (Fa, Gxy など) もあり、None のように Python の予約語と
+# 同じ表記にもなりうるので、引数名には原子文の名前を使わず、atoms の中の位置から
+# _a0, _a1, ... と名付ける。
+
+# 式の入れ子がこれより深くなったら一時変数に切り出す
+# (Python のコンパイラは深すぎる入れ子の式を扱えない)
+MAX_INLINE_DEPTH = 50
+
+
+def generate_source(node: tree.Node, atoms: Sequence[str]) -> str:
+    """記号文の木から関数定義のソースコードを生成する
+
+    Args:
+        node: 変換する記号文の木
+        atoms: 関数の位置引数として並べる原子文
+
+    Returns:
+        `_formula` という名前の関数を定義するソースコード
+    """
+    lines: List[str] = []
+    order = list(tree.postorder(node))
+    params = {atom: f"_a{idx}" for idx, atom in enumerate(atoms)}
+
+    # 2箇所以上から参照される部分木 (構造が同じ部分木は同じ節点になる) は
+    # 一時変数に切り出して1回だけ計算する
+    uses: Dict[tree.Node, int] = {node: 1}
+    for n in order:
+        if isinstance(n, tree.Operator):
+            for arg in n.args:
+                uses[arg] = uses.get(arg, 0) + 1
+
+    # 部分木 -> (式, 式の入れ子の深さ)
+    exprs: Dict[tree.Node, Tuple[str, int]] = {}
+    for n in order:
+        if isinstance(n, tree.Atom):
+            exprs[n] = (params[n.value], 0)
+            continue
+        if isinstance(n, tree.Not):
+            child, depth = exprs[n.child]
+            expr, depth = f"(not {child})", depth + 1
+        else:
+            left, left_depth = exprs[n.left]
+            right, right_depth = exprs[n.right]
+            if isinstance(n, tree.And):
+                expr = f"({left} and {right})"
+            elif isinstance(n, tree.Or):
+                expr = f"({left} or {right})"
+            elif isinstance(n, tree.Implies):
+                expr = f"((not {left}) or {right})"
+            elif isinstance(n, tree.Equivalence):
+                expr = f"({left} == {right})"
+            else:
+                raise ValueError(f"未知の結合子です: {n!r}")
+            depth = max(left_depth, right_depth) + 1
+        if depth >= MAX_INLINE_DEPTH or uses[n] > 1:
+            name = f"_t{len(lines)}"
+            lines.append(f"    {name} = {expr}")
+            expr, depth = name, 0
+        exprs[n] = (expr, depth)
+
+    lines.append(f"    return {exprs[node][0]}")
+    return f"def _formula({', '.join(params.values())}):\n" + "\n".join(lines)
+
+
+@lru_cache(maxsize=1024)
+def _compile_source(source: str) -> Callable[..., bool]:
+    namespace: dict = {}
+    exec(compile(source, "<formula>", "exec"), namespace)
+    return namespace["_formula"]
+
+
+def compile_node(node: tree.Node, atoms: Sequence[str]) -> Callable[..., bool]:
+    """記号文の木を、原子文の真偽値を位置引数に取る関数に変換する
+
+    同じソースコードになる記号文はコンパイル結果を共有する。
+
+    Args:
+        node: 変換する記号文の木
+        atoms: 関数の位置引数として並べる原子文 (木に出てこない原子文を含んでもよい)
+    """
+    return _compile_source(generate_source(node, atoms))
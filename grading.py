@@ -0,0 +1,171 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import cache
+import instrumentation
+import modelfinder
+import tree
+from inference import Formula, Inference
+
+# 推論 (前提と結論の文字列) を1件ずつ判定し、JSON にできる辞書で結果を返す。
+# API やバッチ処理のワーカープロセスから呼ばれるので、引数と戻り値は
+# 文字列・真偽値・辞書・リストだけで構成する。
+
+def configure_cache(path: Optional[str] = None, max_entries: int = cache.MAX_ENTRIES):
+    """このプロセスで Inference が既定で使う判定結果のキャッシュを設定する
+
+    ProcessPoolExecutor の initializer としても使える。
+
+    Args:
+        path: 判定結果を保存する SQLite のファイル (None ならメモリだけに保持する)
+        max_entries: メモリに保持する判定結果の数
+    """
+    cache.set_default_cache(cache.ValidityCache(path, max_entries))
+
+
+def describe_formula(text: str) -> Tuple[Optional[Formula], Dict[str, Any]]:
+    """記号文をパースし、(Formula, 整形式か・公式かなどをまとめた辞書) を返す
+
+    記号文でない場合は Formula の代わりに None を返す。
+    """
+    try:
+        formula = Formula(text)
+    except ValueError as e:
+        return None, {
+            "input": text,
+            "well_formed": False,
+            "formal": False,
+            "formula": None,
+            "error": str(e),
+        }
+    return formula, {
+        "input": text,
+        "well_formed": formula.is_well_formed,
+        "formal": formula.is_formal,
+        "formula": repr(formula),
+        "error": None,
+    }
+
+
+def grade_argument(premises: List[str], conclusion: str,
+                   max_atoms: Optional[int] = None) -> Dict[str, Any]:
+    """推論の各記号文の整形式性・公式性と、推論の妥当性・反例を判定する
+
+    Args:
+        premises: 前提の記号文
+        conclusion: 結論の記号文
+        max_atoms: 推論全体で使える文記号の数の上限 (超えたら妥当性を判定しない)
+
+    量化子を含む推論は modelfinder.find_countermodel で有限の反証モデルを探し、見つかれば
+    妥当でないとして countermodel にその表記を入れる。見つからなければ妥当とは限らないので
+    valid は None のままにする。
+
+    Returns:
+        {"premises": [...], "conclusion": {...}, "atoms": [...],
+         "valid": 真偽値または None, "counterexample": 反例の行または None,
+         "countermodel": 量化子を含む推論の反証モデルの表記または None,
+         "error": 妥当性を判定できなかった理由または None}
+    """
+    parsed = [describe_formula(text) for text in premises]
+    conclusion_formula, conclusion_result = describe_formula(conclusion)
+    result: Dict[str, Any] = {
+        "premises": [info for _, info in parsed],
+        "conclusion": conclusion_result,
+        "atoms": [],
+        "valid": None,
+        "counterexample": None,
+        "countermodel": None,
+        "error": None,
+    }
+
+    premise_formulas = [formula for formula, _ in parsed]
+    if conclusion_formula is None or any(formula is None for formula in premise_formulas):
+        result["error"] = "記号文でない前提または結論が含まれています"
+        return result
+
+    nodes = [formula.symbolic_representation_tree for formula in [*premise_formulas, conclusion_formula]]
+    if any(node is not None and tree.has_quantifier(node) for node in nodes):
+        return _grade_quantified(result, nodes)
+    try:
+        inference = Inference(premise_formulas, conclusion_formula)  # type: ignore[arg-type]
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+    atoms = sorted(inference.get_all_atoms())
+    result["atoms"] = atoms
+    if max_atoms is not None and len(atoms) > max_atoms:
+        result["error"] = f"文記号が多すぎます ({len(atoms)} > {max_atoms})"
+        return result
+
+    result["valid"] = inference.is_semantically_valid()
+    result["counterexample"] = inference.get_counterexample()
+    return result
+
+
+def _grade_quantified(result: Dict[str, Any], nodes: List[tree.Node]) -> Dict[str, Any]:
+    """量化子を含む推論の反証モデルを探し、grade_argument の結果に書き込む"""
+    try:
+        model = modelfinder.find_countermodel(nodes[:-1], nodes[-1])
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+    if model is None:
+        result["error"] = (f"要素が {modelfinder.MAX_SIZE} 個以下の領域には反証モデルがありません"
+                           " (より大きな領域は調べていないので、妥当かどうかは判定できません)")
+        return result
+    result["valid"] = False
+    result["countermodel"] = repr(model)
+    return result
+
+
+def list_counterexamples(premises: List[str], conclusion: str, offset: int = 0,
+                         limit: int = Inference.MAX_CUBES, max_atoms: Optional[int] = None) -> Dict[str, Any]:
+    """推論の反例の数と、反例をまとめた部分的な割り当ての1ページ分を返す
+
+    Args:
+        premises: 前提の記号文
+        conclusion: 結論の記号文
+        offset: 読み飛ばす部分的な割り当ての数
+        limit: 返す部分的な割り当ての数の上限
+        max_atoms: 推論全体で使える文記号の数の上限
+
+    Returns:
+        {"atoms": [...], "count": 反例の行の数, "cubes": [{原子文: 真偽値または None}, ...],
+         "next_offset": 次のページの offset (最後のページなら None), "error": 理由または None}
+    """
+    result: Dict[str, Any] = {"atoms": [], "count": None, "cubes": [], "next_offset": None, "error": None}
+    parsed = [describe_formula(text) for text in [*premises, conclusion]]
+    formulas = [formula for formula, _ in parsed]
+    if any(formula is None for formula in formulas):
+        result["error"] = "記号文でない前提または結論が含まれています"
+        return result
+    try:
+        inference = Inference(formulas[:-1], formulas[-1])  # type: ignore[arg-type]
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+    atoms = sorted(inference.get_all_atoms())
+    result["atoms"] = atoms
+    if max_atoms is not None and len(atoms) > max_atoms:
+        result["error"] = f"文記号が多すぎます ({len(atoms)} > {max_atoms})"
+        return result
+    if inference.cached_validity():
+        # 妥当と分かっていれば反例はない
+        result["count"] = 0
+        return result
+    result["count"] = inference.count_counterexamples()
+    result["cubes"] = list(inference.iter_counterexamples(offset, limit))
+    # 次のページに1つでも残っているか
+    if len(result["cubes"]) == limit and any(True for _ in inference.iter_counterexamples(offset + limit, 1)):
+        result["next_offset"] = offset + limit
+    return result
+
+
+def grade_argument_with_stats(premises: List[str], conclusion: str,
+                              max_atoms: Optional[int] = None) -> Tuple[Dict[str, Any], Dict[str, Dict]]:
+    """grade_argument と同じ判定を行い、(結果, 段階ごとの所要時間とカウンタ) を返す
+
+    2つ目の値は instrumentation.Stats.as_dict() の形の辞書。
+    """
+    with instrumentation.collect() as stats:
+        result = grade_argument(premises, conclusion, max_atoms)
+    return result, stats.as_dict()
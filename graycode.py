@@ -0,0 +1,162 @@
+from functools import lru_cache
+from typing import Callable, Dict, List, Sequence, Set, Tuple
+
+import tree
+
+# 真偽値の割り当てをグレイコードの順にたどり、部分記号文の値を差分で更新する。
+#
+# グレイコード g = i ^ (i >> 1) では、隣り合う割り当ての間で1つの原子文だけが反転する
+# (第 i 歩で反転するのは、行番号の i の最下位の立っているビットに当たる原子文)。
+# 全ての部分記号文の値を局所変数に保持しておき、反転した原子文の祖先だけを
+# 子から順に計算し直す。子の値がどれも変わらなかった節点は計算しない。
+# 第 i 歩の割り当ては真偽値表の第 g 行 (先頭の原子文が最上位ビット) なので、
+# 結果は行の順に並べ直して返す。
+#
+# 差分の計算は原子文ごとに直線的なコードとして生成し、compiler と同じく
+# 1つの Python 関数にまとめてコンパイルする。
+# 局所変数の名前は、原子文は atoms の中の位置から _a0, _a1, ...、それ以外の節点は
+# _v0, _v1, ... とする (原子文の表記は Python の名前として使えるとは限らない)。
+
+
+def _expression(node: tree.Node, names: Dict[tree.Node, str]) -> str:
+    if isinstance(node, tree.Not):
+        return f"not {names[node.child]}"
+    left = names[node.left]
+    right = names[node.right]
+    if isinstance(node, tree.And):
+        return f"{left} and {right}"
+    if isinstance(node, tree.Or):
+        return f"{left} or {right}"
+    if isinstance(node, tree.Implies):
+        return f"(not {left}) or {right}"
+    if isinstance(node, tree.Equivalence):
+        return f"{left} == {right}"
+    raise ValueError(f"未知の結合子です: {node!r}")
+
+
+def _analyze(nodes: Sequence[tree.Node], atoms: Sequence[str]):
+    """節点に名前を付け、原子文ごとに反転したとき計算し直す祖先を集める
+
+    Returns:
+        (節点 -> 変数名, 帰りがけ順の節点, 節点 -> 親のリスト,
+         原子文 -> (原子文の節点, 祖先のリスト) ただし記号文に現れない原子文は含まない)
+    """
+    # 節点を帰りがけ順に並べて番号を振る (子の番号は必ず親より小さい)
+    names: Dict[tree.Node, str] = {}
+    order: List[tree.Node] = []
+    parents: Dict[tree.Node, List[tree.Node]] = {}
+    starts: Dict[str, tree.Node] = {}
+    params = {atom: f"_a{idx}" for idx, atom in enumerate(atoms)}
+    for root in nodes:
+        for node in tree.postorder(root, names):
+            if isinstance(node, tree.Atom):
+                names[node] = params[node.value]
+                starts[node.value] = node
+            else:
+                names[node] = f"_v{len(order)}"
+            order.append(node)
+            parents[node] = []
+            if isinstance(node, tree.Operator):
+                for arg in set(node.args):
+                    parents[arg].append(node)
+    position = {node: idx for idx, node in enumerate(order)}
+    cones: Dict[str, Tuple[tree.Node, List[tree.Node]]] = {}
+    for atom in atoms:
+        start = starts.get(atom)
+        if start is None:
+            continue
+        cone: Set[tree.Node] = set()
+        stack = [start]
+        while stack:
+            for parent in parents[stack.pop()]:
+                if parent not in cone:
+                    cone.add(parent)
+                    stack.append(parent)
+        cones[atom] = (start, sorted(cone, key=position.__getitem__))
+    return names, order, parents, cones
+
+
+def generate_source(nodes: Sequence[tree.Node], atoms: Sequence[str]) -> str:
+    """グレイコードの順に差分評価して真偽値表の値を作る関数のソースコードを生成する
+
+    Args:
+        nodes: 評価する記号文の木 (共通の部分木は一度だけ評価する)
+        atoms: ソート済みの原子文 (真偽値表の行の順を決める)
+
+    Returns:
+        `_gray_table` という名前の、引数のない関数を定義するソースコード。
+        関数は真偽値表の行の順に、各記号文の値のタプルのリストを返す
+    """
+    names, order, parents, cones = _analyze(nodes, atoms)
+    roots = "(" + "".join(f"{names[root]}, " for root in nodes) + ")"
+    n = len(atoms)
+
+    lines = ["def _gray_table():"]
+    # 全ての原子文が偽の割り当て (第0行) で全体を評価する
+    for idx in range(n):
+        lines.append(f"    _a{idx} = False")
+    for node in order:
+        if isinstance(node, tree.Operator):
+            lines.append(f"    {names[node]} = {_expression(node, names)}")
+    lines.append(f"    table = [None] * {1 << n}")
+    lines.append(f"    table[0] = {roots}")
+    lines.append(f"    for i in range(1, {1 << n}):")
+    lines.append("        bit = (i & -i).bit_length() - 1")
+
+    branch = "if"
+    for bit in range(n):
+        atom = atoms[n - 1 - bit]
+        if atom not in cones:
+            # 記号文に現れない原子文は反転しても何も変わらない
+            continue
+        start, cone = cones[atom]
+        lines.append(f"        {branch} bit == {bit}:")
+        lines.append(f"            _a{n - 1 - bit} = not _a{n - 1 - bit}")
+        branch = "elif"
+        members = set(cone)
+        # 反転した原子文の祖先を子から順に計算し直す
+        for node in cone:
+            name = names[node]
+            # 値が変わったかどうかは、祖先が参照する場合だけ記録する
+            flag = f"_c{name[2:]}" if parents[node] else None
+            update = [
+                f"_t = {_expression(node, names)}",
+                *([f"{flag} = _t != {name}"] if flag else []),
+                f"{name} = _t",
+            ]
+            args = set(node.args)
+            if start in args:
+                # 反転した原子文を直接参照する節点は必ず計算し直す
+                lines.extend(f"            {line}" for line in update)
+                continue
+            condition = " or ".join(f"_c{names[arg][2:]}" for arg in args if arg in members)
+            lines.append(f"            if {condition}:")
+            lines.extend(f"                {line}" for line in update)
+            if flag:
+                lines.append("            else:")
+                lines.append(f"                {flag} = False")
+    lines.append(f"        table[i ^ (i >> 1)] = {roots}")
+    lines.append("    return table")
+    return "\n".join(lines)
+
+
+@lru_cache(maxsize=256)
+def _compile_source(source: str) -> Callable[[], List[Tuple[bool, ...]]]:
+    namespace: dict = {}
+    exec(compile(source, "<graycode>", "exec"), namespace)
+    return namespace["_gray_table"]
+
+
+def evaluate_source(source: str) -> List[Tuple[bool, ...]]:
+    """generate_source で生成したソースコードをコンパイルして実行する"""
+    return _compile_source(source)()
+
+
+def truth_table_values(nodes: Sequence[tree.Node], atoms: Sequence[str]) -> List[Tuple[bool, ...]]:
+    """真偽値表の各行での各記号文の値を、行の順 (グレイコードの順ではない) に並べて返す
+
+    Args:
+        nodes: 評価する記号文の木
+        atoms: ソート済みの原子文 (木に出てこない原子文を含んでもよい)
+    """
+    return evaluate_source(generate_source(nodes, atoms))
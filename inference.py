@@ -1,6 +1,18 @@
-from typing import Optional, List, Dict
+from itertools import islice, product
+from typing import Callable, Iterator, Optional, List, Dict, Sequence, Tuple, Union
 import tree
-from tokenizer import LexerGenerator, FormalParser, InformalParser
+import bdd
+import cache
+import columns
+import compiler
+import graycode
+import instrumentation
+import parallel
+import proof
+import reduction
+import sat
+from tokenizer import TokenStream, InformalParser
+from truthtable import TruthTable
 
 class Formula:
     def __init__(self, val: str):
@@ -9,6 +21,7 @@ class Formula:
         self.is_well_formed: bool = False
         self.is_formal: bool = False
         self.error_message: Optional[str] = None
+        self._compiled: Dict[Tuple[str, ...], Callable[..., bool]] = {}
         
         # 入力が空の場合はエラー
         if not val or val.strip() == "":
@@ -16,71 +29,145 @@ class Formula:
             raise ValueError(self.error_message)
         
         try:
-            # まずトークン化を試みる
-            lexer = LexerGenerator(val)
+            # トークン化は1回だけ行う
+            with instrumentation.stage("lex"):
+                tokens = TokenStream(val)
             
-            # 公式な記号文としてパースを試みる
+            # 非公式な記号文としてパースする
+            # (公式な記号文も同じ木になり、公式かどうかはパーサが記録する)
             try:
-                lexer_formal = LexerGenerator(val)
-                parser = FormalParser(lexer_formal)
-                self.symbolic_representation_tree = parser.parse()
-                self.is_well_formed = True
-                self.is_formal = True
-            except ValueError as e:
-                # 公式な記号文としてパースできなかった場合、非公式な記号文としてパースを試みる
-                try:
-                    lexer_informal = LexerGenerator(val)
-                    parser = InformalParser(lexer_informal)
+                instrumentation.count("parse_attempts")
+                with instrumentation.stage("parse"):
+                    parser = InformalParser(tokens)
                     self.symbolic_representation_tree = parser.parse()
-                    self.is_well_formed = True
-                    self.is_formal = False
-                except ValueError as e2:
-                    # 非公式な記号文としてもパースできない場合はエラー
-                    self.error_message = f"記号文として解釈できません: {str(e2)}"
-                    raise ValueError(self.error_message)
+                self.is_well_formed = True
+                self.is_formal = parser.is_formal
+                if not self.is_formal:
+                    instrumentation.count("parse_fallbacks")
+            except ValueError as e2:
+                # 非公式な記号文としてもパースできない場合はエラー
+                self.error_message = f"記号文として解釈できません: {str(e2)}"
+                raise ValueError(self.error_message)
                     
         except ValueError as e:
             # トークン化やパースに失敗した場合
             self.error_message = f"記号文ではありません: {str(e)}"
             raise ValueError(self.error_message)
     
-    def get_atoms(self) -> set:
-        """記号文に含まれる全ての原子文(文記号)を取得する"""
+    @classmethod
+    def from_tree(cls, node: tree.Node) -> "Formula":
+        """記号文の木から、パースせずに Formula を作る (入力の文字列は木の公式な表記とする)"""
+        formula = cls.__new__(cls)
+        formula.input_string = repr(node)
+        formula.symbolic_representation_tree = node
+        formula.is_well_formed = True
+        formula.is_formal = True
+        formula.error_message = None
+        formula._compiled = {}
+        return formula
+
+    def get_atoms(self) -> frozenset:
+        """記号文に含まれる全ての原子文(文記号)を取得する
+
+        原子文の集合は木の節点を作るときに計算済みなので、そのまま返す。
+        """
         if not self.is_well_formed or self.symbolic_representation_tree is None:
-            return set()
-        
-        atoms = set()
-        self._collect_atoms(self.symbolic_representation_tree, atoms)
-        return atoms
-    
-    def _collect_atoms(self, node: tree.Node, atoms: set):
-        """木構造から原子文を再帰的に収集する"""
-        if isinstance(node, tree.Atom):
-            atoms.add(node.value)
-        elif isinstance(node, tree.Operator):
-            for arg in node.args:
-                self._collect_atoms(arg, atoms)
+            return frozenset()
+        return self.symbolic_representation_tree.atoms
     
     def evaluate(self, env: Dict[str, bool]) -> bool:
         """与えられた真偽値割り当てで記号文を評価する"""
         if not self.is_well_formed or self.symbolic_representation_tree is None:
             raise ValueError("整形式でない記号文は評価できません")
         return self.symbolic_representation_tree.evaluate(env)
+
+    def compile(self, atoms: Optional[Sequence[str]] = None) -> Callable[..., bool]:
+        """記号文を、原子文の真偽値を位置引数に取る関数に変換する
+
+        Args:
+            atoms: 引数として並べる原子文。省略時は記号文の原子文をソートしたもの
+
+        Returns:
+            例えば (P->Q) なら lambda P, Q: (not P) or Q 相当の関数
+        """
+        if not self.is_well_formed or self.symbolic_representation_tree is None:
+            raise ValueError("整形式でない記号文は評価できません")
+        key = tuple(sorted(self.get_atoms()) if atoms is None else atoms)
+        function = self._compiled.get(key)
+        if function is None:
+            with instrumentation.stage("compile"):
+                function = compiler.compile_node(self.symbolic_representation_tree, key)
+            self._compiled[key] = function
+        return function
     
+    def is_equivalent(self, other: "Formula") -> bool:
+        """2つの記号文が論理的に同値かを判定する (BDD の節点が同じかどうかで比べる)"""
+        if self.symbolic_representation_tree is None or other.symbolic_representation_tree is None:
+            raise ValueError("整形式でない記号文は比較できません")
+        return bdd.equivalent(self.symbolic_representation_tree, other.symbolic_representation_tree)
+
     def __repr__(self) -> str:
         if self.symbolic_representation_tree:
             return str(self.symbolic_representation_tree)
         return self.input_string
 
+def _resolve_cache(option: Union["cache.ValidityCache", bool, None]) -> Optional["cache.ValidityCache"]:
+    if option is True:
+        return cache.default_cache()
+    if option is False or option is None:
+        return None
+    return option
+
+
 class Inference:
     premises: List[Formula]
     conclusion: Formula
 
-    def __init__(self, premises: List[Formula], conclusion: Formula):
+    # 利用できる評価方式
+    #   "bitwise": 各原子文を多倍長整数の列として扱い、列単位のビット演算で評価する
+    #   "rows":    真偽値の割り当てを1行ずつ辞書で作り、記号文の木を評価する
+    #   "sat":     真偽値表を作らず、前提∧~結論 の充足可能性を CDCL ソルバで判定する
+    #              (真偽値表を求められた場合は "rows" と同じく1行ずつ作る)
+    #   "parallel": 先頭の原子文の値で真偽値表を区画に分け、"bitwise" と同じ計算を
+    #              workers 個のワーカープロセスで行う (結果は "bitwise" と同じ)
+    #   "gray":    割り当てをグレイコードの順にたどり、反転した原子文の祖先だけを計算し直す
+    #              (同値や否定が多く、"rows" の短絡評価が効きにくい記号文で速い)
+    #   "bdd":     前提→結論 を BDD にし、真の終端節点になるかどうかで判定する
+    #              (真偽値表を求められた場合は "rows" と同じく1行ずつ作る)
+    #   "auto":    原子文の数が SAT_ATOM_THRESHOLD を超えたら "sat"、それ以外は "bitwise"
+    ENGINES = ("auto", "bitwise", "rows", "sat", "parallel", "gray", "bdd")
+    SAT_ATOM_THRESHOLD = 20
+    # iter_counterexamples で一度に返す部分的な割り当ての数の上限
+    MAX_CUBES = 1000
+
+    def __init__(self, premises: List[Formula], conclusion: Formula, engine: str = "auto",
+                 workers: Optional[int] = None, reduce: bool = True,
+                 cache: Union["cache.ValidityCache", bool, None] = True):
+        if engine not in self.ENGINES:
+            raise ValueError(f"未知の評価方式です: {engine}")
         self.premises = premises
         self.conclusion = conclusion
-        self.tf_table: Optional[List[Dict[str, bool]]] = None
+        self.workers = workers
+        # True なら妥当性の判定の前に reduction で問題を小さくする (真偽値表には影響しない)
+        self.reduce = reduce
+        self._requested_engine = engine
+        self._reduced: Optional[bool] = None
+        self._reduced_counterexample_row: Optional[Dict[str, bool]] = None
+        # 妥当性の判定の前に引く判定結果のキャッシュ
+        # (True なら cache.default_cache()、False か None なら引かない)
+        self.cache = _resolve_cache(cache)
+        self._cache_state: Optional[bool] = None  # None 未確認, False 計算中, True 確認済み
+        self._cache_missed = False
+        self._cached_counterexample_row: Optional[Dict[str, bool]] = None
+        self.tf_table: Optional[TruthTable] = None
         self._is_semantically_valid: Optional[bool] = None
+        self._columns: Optional[Tuple[List[str], List[int], int, int]] = None
+        self._solved_counterexample_row: Optional[Dict[str, bool]] = None
+        self._counterexample_index: Optional[int] = None
+        self._gray_table: Optional[List[Tuple[bool, ...]]] = None
+        # (BDD, 前提の連言の節点, 前提∧~結論 の節点)
+        self._bdd: Optional[Tuple[bdd.BDD, int, int]] = None
+        self._bdd_too_large = False
         
         # 全ての前提と結論が整形式であることを確認
         for premise in premises:
@@ -88,6 +175,14 @@ class Inference:
                 raise ValueError(f"前提に整形式でない記号文が含まれています: {premise.input_string}")
         if not conclusion.is_well_formed:
             raise ValueError(f"結論が整形式でない記号文です: {conclusion.input_string}")
+        for formula in list(premises) + [conclusion]:
+            if formula.symbolic_representation_tree is not None and \
+                    tree.has_quantifier(formula.symbolic_representation_tree):
+                raise ValueError("量化子を含む推論は modelfinder.find_countermodel で判定してください")
+
+        if engine == "auto":
+            engine = "sat" if len(self.get_all_atoms()) > self.SAT_ATOM_THRESHOLD else "bitwise"
+        self.engine = engine
     
     def get_all_atoms(self) -> set:
         """推論に含まれる全ての原子文を取得する"""
@@ -97,38 +192,411 @@ class Inference:
         atoms.update(self.conclusion.get_atoms())
         return atoms
     
-    def generate_truth_table(self) -> List[Dict[str, bool]]:
+    def generate_truth_table(self) -> TruthTable:
         """真偽値表を生成する
         
         Returns:
-            真偽値表の各行を辞書のリストとして返す
-            各辞書は {原子文: 真偽値, 前提1: 真偽値, ..., 結論: 真偽値} の形式
+            真偽値表。各前提と結論の列だけを持ち、行は添字から必要なときに作る。
+            各行は {原子文: 真偽値, 前提1: 真偽値, ..., 結論: 真偽値} の辞書と同じように引ける
         """
+        # 列の計算や関数への変換は真偽値表の作成とは別の段階として記録する
+        if self.engine in ("bitwise", "parallel"):
+            atoms, premise_columns, conclusion_column, _ = self._compute_columns()
+        elif self.engine == "gray":
+            atoms = sorted(self.get_all_atoms())
+            values = self._gray_values()
+            with instrumentation.stage("truth_table"):
+                *premise_columns, conclusion_column = [
+                    columns.pack_column(row[idx] for row in values) for idx in range(len(self.premises) + 1)
+                ]
+        else:
+            atoms, premise_functions, conclusion_function = self._compiled_functions()
+            with instrumentation.stage("truth_table"):
+                *premise_columns, conclusion_column = [
+                    columns.pack_column(function(*assignment) for assignment in self._iter_assignments(atoms))
+                    for function in premise_functions + [conclusion_function]
+                ]
+            instrumentation.count("rows_evaluated", 2 ** len(atoms))
+            instrumentation.count("formula_evaluations", 2 ** len(atoms) * (len(self.premises) + 1))
+        self.tf_table = TruthTable(atoms, premise_columns, conclusion_column)
+        return self.tf_table
+
+    def iter_truth_table(self) -> Iterator[Dict[str, bool]]:
+        """真偽値表の行を先頭から1行ずつ生成する
+
+        generate_truth_table と同じ行を同じ順に返すが、表全体を保持しない。
+        """
+        if self.engine in ("bitwise", "parallel"):
+            atoms, _, _, _ = self._compute_columns()
+            for i in range(2 ** len(atoms)):
+                yield self._row_from_columns(i)
+            return
+
+        if self.engine == "gray":
+            atoms = sorted(self.get_all_atoms())
+            keys = atoms + [f"premise_{idx}" for idx in range(len(self.premises))] + ["conclusion"]
+            for assignment, values in zip(self._iter_assignments(atoms), self._gray_values()):
+                yield dict(zip(keys, assignment + values))
+            return
+
+        atoms, premise_functions, conclusion_function = self._compiled_functions()
+        premise_keys = [f"premise_{idx}" for idx in range(len(self.premises))]
+        for values in self._iter_assignments(atoms):
+            row = dict(zip(atoms, values))
+            # この割り当てでの各前提と結論の真偽値を計算
+            for key, function in zip(premise_keys, premise_functions):
+                row[key] = function(*values)
+            row["conclusion"] = conclusion_function(*values)
+            yield row
+
+    @staticmethod
+    def _iter_assignments(atoms: List[str]) -> Iterator[Tuple[bool, ...]]:
+        """2^n 通りの真偽値の組み合わせを真偽値表の行の順に生成する
+
+        product は先頭の原子文を最上位ビットとして False, True の順に数え上げるので、
+        第 i 行は i のビットパターン (例: n=3, i=5 なら [True, False, True]) に対応する
+        """
+        return product((False, True), repeat=len(atoms))
+
+    def _compiled_functions(self) -> Tuple[List[str], List[Callable[..., bool]], Callable[..., bool]]:
+        """推論の全原子文を引数に取る、各前提と結論のコンパイル済み関数を返す"""
         atoms = sorted(self.get_all_atoms())  # ソートして順序を安定させる
+        premise_functions = [premise.compile(atoms) for premise in self.premises]
+        conclusion_function = self.conclusion.compile(atoms)
+        return atoms, premise_functions, conclusion_function
+
+    def _iter_counterexamples_rows(self) -> Iterator[Dict[str, bool]]:
+        """真偽値表を作らずに反例の行を先頭から順に生成する
+
+        各行ではまず結論を評価し、結論が真なら前提の評価を省く。
+        前提も左から順に評価し、偽の前提が見つかった時点でその行を打ち切る。
+        """
+        atoms, premise_functions, conclusion_function = self._compiled_functions()
+        stats = instrumentation.current()
+        rows = calls = 0
+        for values in self._iter_assignments(atoms):
+            rows += 1
+            calls += 1
+            if conclusion_function(*values):
+                continue
+            for function in premise_functions:
+                calls += 1
+                if not function(*values):
+                    break
+            else:
+                if stats is not None:
+                    stats.count("rows_evaluated", rows)
+                    stats.count("formula_evaluations", calls)
+                    rows = calls = 0
+                row = dict(zip(atoms, values))
+                for idx in range(len(premise_functions)):
+                    row[f"premise_{idx}"] = True
+                row["conclusion"] = False
+                yield row
+        if stats is not None:
+            stats.count("rows_evaluated", rows)
+            stats.count("formula_evaluations", calls)
+
+    def _gray_values(self) -> List[Tuple[bool, ...]]:
+        """グレイコードの順に差分評価した (前提..., 結論) の値を、真偽値表の行の順に返す"""
+        if self._gray_table is None:
+            atoms = sorted(self.get_all_atoms())
+            nodes = [formula.symbolic_representation_tree for formula in [*self.premises, self.conclusion]]
+            with instrumentation.stage("compile"):
+                source = graycode.generate_source(nodes, atoms)
+            with instrumentation.stage("truth_table"):
+                self._gray_table = graycode.evaluate_source(source)
+            instrumentation.count("rows_evaluated", len(self._gray_table))
+        return self._gray_table
+
+    def _first_counterexample_row(self) -> Optional[Dict[str, bool]]:
+        """1行ずつの評価で最初の反例を探す (見つかった時点で探索を打ち切る)"""
+        if self.engine == "gray":
+            # 差分評価は表全体を一度に作るので、その中から最初の反例を探す
+            table = self._gray_values()
+            with instrumentation.stage("validity"):
+                for i, values in enumerate(table):
+                    if not values[-1] and all(values[:-1]):
+                        return self._counterexample_row(i)
+            return None
+        self._compiled_functions()
+        with instrumentation.stage("validity"):
+            row = next(self._iter_counterexamples_rows(), None)
+        if row is not None:
+            instrumentation.count("early_exits")
+        return row
+
+    def _compute_columns(self) -> Tuple[List[str], List[int], int, int]:
+        """各前提と結論の列をビット演算で計算する
+
+        Returns:
+            (ソート済みの原子文, 各前提の列, 結論の列, 全行のマスク)
+        """
+        if self._columns is None and self.engine == "parallel":
+            atoms = sorted(self.get_all_atoms())
+            with instrumentation.stage("columns"):
+                *premise_columns, conclusion_column = parallel.evaluate_columns(
+                    [formula.symbolic_representation_tree for formula in [*self.premises, self.conclusion]],
+                    atoms, self.workers,
+                )
+            self._columns = (atoms, premise_columns, conclusion_column, columns.table_mask(len(atoms)))
+            instrumentation.count("rows_evaluated", 2 ** len(atoms))
+        if self._columns is None:
+            with instrumentation.stage("columns"):
+                atoms = sorted(self.get_all_atoms())
+                mask = columns.table_mask(len(atoms))
+                atom_columns = columns.atom_columns(atoms)
+                # 前提と結論で共有される部分木は一度だけ計算する
+                memo: Dict[tree.Node, int] = {}
+                premise_columns = [
+                    columns.evaluate_column(premise.symbolic_representation_tree, atom_columns, mask, memo)
+                    for premise in self.premises
+                ]
+                conclusion_column = columns.evaluate_column(
+                    self.conclusion.symbolic_representation_tree, atom_columns, mask, memo
+                )
+            self._columns = (atoms, premise_columns, conclusion_column, mask)
+            instrumentation.count("rows_evaluated", 2 ** len(atoms))
+            instrumentation.count("node_evaluations", len(memo))
+        return self._columns
+
+    def _row_from_columns(self, i: int) -> Dict[str, bool]:
+        """列から第 i 行を辞書として取り出す"""
+        atoms, premise_columns, conclusion_column, _ = self._compute_columns()
         n = len(atoms)
-        
-        # 2^n 通りの真偽値の組み合わせを生成
-        truth_table = []
-        for i in range(2 ** n):
-            # i のビットパターンから真偽値割り当てを生成
-            # 例: n=3 の場合、i=5 (0b101) は [True, False, True] に対応
-            env = {}
-            for j, atom in enumerate(atoms):
-                # 右から j 番目のビットが 1 なら True, 0 なら False
-                # 左から右へ読むため (n - 1 - j) でビット位置を調整
-                env[atom] = bool((i >> (n - 1 - j)) & 1)
-            
-            # この環境での各前提と結論の真偽値を計算
-            row = env.copy()
-            for idx, premise in enumerate(self.premises):
-                row[f"premise_{idx}"] = premise.evaluate(env)
-            row["conclusion"] = self.conclusion.evaluate(env)
-            
-            truth_table.append(row)
-        
-        self.tf_table = truth_table
-        return truth_table
+        row = {atom: bool((i >> (n - 1 - j)) & 1) for j, atom in enumerate(atoms)}
+        for idx, column in enumerate(premise_columns):
+            row[f"premise_{idx}"] = bool((column >> i) & 1)
+        row["conclusion"] = bool((conclusion_column >> i) & 1)
+        return row
+
+    def _parallel_counterexample_index(self) -> int:
+        """最初の反例の行番号を区画ごとに並列に探す (なければ -1)
+
+        列を計算済みならそれを使う。
+        """
+        if self._counterexample_index is None:
+            if self._columns is not None:
+                self._counterexample_index = columns.lowest_row(self._counterexample_column())
+            else:
+                with instrumentation.stage("validity"):
+                    self._counterexample_index = parallel.find_counterexample_row(
+                        [premise.symbolic_representation_tree for premise in self.premises],
+                        self.conclusion.symbolic_representation_tree,
+                        sorted(self.get_all_atoms()), self.workers,
+                    )
+        return self._counterexample_index
+
+    def _counterexample_row(self, i: int) -> Dict[str, bool]:
+        """反例である第 i 行を、列を使わずに辞書として作る"""
+        atoms = sorted(self.get_all_atoms())
+        n = len(atoms)
+        row = {atom: bool((i >> (n - 1 - j)) & 1) for j, atom in enumerate(atoms)}
+        for idx in range(len(self.premises)):
+            row[f"premise_{idx}"] = True
+        row["conclusion"] = False
+        return row
+
+    def _counterexample_column(self) -> int:
+        """全ての前提が真かつ結論が偽である行のビットが立った列を返す"""
+        _, premise_columns, conclusion_column, mask = self._compute_columns()
+        with instrumentation.stage("validity"):
+            bad = conclusion_column ^ mask
+            for column in premise_columns:
+                bad &= column
+        return bad
     
+    def _solve_sat(self):
+        """SAT ソルバで反例を探し、妥当性と反例の行を記録する
+
+        反例は真偽値表の行と同じ形式にするが、真偽値表を使う方式とは異なり
+        最初の行の反例とは限らない。
+        """
+        with instrumentation.stage("validity"):
+            model = sat.find_counterexample(
+                [premise.symbolic_representation_tree for premise in self.premises],
+                self.conclusion.symbolic_representation_tree,
+            )
+        self._is_semantically_valid = model is None
+        if model is not None:
+            row = {atom: model[atom] for atom in sorted(self.get_all_atoms())}
+            for idx in range(len(self.premises)):
+                row[f"premise_{idx}"] = True
+            row["conclusion"] = False
+            self._solved_counterexample_row = row
+    
+    def _counterexample_bdd(self) -> Tuple[bdd.BDD, int, int]:
+        """(BDD, 前提の連言の節点, 前提∧~結論 の節点) を作る
+
+        節点数が上限を超えたら MemoryError を送出し、以後は作り直さずに同じ例外を送出する。
+        """
+        if self._bdd_too_large:
+            raise MemoryError("BDD の節点数が上限を超えました")
+        if self._bdd is None:
+            nodes = [formula.symbolic_representation_tree for formula in [*self.premises, self.conclusion]]
+            with instrumentation.stage("validity"):
+                manager = bdd.BDD(bdd.order_atoms(nodes))
+                try:
+                    premises = bdd.TRUE
+                    for node in nodes[:-1]:
+                        premises = manager.ite(premises, manager.build(node), bdd.FALSE)
+                    bad = manager.ite(premises, manager.negate(manager.build(nodes[-1])), bdd.FALSE)
+                except MemoryError:
+                    self._bdd_too_large = True
+                    raise
+            instrumentation.count("bdd_nodes", len(manager))
+            self._bdd = (manager, premises, bad)
+        return self._bdd
+
+    def _solve_bdd(self):
+        """前提∧~結論 の BDD を作り、偽の終端節点になるかどうかで妥当性と反例の行を記録する
+
+        反例は 前提∧~結論 の BDD の1本の経路から作る (経路に現れない原子文は偽とする)。
+        変数順は真偽値表の行の順とは異なるので、最初の行の反例とは限らない。
+        """
+        manager, _, bad = self._counterexample_bdd()
+        with instrumentation.stage("validity"):
+            cube = manager.cube(bad)
+        self._is_semantically_valid = bad == bdd.FALSE
+        if cube is not None:
+            row = {atom: cube.get(atom, False) for atom in sorted(self.get_all_atoms())}
+            for idx in range(len(self.premises)):
+                row[f"premise_{idx}"] = True
+            row["conclusion"] = False
+            self._solved_counterexample_row = row
+
+    def _solve(self):
+        """真偽値表を使わない方式 ("sat" または "bdd") で妥当性と反例を求める"""
+        if self.engine == "sat":
+            self._solve_sat()
+        else:
+            self._solve_bdd()
+
+    def _component_counterexample(self, premises: List[tree.Node],
+                                  conclusion: Optional[tree.Node]) -> Optional[Dict[str, bool]]:
+        """成分の前提が全て真で結論が偽 (結論が None なら前提が全て真) になる割り当てを求める
+
+        元の推論と同じ評価方式で判定するので、真偽値表を使う方式なら最初の行の割り当てになる。
+        """
+        if conclusion is None:
+            if not premises:
+                return {}
+            # 前提が全て真になる割り当ては 前提[:-1] ⊢ ~前提[-1] の反例と同じ
+            *premises, last = premises
+            conclusion = tree.Not(last)
+        sub = Inference(
+            [Formula.from_tree(premise) for premise in premises], Formula.from_tree(conclusion),
+            engine=self._requested_engine, workers=self.workers, reduce=False,
+        )
+        row = sub.get_counterexample()
+        return None if row is None else {atom: row[atom] for atom in sub.get_all_atoms()}
+
+    def _check_reduced(self) -> bool:
+        """前処理で問題が小さくなるなら、成分ごとに判定して妥当性と反例を記録する
+
+        Returns:
+            前処理した結果で判定したら True (前処理しない・できない場合は False)
+        """
+        if self._reduced is not None:
+            return self._reduced
+        if not self.reduce or self.tf_table is not None or self._columns is not None:
+            return False
+        with instrumentation.stage("reduction"):
+            result = reduction.reduce_argument(
+                [premise.symbolic_representation_tree for premise in self.premises],
+                self.conclusion.symbolic_representation_tree,
+            )
+        if result.is_trivial(len(self.premises)):
+            self._reduced = False
+            return False
+        self._reduced = True
+        instrumentation.count("premises_dropped", result.dropped)
+
+        # 前提が矛盾している、または結論が真に決まるなら反例はない
+        assignment: Optional[Dict[str, bool]] = None
+        if not result.inconsistent and result.conclusion is not True:
+            assignment = dict(result.fixed)
+            for component in result.independent:
+                model = self._component_counterexample(component, None)
+                if model is None:
+                    assignment = None
+                    break
+                assignment.update(model)
+        if assignment is not None:
+            if result.conclusion is False:
+                model = self._component_counterexample(result.main, None)
+            else:
+                model = self._component_counterexample(result.main, result.conclusion)
+            if model is None:
+                assignment = None
+            else:
+                assignment.update(model)
+
+        self._is_semantically_valid = assignment is None
+        if assignment is not None:
+            # 簡約で消えた文記号はどちらの値でもよいので偽にする
+            row = {atom: assignment.get(atom, False) for atom in sorted(self.get_all_atoms())}
+            for idx in range(len(self.premises)):
+                row[f"premise_{idx}"] = True
+            row["conclusion"] = False
+            self._reduced_counterexample_row = row
+        return True
+
+    def _check_cache(self) -> bool:
+        """判定結果のキャッシュを引き、なければ判定してキャッシュに保存する
+
+        キャッシュの反例は文記号の名前を付け替えた推論のものかもしれないので、
+        真偽値表の最初の行の反例とは限らない。
+
+        Returns:
+            キャッシュを使って妥当性と反例を記録したら True
+        """
+        if self.cache is None or self._cache_state is False:
+            return False
+        if self._cache_state or (not self._cache_missed and self._lookup_cache()):
+            return True
+        self._cache_state = False
+        valid = self.is_semantically_valid()
+        row = self.get_counterexample()
+        assignment = None if row is None else {atom: row[atom] for atom in self.get_all_atoms()}
+        premises = [premise.symbolic_representation_tree for premise in self.premises]
+        with instrumentation.stage("cache"):
+            self.cache.store(premises, self.conclusion.symbolic_representation_tree, valid, assignment)
+        self._cached_counterexample_row = row
+        self._cache_state = True
+        return True
+
+    def _lookup_cache(self) -> bool:
+        """判定結果のキャッシュを引き、あれば妥当性と反例を記録して True を返す (判定はしない)"""
+        assert self.cache is not None
+        premises = [premise.symbolic_representation_tree for premise in self.premises]
+        with instrumentation.stage("cache"):
+            verdict = self.cache.lookup(premises, self.conclusion.symbolic_representation_tree)
+        if verdict is None:
+            instrumentation.count("cache_misses")
+            self._cache_missed = True
+            return False
+        instrumentation.count("cache_hits")
+        valid, assignment = verdict
+        row = None
+        if assignment is not None:
+            row = {atom: assignment[atom] for atom in sorted(self.get_all_atoms())}
+            for idx in range(len(self.premises)):
+                row[f"premise_{idx}"] = True
+            row["conclusion"] = False
+        self._is_semantically_valid = valid
+        self._cached_counterexample_row = row
+        self._cache_state = True
+        return True
+
+    def cached_validity(self) -> Optional[bool]:
+        """判定結果のキャッシュにある妥当性を返す (キャッシュになければ判定せずに None)"""
+        if self._cache_state:
+            return self._is_semantically_valid
+        if self.cache is None or self._cache_state is False or self._cache_missed or not self._lookup_cache():
+            return None
+        return self._is_semantically_valid
+
     def is_semantically_valid(self) -> bool:
         """意味論的妥当性を判断する
         
@@ -140,29 +608,38 @@ class Inference:
         """
         if self._is_semantically_valid is not None:
             return self._is_semantically_valid
+
+        if self._check_cache():
+            assert self._is_semantically_valid is not None
+            return self._is_semantically_valid
+
+        if self._check_reduced():
+            assert self._is_semantically_valid is not None
+            return self._is_semantically_valid
+
+        if self.engine == "bitwise":
+            # 前提の列の論理積と結論の列の否定の論理積が空なら妥当
+            self._is_semantically_valid = self._counterexample_column() == 0
+            return self._is_semantically_valid
+
+        if self.engine == "parallel":
+            self._is_semantically_valid = self._parallel_counterexample_index() < 0
+            return self._is_semantically_valid
+
+        if self.engine in ("sat", "bdd"):
+            self._solve()
+            assert self._is_semantically_valid is not None
+            return self._is_semantically_valid
         
-        # 真偽値表が生成されていなければ生成する
+        # 真偽値表が生成されていなければ、表を作らずに最初の反例を探す
         if self.tf_table is None:
-            self.generate_truth_table()
-        
-        # この時点で tf_table は None ではない
-        assert self.tf_table is not None
-        
-        # 全ての行をチェック
-        for row in self.tf_table:
-            # 全ての前提が真かチェック
-            all_premises_true = all(
-                row[f"premise_{idx}"] for idx in range(len(self.premises))
-            )
-            
-            # 全ての前提が真なのに結論が偽の行があれば、意味論的に妥当でない
-            if all_premises_true and not row["conclusion"]:
-                self._is_semantically_valid = False
-                return False
+            self._is_semantically_valid = self._first_counterexample_row() is None
+            return self._is_semantically_valid
         
-        # 全ての行で条件を満たせば意味論的に妥当
-        self._is_semantically_valid = True
-        return True
+        # 全ての前提が真なのに結論が偽の行があれば、意味論的に妥当でない
+        with instrumentation.stage("validity"):
+            self._is_semantically_valid = self.tf_table.counterexample_column() == 0
+        return self._is_semantically_valid
     
     def get_counterexample(self) -> Optional[Dict]:
         """反例(全ての前提が真だが結論が偽である行)を取得する
@@ -170,21 +647,115 @@ class Inference:
         Returns:
             反例があればその行を返し、なければ None を返す
         """
+        if self._check_cache():
+            return self._cached_counterexample_row
+
+        if self._check_reduced():
+            return self._reduced_counterexample_row
+
+        if self.engine == "bitwise":
+            i = columns.lowest_row(self._counterexample_column())
+            return None if i < 0 else self._row_from_columns(i)
+
+        if self.engine == "parallel":
+            i = self._parallel_counterexample_index()
+            return None if i < 0 else self._counterexample_row(i)
+
+        if self.engine in ("sat", "bdd"):
+            if self._is_semantically_valid is None:
+                self._solve()
+            return self._solved_counterexample_row
+
+        # 真偽値表が生成されていなければ、表を作らずに最初の反例を探す
         if self.tf_table is None:
-            self.generate_truth_table()
-        
-        # この時点で tf_table は None ではない
-        assert self.tf_table is not None
+            return self._first_counterexample_row()
         
-        for row in self.tf_table:
-            all_premises_true = all(
-                row[f"premise_{idx}"] for idx in range(len(self.premises))
-            )
-            if all_premises_true and not row["conclusion"]:
-                return row
-        
-        return None
+        i = columns.lowest_row(self.tf_table.counterexample_column())
+        return None if i < 0 else dict(self.tf_table[i])
     
+    def count_models(self) -> int:
+        """全ての前提が真になる行の数
+
+        真偽値表の列を計算済みならその真の行を数え、そうでなければ行を数え上げずに
+        BDD の経路の数から求める (BDD が大きすぎるときは列を計算する)。
+        """
+        if self._columns is None:
+            try:
+                manager, premises, _ = self._counterexample_bdd()
+                return manager.count(premises)
+            except MemoryError:
+                pass
+        _, premise_columns, _, mask = self._compute_columns()
+        models = mask
+        for column in premise_columns:
+            models &= column
+        return bin(models).count("1")
+
+    def count_counterexamples(self) -> int:
+        """反例 (全ての前提が真だが結論が偽である行) の数 (求め方は count_models と同じ)"""
+        if self._columns is None:
+            try:
+                manager, _, bad = self._counterexample_bdd()
+                return manager.count(bad)
+            except MemoryError:
+                pass
+        return bin(self._counterexample_column()).count("1")
+
+    def iter_counterexamples(self, offset: int = 0, limit: int = MAX_CUBES) -> Iterator[Dict[str, Optional[bool]]]:
+        """反例を、互いに重ならない部分的な割り当てにまとめて返す
+
+        各割り当ては {原子文: 真偽値} の辞書で、値が None の原子文はどちらの値でもよい
+        (P=T, Q=*, R=F なら2行分の反例)。BDD の経路から作るので、まとめ方は BDD の変数順による。
+        BDD が大きすぎるときは列から1行ずつ (None を含まない割り当てで) 返す。
+
+        Args:
+            offset: 読み飛ばす割り当ての数
+            limit: 返す割り当ての数の上限 (MAX_CUBES 以下)
+        """
+        if offset < 0:
+            raise ValueError(f"offset は 0 以上でなければなりません: {offset}")
+        if not 0 <= limit <= self.MAX_CUBES:
+            raise ValueError(f"limit は 0 以上 {self.MAX_CUBES} 以下でなければなりません: {limit}")
+        return self._iter_cubes(offset, limit)
+
+    def _iter_cubes(self, offset: int, limit: int) -> Iterator[Dict[str, Optional[bool]]]:
+        atoms = sorted(self.get_all_atoms())
+        try:
+            manager, _, bad = self._counterexample_bdd()
+        except MemoryError:
+            column = self._counterexample_column()
+            n = len(atoms)
+            for _ in range(offset):
+                column &= column - 1
+            for _ in range(limit):
+                i = columns.lowest_row(column)
+                if i < 0:
+                    return
+                yield {atom: bool((i >> (n - 1 - j)) & 1) for j, atom in enumerate(atoms)}
+                column &= column - 1
+            return
+        for cube in islice(manager.cubes(bad), offset, offset + limit):
+            yield {atom: cube.get(atom) for atom in atoms}
+
+    def find_proof(self, max_nodes: int = proof.MAX_NODES, timeout: Optional[float] = None,
+                   max_lines: int = proof.MAX_LINES) -> Optional["proof.Proof"]:
+        """意味論的に妥当な推論の演繹 (推論規則と CD・ID による証明) を探す
+
+        Args:
+            max_nodes: 探索する状態の数の上限
+            timeout: 探索の制限時間 (秒)
+            max_lines: 演繹の行数 (前提の行を除く) の上限
+
+        Returns:
+            見つかった演繹 (max_lines 行以内の演繹がなければ None)
+        """
+        if not self.is_semantically_valid():
+            raise ValueError("意味論的に妥当でない推論の演繹は構成できません")
+        premises = [premise.symbolic_representation_tree for premise in self.premises]
+        conclusion = self.conclusion.symbolic_representation_tree
+        assert conclusion is not None and all(premise is not None for premise in premises)
+        return proof.find_proof(premises, conclusion, max_nodes, timeout, max_lines)
+
     def print_truth_table(self):
         """真偽値表を見やすく表示する"""
         if self.tf_table is None:
@@ -200,7 +771,7 @@ class Inference:
         print(" | ".join(header))
         print("-" * (len(" | ".join(header))))
         
-        # 各行を表示
+        # 各行を表示 (行は表示する直前に1行ずつ作る)
         for row in self.tf_table:
             values = []
             for atom in atoms:
@@ -209,3 +780,237 @@ class Inference:
                 values.append("T" if row[f"premise_{idx}"] else "F")
             values.append("T" if row["conclusion"] else "F")
             print(" | ".join(values))
+
+
+def format_cube(cube: Dict[str, Optional[bool]]) -> str:
+    """部分的な割り当てを P=T, Q=*, R=F の形の文字列にする"""
+    return ", ".join(f"{atom}={'*' if value is None else 'T' if value else 'F'}" for atom, value in cube.items())
+
+
+class IncrementalInference:
+    """前提の追加・削除や結論の差し替えのたびに、変わった記号文だけを評価し直す推論
+
+    記号文ごとに真偽値表の列 (多倍長整数) を1つずつ持ち、妥当性はそれらの列の
+    論理積から求め直す。内部の列の行番号では、原子文を現れた順に下位ビットから並べる
+    (k 番目に現れた原子文が行番号の k ビット目)。新しい原子文は最上位ビットになるので、
+    既存の列は評価し直さず、列を2回並べる (column | column << 2^n) だけで広げられる。
+    どの記号文にも現れなくなった原子文は編集のたびに取り除き、空いたビットに上位の原子文を
+    移す (評価し直すのは移した原子文を含む記号文だけ)。
+    反例の行は Inference と同じく、ソートした原子文の順で最初の行を返す。
+
+    Attributes:
+        premises: 前提のリスト (add_premise, remove_premise で変更する)
+        conclusion: 結論 (replace_conclusion で変更する)
+    """
+    def __init__(self, premises: Sequence[Formula] = (), conclusion: Optional[Formula] = None,
+                 max_atoms: int = Inference.SAT_ATOM_THRESHOLD):
+        """
+        Args:
+            premises: 最初の前提
+            conclusion: 最初の結論 (省略時は判定の前に replace_conclusion で与える)
+            max_atoms: 列を持てる原子文の数の上限 (列の長さは 2^原子文の数 ビット)
+        """
+        self.premises: List[Formula] = []
+        self.conclusion: Optional[Formula] = None
+        self.max_atoms = max_atoms
+        # 現れた順の原子文と、内部の行番号での各原子文の列
+        self._atoms: List[str] = []
+        self._atom_columns: Dict[str, int] = {}
+        self._mask = columns.table_mask(0)
+        self._premise_columns: List[int] = []
+        self._conclusion_column = 0
+        self._counterexample: Optional[int] = None
+        for premise in premises:
+            self.add_premise(premise)
+        if conclusion is not None:
+            self.replace_conclusion(conclusion)
+
+    def _check(self, formula: Formula, others: Sequence[Formula]) -> tree.Node:
+        """記号文を確かめ、others と合わせた原子文の数が上限以下かを調べる"""
+        if not formula.is_well_formed or formula.symbolic_representation_tree is None:
+            raise ValueError(f"整形式でない記号文です: {formula.input_string}")
+        node = formula.symbolic_representation_tree
+        if tree.has_quantifier(node):
+            raise ValueError("量化子を含む推論は modelfinder.find_countermodel で判定してください")
+        atoms = set(node.atoms)
+        for other in others:
+            atoms.update(other.get_atoms())
+        if len(atoms) > self.max_atoms:
+            raise MemoryError(f"原子文の数が上限 ({self.max_atoms}) を超えます")
+        return node
+
+    def _widen(self, atom: str):
+        """原子文を最上位ビットとして加え、既存の列を広げる"""
+        width = 1 << len(self._atoms)
+        self._premise_columns = [column | (column << width) for column in self._premise_columns]
+        self._conclusion_column |= self._conclusion_column << width
+        for name, column in self._atom_columns.items():
+            self._atom_columns[name] = column | (column << width)
+        # 新しい原子文は後半の 2^n 行で真
+        self._atom_columns[atom] = ((1 << width) - 1) << width
+        self._atoms.append(atom)
+        self._mask = columns.table_mask(len(self._atoms))
+
+    def _shrink(self):
+        """どの記号文にも現れなくなった原子文を取り除き、行番号のビットを詰める
+
+        使われている原子文が n 個なら、下位 n ビットにある原子文はそのままにし、
+        空いた位置には上位のビットの原子文を移す。列は取り除いた原子文にも
+        上位のビットにも依らなければ前半の 2^n 行だけを残せばよく、
+        移した原子文を含む記号文の列だけを評価し直す。
+        """
+        used = self.get_all_atoms()
+        n = len(used)
+        if n == len(self._atoms):
+            return
+        atoms = self._atoms[:n]
+        moved = [atom for atom in self._atoms[n:] if atom in used]
+        holes = [j for j, atom in enumerate(atoms) if atom not in used]
+        for j, atom in zip(holes, moved):
+            atoms[j] = atom
+        mask = columns.table_mask(n)
+        atom_columns = {atom: self._atom_columns[atom] & mask for atom in atoms if atom not in moved}
+        for j in holes:
+            # 内部の行番号では j 番目の原子文が j ビット目
+            atom_columns[atoms[j]] = columns.atom_column(n - 1 - j, n)
+        self._atoms, self._atom_columns, self._mask = atoms, atom_columns, mask
+
+        def refit(formula: Optional[Formula], column: int) -> int:
+            if formula is None:
+                return 0
+            if formula.get_atoms().isdisjoint(moved):
+                return column & mask
+            assert formula.symbolic_representation_tree is not None
+            return self._evaluate(formula.symbolic_representation_tree)
+
+        self._premise_columns = [refit(f, c) for f, c in zip(self.premises, self._premise_columns)]
+        self._conclusion_column = refit(self.conclusion, self._conclusion_column)
+
+    def _evaluate(self, node: tree.Node) -> int:
+        """記号文の列を現在の原子文の列から計算する"""
+        memo: Dict[tree.Node, int] = {}
+        with instrumentation.stage("columns"):
+            column = columns.evaluate_column(node, self._atom_columns, self._mask, memo)
+        instrumentation.count("rows_evaluated", 2 ** len(self._atoms))
+        instrumentation.count("node_evaluations", len(memo))
+        return column
+
+    def _column(self, node: tree.Node) -> int:
+        """記号文の列を作る (同じ記号文の列を持っていれば使い回す)"""
+        for formula, column in zip(self.premises, self._premise_columns):
+            if formula.symbolic_representation_tree is node:
+                return column
+        if self.conclusion is not None and self.conclusion.symbolic_representation_tree is node:
+            return self._conclusion_column
+        new_atoms = node.atoms - self._atom_columns.keys()
+        if len(self._atoms) + len(new_atoms) > self.max_atoms:
+            # 差し替えで使われなくなった原子文を先に取り除いて、列が上限より広くならないようにする
+            self._shrink()
+            new_atoms = node.atoms - self._atom_columns.keys()
+        for atom in sorted(new_atoms):
+            self._widen(atom)
+        return self._evaluate(node)
+
+    def _check_index(self, index: int):
+        if not -len(self.premises) <= index < len(self.premises):
+            raise ValueError(f"前提の番号が範囲外です: {index}")
+
+    def add_premise(self, premise: Formula) -> int:
+        """前提を末尾に加え、その番号を返す"""
+        others = self.premises + ([self.conclusion] if self.conclusion is not None else [])
+        column = self._column(self._check(premise, others))
+        self.premises.append(premise)
+        self._premise_columns.append(column)
+        self._counterexample = None
+        return len(self.premises) - 1
+
+    def remove_premise(self, index: int) -> Formula:
+        """index 番目の前提を取り除いて返す"""
+        self._check_index(index)
+        premise = self.premises.pop(index)
+        del self._premise_columns[index]
+        self._shrink()
+        self._counterexample = None
+        return premise
+
+    def replace_premise(self, index: int, premise: Formula) -> Formula:
+        """index 番目の前提を差し替え、元の前提を返す"""
+        self._check_index(index)
+        index %= len(self.premises)
+        others = self.premises[:index] + self.premises[index + 1:]
+        node = self._check(premise, others + ([self.conclusion] if self.conclusion is not None else []))
+        # 元の前提を外してから列を作る (元の前提だけにあった原子文を _column で取り除けるように)
+        old = self.premises.pop(index)
+        del self._premise_columns[index]
+        column = self._column(node)
+        self.premises.insert(index, premise)
+        self._premise_columns.insert(index, column)
+        self._shrink()
+        self._counterexample = None
+        return old
+
+    def replace_conclusion(self, conclusion: Formula) -> Optional[Formula]:
+        """結論を差し替え、元の結論 (なければ None) を返す"""
+        node = self._check(conclusion, self.premises)
+        old = self.conclusion
+        self.conclusion = None
+        column = self._column(node)
+        self.conclusion = conclusion
+        self._conclusion_column = column
+        self._shrink()
+        self._counterexample = None
+        return old
+
+    def get_all_atoms(self) -> set:
+        """推論に含まれる全ての原子文を取得する"""
+        atoms = set()
+        for premise in self.premises:
+            atoms.update(premise.get_atoms())
+        if self.conclusion is not None:
+            atoms.update(self.conclusion.get_atoms())
+        return atoms
+
+    def _counterexample_column(self) -> int:
+        """全ての前提が真かつ結論が偽である行のビットが立った列 (内部の行番号)"""
+        if self.conclusion is None:
+            raise ValueError("結論がありません")
+        if self._counterexample is None:
+            with instrumentation.stage("validity"):
+                bad = self._conclusion_column ^ self._mask
+                for column in self._premise_columns:
+                    bad &= column
+            self._counterexample = bad
+        return self._counterexample
+
+    def is_semantically_valid(self) -> bool:
+        """意味論的妥当性を、記号文ごとの列から判断する"""
+        return self._counterexample_column() == 0
+
+    def get_counterexample(self) -> Optional[Dict]:
+        """反例を Inference.get_counterexample と同じ行の形式で返す (なければ None)"""
+        bad = self._counterexample_column()
+        if bad == 0:
+            return None
+        # ソートした原子文の順に、偽にしても反例が残るなら偽に決める
+        # (ソートした順の行番号で最初の反例の行になる)
+        row: Dict[str, bool] = {}
+        with instrumentation.stage("validity"):
+            for atom in sorted(self.get_all_atoms()):
+                rest = bad & ~self._atom_columns[atom]
+                row[atom] = rest == 0
+                if rest:
+                    bad = rest
+        for idx in range(len(self.premises)):
+            row[f"premise_{idx}"] = True
+        row["conclusion"] = False
+        return row
+
+    def to_inference(self, **options) -> Inference:
+        """現在の前提と結論の Inference を作る (真偽値表や演繹が必要なとき)
+
+        Args:
+            **options: Inference に渡す引数 (engine など)
+        """
+        if self.conclusion is None:
+            raise ValueError("結論がありません")
+        return Inference(list(self.premises), self.conclusion, **options)
@@ -0,0 +1,144 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+# 処理の段階ごとの所要時間と、処理量のカウンタを記録する (明示的に有効にした場合のみ)
+#
+#     with instrumentation.collect() as stats:
+#         Inference(premises, conclusion).is_semantically_valid()
+#     stats.as_dict()
+#     # {"stages": {"lex": ..., "parse": ..., "columns": ..., "validity": ...},
+#     #  "counters": {"tokens": ..., "rows_evaluated": ..., ...}}
+#
+# 段階は重ならないように区切る:
+#   lex          字句解析
+#   parse        構文解析
+#   cache        判定結果のキャッシュの検索と保存
+#   reduction    推論の前処理 (単位伝播と連結成分への分割)
+#   compile      記号文の Python 関数への変換
+#   columns      ビット列の列の計算
+#   truth_table  真偽値表の行の作成
+#   validity     反例の探索 (列の論理積・1行ずつの探索・SAT・BDD)
+#   proof        演繹の探索
+# カウンタ:
+#   tokens               字句解析で作ったトークンの数
+#   parse_attempts       パースした記号文の数
+#   parse_fallbacks      公式な記号文ではなく、非公式な記号文として受理した数
+#   rows_evaluated       評価した真偽値表の行の数 (ビット演算では列の行数)
+#   node_evaluations     列単位で評価した記号文の節点の数
+#   formula_evaluations  1行ずつの評価で記号文の関数を呼んだ回数
+#   early_exits          全ての行を調べる前に探索を打ち切った回数
+#   sat_conflicts        SAT ソルバで起きた矛盾の回数
+#   bdd_nodes            BDD で作った節点の数
+#   premises_dropped     前処理で取り除いた前提の数
+#   cache_hits           判定結果のキャッシュにあった推論の数
+#   cache_misses         判定結果のキャッシュになかった推論の数
+#   proof_nodes          演繹の探索で調べた状態の数
+
+
+class Stats:
+    """段階ごとの所要時間 (秒)・回数とカウンタ"""
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+
+    def add_time(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other: "Stats"):
+        for stage, seconds in other.timings.items():
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        for stage, n in other.calls.items():
+            self.calls[stage] = self.calls.get(stage, 0) + n
+        for name, n in other.counters.items():
+            self.count(name, n)
+
+    def as_dict(self) -> Dict[str, Dict]:
+        return {"stages": dict(self.timings), "calls": dict(self.calls), "counters": dict(self.counters)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict]) -> "Stats":
+        stats = cls()
+        stats.timings.update(data.get("stages", {}))
+        stats.calls.update(data.get("calls", {}))
+        stats.counters.update(data.get("counters", {}))
+        return stats
+
+
+_current: ContextVar[Optional[Stats]] = ContextVar("turnstile_stats", default=None)
+
+
+def current() -> Optional[Stats]:
+    """記録中の Stats (記録していなければ None)"""
+    return _current.get()
+
+
+@contextmanager
+def collect(stats: Optional[Stats] = None) -> Iterator[Stats]:
+    """この with 文の中 (同じコンテキスト) で行った処理を stats に記録する"""
+    stats = stats if stats is not None else Stats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """with 文の中の所要時間を段階 name の時間として記録する"""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_time(name, time.perf_counter() - start)
+
+
+def count(name: str, n: int = 1):
+    """カウンタ name を n 増やす"""
+    stats = _current.get()
+    if stats is not None:
+        stats.count(name, n)
+
+
+class Registry:
+    """プロセス全体で集計した Stats (スレッドから同時に加算してよい)"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = Stats()
+
+    def add(self, stats: Stats):
+        with self._lock:
+            self.stats.merge(stats)
+
+    def render_prometheus(self, prefix: str = "turnstile") -> str:
+        """Prometheus のテキスト形式で出力する"""
+        with self._lock:
+            timings = dict(self.stats.timings)
+            calls = dict(self.stats.calls)
+            counters = dict(self.stats.counters)
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Wall time spent in each stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{name}"}} {seconds:.9f}'
+                  for name, seconds in sorted(timings.items())]
+        lines += [
+            f"# HELP {prefix}_stage_calls_total Number of times each stage ran.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        lines += [f'{prefix}_stage_calls_total{{stage="{name}"}} {n}' for name, n in sorted(calls.items())]
+        for name, n in sorted(counters.items()):
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {n}"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,299 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import columns
+import parallel
+import serialize
+from inference import Formula, Inference
+
+# 大きな真偽値表の作成をジョブとして受け付け、バックグラウンドで計算する。
+#
+# 真偽値表を先頭の原子文の値で 2^BLOCK_BITS 行ずつの区画に分け、区画ごとに各前提と
+# 結論の列を計算する (parallel と同じ分け方)。区画の間で取り消しを確かめ、計算済みの
+# 行数を進捗として記録する。結果は区画ごとの列だけを持ち、CSV や NDJSON の行は
+# ダウンロードのときに区画ごとに作って流す。
+#
+# 区画の計算は多倍長整数の演算なので、API のイベントループと GIL を取り合わないように
+# workers 個のワーカープロセスで行う (記号文は serialize のバイト列で渡す)。ジョブごとの
+# スレッドは BATCH_BLOCKS 個ずつ区画をワーカーに渡して結果を待つだけで、それを超えた
+# ジョブは待たせる。保持する列のビット数の合計は max_bits までにする。
+# 終わったジョブは ttl 秒たつと、次にジョブを登録・参照したときに捨てる。
+
+# 1区画の行数 (2^BLOCK_BITS)
+BLOCK_BITS = 12
+# ジョブ1件あたりの文記号の数の上限 (列は 2^MAX_ATOMS ビット × 記号文の数になる)
+MAX_ATOMS = 24
+# 同時に実行するジョブの数
+WORKERS = 2
+# 終わったジョブの結果を保持する秒数
+TTL_SECONDS = 600.0
+# 保持するジョブの数の上限
+MAX_JOBS = 100
+# 保持するジョブの列のビット数の合計の上限 (256 MiB)
+MAX_BITS = 1 << 31
+# ワーカーに1度に渡す区画の数
+BATCH_BLOCKS = 16
+# 結果の形式
+FORMATS = ("csv", "ndjson")
+
+QUEUED, RUNNING, DONE, CANCELLED, FAILED = "queued", "running", "done", "cancelled", "failed"
+
+
+class JobQueueFull(RuntimeError):
+    """実行中や待機中のジョブで上限まで埋まっている"""
+
+
+def _evaluate_blocks(data: bytes, atoms: Tuple[str, ...], k: int, start: int,
+                     stop: int) -> List[Tuple[List[int], int, int]]:
+    """接頭辞 start, ..., stop-1 の区画の (各記号文の列, 反例の数, 区画の中の最初の反例の行 (なければ -1))
+    を返す (ワーカーで実行する)"""
+    mask = columns.table_mask(len(atoms) - k)
+    results = []
+    for prefix in range(start, stop):
+        block = parallel.shard_columns(data, atoms, k, prefix)
+        bad = block[-1] ^ mask
+        for column in block[:-1]:
+            bad &= column
+        results.append((block, bin(bad).count("1"), columns.lowest_row(bad)))
+    return results
+
+
+class Job:
+    """真偽値表を作るジョブ
+
+    Attributes:
+        id: ジョブの ID
+        premises, conclusion: 推論の記号文
+        atoms: ソート済みの原子文
+        status: queued, running, done, cancelled, failed のいずれか
+        rows_total: 真偽値表の行数
+        rows_evaluated: 計算済みの行数
+        counterexamples: 計算済みの行のうち反例の数
+        cached_valid: 登録したときに判定結果のキャッシュにあった妥当性 (なければ None)
+        error: 失敗した理由
+    """
+    def __init__(self, inference: Inference):
+        self.id = uuid.uuid4().hex
+        self.premises: List[Formula] = list(inference.premises)
+        self.conclusion: Formula = inference.conclusion
+        self.atoms: List[str] = sorted(inference.get_all_atoms())
+        self.status = QUEUED
+        self.rows_total = 1 << len(self.atoms)
+        # 1区画の行数は 2^block_bits (登録したときの BLOCK_BITS で決める)
+        self.block_bits = min(BLOCK_BITS, len(self.atoms))
+        self.rows_evaluated = 0
+        self.counterexamples = 0
+        # 全行を計算し終えたら判定結果をキャッシュに保存する
+        self.cache = inference.cache
+        self.cached_valid = inference.cached_validity()
+        # 最初の反例の行番号
+        self.first_counterexample: Optional[int] = None
+        self.error: Optional[str] = None
+        self.finished_at: Optional[float] = None
+        # 区画ごとの [各前提の列, ..., 結論の列]
+        self.blocks: List[List[int]] = []
+        self._cancel = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """状態を JSON にできる辞書で返す"""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "atoms": self.atoms,
+            "rows_total": self.rows_total,
+            "rows_evaluated": self.rows_evaluated,
+            "counterexamples": self.counterexamples,
+            # 全行を計算し終えるか、判定結果のキャッシュにあれば妥当性が決まる
+            "valid": self.counterexamples == 0 if self.status == DONE else self.cached_valid,
+            "error": self.error,
+        }
+
+    @property
+    def bits(self) -> int:
+        """結果として保持する (または保持する予定の) 列のビット数"""
+        if self.status in (CANCELLED, FAILED):
+            return 0
+        return (len(self.premises) + 1) * self.rows_total
+
+    def run(self, pool: ProcessPoolExecutor):
+        """区画ごとの列をワーカープロセスで計算する (ジョブごとのスレッドで実行する)"""
+        if self._cancel.is_set():
+            return
+        self.status = RUNNING
+        try:
+            m = self.block_bits
+            k = len(self.atoms) - m
+            nodes = [formula.symbolic_representation_tree for formula in [*self.premises, self.conclusion]]
+            data = serialize.dumps(nodes)
+            atoms = tuple(self.atoms)
+            for start in range(0, 1 << k, BATCH_BLOCKS):
+                if self._cancel.is_set():
+                    self.status = CANCELLED
+                    self.blocks = []
+                    return
+                stop = min(start + BATCH_BLOCKS, 1 << k)
+                for block, counterexamples, lowest in pool.submit(_evaluate_blocks, data, atoms, k, start, stop).result():
+                    if self.first_counterexample is None and lowest >= 0:
+                        self.first_counterexample = (len(self.blocks) << m) | lowest
+                    self.blocks.append(block)
+                    self.counterexamples += counterexamples
+                    self.rows_evaluated += 1 << m
+            self.status = DONE
+            self._store_verdict(nodes)
+        except Exception as e:
+            self.status = FAILED
+            self.error = str(e)
+            self.blocks = []
+        finally:
+            self.finished_at = time.monotonic()
+
+    def _store_verdict(self, nodes: List):
+        """全行を計算し終えた推論の妥当性と最初の反例を判定結果のキャッシュに保存する"""
+        if self.cache is None or self.cached_valid is not None:
+            return
+        assignment = None
+        if self.first_counterexample is not None:
+            n = len(self.atoms)
+            assignment = {atom: bool((self.first_counterexample >> (n - 1 - j)) & 1)
+                          for j, atom in enumerate(self.atoms)}
+        self.cache.store(nodes[:-1], nodes[-1], self.counterexamples == 0, assignment)
+
+    def cancel(self):
+        self._cancel.set()
+        if self.status == QUEUED:
+            self.status = CANCELLED
+            self.finished_at = time.monotonic()
+            self.blocks = []
+
+    def iter_rows(self) -> Iterator[Dict[str, bool]]:
+        """計算済みの行を Inference.iter_truth_table と同じ形で1行ずつ返す"""
+        keys = [f"premise_{idx}" for idx in range(len(self.premises))] + ["conclusion"]
+        for values in self._iter_values():
+            yield dict(zip(self.atoms + keys, values))
+
+    def _iter_values(self) -> Iterator[List[bool]]:
+        """各行の [原子文の値, ..., 各前提の値, ..., 結論の値]"""
+        n = len(self.atoms)
+        m = self.block_bits
+        size = 1 << m
+        for prefix, block in enumerate(self.blocks):
+            # 区画の列を行の順の文字列にしてから1行ずつ読む
+            bits = [format(column, f"0{size}b")[::-1] for column in block]
+            for r in range(size):
+                i = (prefix << m) | r
+                values = [bool((i >> (n - 1 - j)) & 1) for j in range(n)]
+                values += [b[r] == "1" for b in bits]
+                yield values
+
+    def iter_csv(self) -> Iterator[str]:
+        """print_truth_table と同じ見出しと T/F の CSV を、区画ごとのまとまりで返す"""
+        header = self.atoms + [f"P{i + 1}" for i in range(len(self.premises))] + ["C"]
+        yield ",".join(header) + "\n"
+        m = self.block_bits
+        k = len(self.atoms) - m
+        size = 1 << m
+        to_tf = str.maketrans("01", "FT")
+        # 区画の中で変わる原子文の値の並びは、どの区画でも同じ
+        low = [",".join("T" if (r >> (m - 1 - j)) & 1 else "F" for j in range(m)) for r in range(size)]
+        for prefix, block in enumerate(self.blocks):
+            top = "".join("T," if (prefix >> (k - 1 - j)) & 1 else "F," for j in range(k))
+            bits = [format(column, f"0{size}b")[::-1].translate(to_tf) for column in block]
+            lines = [
+                top + (low[r] + "," if m else "") + ",".join(b[r] for b in bits) + "\n"
+                for r in range(size)
+            ]
+            yield "".join(lines)
+
+    def iter_ndjson(self) -> Iterator[str]:
+        """1行ずつ iter_rows の辞書を JSON にしたものを、区画ごとのまとまりで返す"""
+        keys = self.atoms + [f"premise_{idx}" for idx in range(len(self.premises))] + ["conclusion"]
+        size = 1 << self.block_bits
+        chunk = []
+        for count, values in enumerate(self._iter_values(), 1):
+            chunk.append(json.dumps(dict(zip(keys, values))) + "\n")
+            if count % size == 0:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+
+
+class JobQueue:
+    """ジョブの登録・参照・取り消しと、実行するスレッドの管理
+
+    Args:
+        workers: 同時に実行するジョブの数
+        ttl: 終わったジョブを保持する秒数
+        max_jobs: 保持するジョブの数の上限
+        max_atoms: ジョブ1件あたりの文記号の数の上限
+        max_bits: 保持するジョブの列のビット数の合計の上限
+    """
+    def __init__(self, workers: int = WORKERS, ttl: float = TTL_SECONDS, max_jobs: int = MAX_JOBS,
+                 max_atoms: int = MAX_ATOMS, max_bits: int = MAX_BITS):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.max_atoms = max_atoms
+        self.max_bits = max_bits
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        """保持期限の過ぎたジョブを捨てる"""
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and now - job.finished_at >= self.ttl:
+                del self._jobs[job_id]
+
+    def submit(self, premises: List[str], conclusion: str) -> Job:
+        """推論の真偽値表を作るジョブを登録する
+
+        Raises:
+            ValueError: 記号文でない、文記号が多すぎる、または結果が max_bits より大きい
+            JobQueueFull: 終わったジョブを捨てても、ジョブの数か列のビット数が上限を超える
+        """
+        inference = Inference([Formula(text) for text in premises], Formula(conclusion))
+        if len(inference.get_all_atoms()) > self.max_atoms:
+            raise ValueError(f"文記号が多すぎます (上限 {self.max_atoms} 個)")
+        job = Job(inference)
+        if job.bits > self.max_bits:
+            raise ValueError(f"真偽値表が大きすぎます ({job.bits} ビット > {self.max_bits} ビット)")
+        with self._lock:
+            self._evict()
+            # 終わったジョブから古い順に捨てる
+            finished = sorted((j for j in self._jobs.values() if j.finished_at is not None),
+                              key=lambda j: j.finished_at or 0.0)
+            while len(self._jobs) >= self.max_jobs or \
+                    sum(j.bits for j in self._jobs.values()) + job.bits > self.max_bits:
+                if not finished:
+                    raise JobQueueFull(
+                        f"実行中・待機中のジョブが上限 ({self.max_jobs} 件、{self.max_bits} ビット) に達しています"
+                    )
+                del self._jobs[finished.pop(0).id]
+            self._jobs[job.id] = job
+        self._executor.submit(job.run, self._pool)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        """ジョブを返す (ないか期限切れなら KeyError)"""
+        with self._lock:
+            self._evict()
+            return self._jobs[job_id]
+
+    def cancel(self, job_id: str) -> Job:
+        """ジョブを取り消す (実行中なら次の区画の前で止まる)"""
+        job = self.get(job_id)
+        job.cancel()
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,367 @@
+from typing import Any, Callable, Dict, Iterator, List, MutableMapping, Optional, Tuple
+import tree
+from tokenizer import ATOM_PATTERN, PREDICATE_PATTERN, SYMBOL_MAP, TERM_PATTERN, TOKEN_PATTERN
+from tokenizer import InformalParser, TokenStream, TokenType
+
+# 入力中の記号文を1文字ごとに判定する (WebSocket の /ws/formula から使う)
+#
+# 前回の入力のトークン列 (文字列上の位置つき) と、読み終えた括弧の木を覚えておき、
+# 入力が変わったら次のように差分だけを処理する。
+# 1. 前回の入力と共通の先頭と末尾を除いた部分を書き換えられた範囲とする。
+# 2. 書き換えられた範囲より少し前のトークンから字句解析をやり直し、前回のトークンと
+#    位置 (書き換えで生じたずれを除く) と内容が一致したところで打ち切り、残りは前回の
+#    トークンをそのまま使う。
+# 3. 書き換えられたトークンを含まない括弧の木はそのまま残し、それを読み飛ばしながら
+#    全体を読み直す。読み直すのは書き換えられたトークンを囲む括弧の外側だけになる。
+# 結果は Formula と同じ判定 (整形式か、公式か、公式な表記、エラー) に、
+# エラーになったトークンの文字列上の位置を加えたもの。
+#
+# 書き換えのたびに後ろのトークンの位置や括弧の番号をずらすと入力の長さに比例する時間が
+# かかるので、トークン列に境目 (gap) を置き、境目より後ろのトークンの位置と括弧の番号は
+# ずれの分を引いたまま持つ。書き換えでは境目を書き換えた位置まで動かし (動かした間の
+# トークンだけを直す)、ずれの量を変えるだけにする。種類と値の配列も作り直さずに
+# 書き換えた範囲だけを入れ替え、そのまま TokenStream に渡す。
+
+# 正規表現が1つのトークンを読むときに、トークンの終わりより先を調べる文字数の上限
+# (最長の記号 "forall" と、読みかけの "P_" の後の1文字、前後の空白の1文字)
+LOOKAHEAD = max(len(symbol) for symbol in SYMBOL_MAP) + 2
+
+
+class _Token:
+    """位置つきのトークン
+
+    Attributes:
+        start, end: 正規表現の一致の範囲 (前後の空白を含む)
+        position: トークン自体の開始位置
+    """
+    __slots__ = ("start", "end", "position", "type", "value")
+
+    def __init__(self, start: int, end: int, position: int, type: TokenType, value: str):
+        self.start = start
+        self.end = end
+        self.position = position
+        self.type = type
+        self.value = value
+
+    def shift(self, delta: int):
+        self.start += delta
+        self.end += delta
+        self.position += delta
+
+
+class _Groups(MutableMapping[int, Tuple[int, tree.Node, bool]]):
+    """読み終えた括弧の木 (InformalParser の groups として渡す)
+
+    開き括弧のトークンの番号 -> (閉じ括弧の次の番号, 括弧内の木, 括弧内が公式か)。
+    番号が gap より前の括弧は before に番号のまま、gap 以降の括弧は after に番号から
+    shift を引いて持つ。閉じ括弧は開き括弧からのトークンの数で持つ (括弧の中が
+    書き換えられたら捨てるので、この数は変わらない)。
+    """
+    def __init__(self):
+        self.gap = 0
+        self.shift = 0
+        self.before: Dict[int, Tuple[int, tree.Node, bool]] = {}
+        self.after: Dict[int, Tuple[int, tree.Node, bool]] = {}
+
+    def _table(self, index: int) -> Tuple[Dict[int, Tuple[int, tree.Node, bool]], int]:
+        if index < self.gap:
+            return self.before, index
+        return self.after, index - self.shift
+
+    def __getitem__(self, index: int) -> Tuple[int, tree.Node, bool]:
+        table, key = self._table(index)
+        length, node, formal = table[key]
+        return index + length, node, formal
+
+    def __setitem__(self, index: int, value: Tuple[int, tree.Node, bool]):
+        close_end, node, formal = value
+        table, key = self._table(index)
+        table[key] = (close_end - index, node, formal)
+
+    def __delitem__(self, index: int):
+        table, key = self._table(index)
+        del table[key]
+
+    def __contains__(self, index: object) -> bool:
+        if not isinstance(index, int):
+            return False
+        table, key = self._table(index)
+        return key in table
+
+    def __iter__(self) -> Iterator[int]:
+        yield from self.before
+        for key in self.after:
+            yield key + self.shift
+
+    def __len__(self) -> int:
+        return len(self.before) + len(self.after)
+
+    def move(self, gap: int):
+        """境目を gap 番目のトークンの前に動かす"""
+        if gap > self.gap:
+            for index in range(self.gap, gap):
+                entry = self.after.pop(index - self.shift, None)
+                if entry is not None:
+                    self.before[index] = entry
+        else:
+            for index in range(gap, self.gap):
+                entry = self.before.pop(index, None)
+                if entry is not None:
+                    self.after[index - self.shift] = entry
+        self.gap = gap
+
+    def replace(self, first: int, stop: int, count: int):
+        """first..stop-1 番目のトークンが count 個のトークンに置き換わった (境目は stop にあること)
+
+        置き換えた範囲に開き括弧か閉じ括弧がある括弧を捨て、境目を置き換えた範囲の後ろに動かす。
+        """
+        for index in range(first, stop):
+            self.before.pop(index, None)
+        # 前から括弧を読み飛ばしながら first に向かい、first を囲む括弧を捨てる
+        index = 0
+        while index < first:
+            entry = self.before.get(index)
+            if entry is None:
+                index += 1
+            elif index + entry[0] <= first:
+                index += entry[0]
+            else:
+                del self.before[index]
+                index += 1
+        self.gap = first + count
+        self.shift += count - (stop - first)
+
+
+def _classify(raw: str) -> Optional[TokenType]:
+    """TokenStream と同じ規則でトークンの種類を決める (未知のトークンなら None)"""
+    token_type = SYMBOL_MAP.get(raw)
+    if token_type is not None:
+        return token_type
+    if ATOM_PATTERN.fullmatch(raw):
+        return TokenType.ATOM
+    if PREDICATE_PATTERN.fullmatch(raw):
+        return TokenType.PREDICATE
+    if TERM_PATTERN.fullmatch(raw):
+        return TokenType.TERM
+    return None
+
+
+class LexError(ValueError):
+    """未知のトークン (position はその文字列上の位置)"""
+    def __init__(self, raw: str, position: int):
+        super().__init__(f"未知のトークン: '{raw}'")
+        self.position = position
+
+
+def _lex(text: str, start: int,
+         resync: Optional[Callable[[int, int, str], Optional[int]]] = None) -> Tuple[List[_Token], Optional[int]]:
+    """text の start 文字目から字句解析する
+
+    resync を渡すと、一致の範囲と内容ごとに呼び、前回のトークンの番号を返したところで打ち切る。
+
+    Returns:
+        (読んだトークン, 打ち切った前回のトークンの番号 (最後まで読んだら None))
+    """
+    tokens: List[_Token] = []
+    position = start
+    for match in TOKEN_PATTERN.finditer(text, start):
+        if match.start() > position:
+            # TokenStream では一致の間の文字列が未知のトークンになる
+            raise LexError(text[position:match.start()], position)
+        raw = match.group(1)
+        if resync is not None:
+            resume = resync(match.start(), match.end(), raw)
+            if resume is not None:
+                return tokens, resume
+        token_type = _classify(raw)
+        if token_type is None:
+            raise LexError(raw, match.start(1))
+        tokens.append(_Token(match.start(), match.end(), match.start(1), token_type, raw))
+        position = match.end()
+    if position < len(text):
+        raise LexError(text[position:], position)
+    return tokens, None
+
+
+def _common_prefix(a: str, b: str, limit: int) -> int:
+    """a と b の共通の先頭の長さ (limit まで、切り出した文字列どうしを比べて二分探索する)"""
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    """a と b の共通の末尾の長さ (limit まで)"""
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class LiveFormula:
+    """入力中の記号文1つの状態 (update のたびに差分だけを処理する)"""
+    def __init__(self):
+        self.text = ""
+        # 最後に字句解析に成功したトークン列 (失敗していれば None)
+        self._tokens: Optional[List[_Token]] = []
+        # トークンの種類と値 (TokenStream にそのまま渡す)
+        self._types: List[TokenType] = []
+        self._values: List[str] = []
+        # _gap 番目以降のトークンの位置は _offset を足したものが本当の位置
+        self._gap = 0
+        self._offset = 0
+        self._groups = _Groups()
+
+    def _reset(self, tokens: Optional[List[_Token]]):
+        self._tokens = tokens
+        self._types = [token.type for token in tokens or []]
+        self._values = [token.value for token in tokens or []]
+        self._gap = 0
+        self._offset = 0
+        self._groups = _Groups()
+
+    def _delta(self, index: int) -> int:
+        """index 番目のトークンの位置に足すずれ"""
+        return self._offset if index >= self._gap else 0
+
+    def _move_gap(self, gap: int):
+        """境目を gap 番目のトークンの前に動かす (動かした間のトークンの位置を直す)"""
+        tokens = self._tokens
+        if self._offset:
+            if gap > self._gap:
+                for token in tokens[self._gap:gap]:
+                    token.shift(self._offset)
+            else:
+                for token in tokens[gap:self._gap]:
+                    token.shift(-self._offset)
+        self._gap = gap
+        self._groups.move(gap)
+
+    def _resync(self, first: int, delta: int, limit: int) -> Callable[[int, int, str], Optional[int]]:
+        """位置 limit 以降で、前回のトークンを delta だけずらしたものと一致したらその番号を返す関数"""
+        tokens = self._tokens
+        index = first
+
+        def resync(start: int, end: int, value: str) -> Optional[int]:
+            nonlocal index
+            if start < limit:
+                return None
+            while index < len(tokens) and tokens[index].start + self._delta(index) + delta < start:
+                index += 1
+            if index == len(tokens):
+                return None
+            token = tokens[index]
+            shift = self._delta(index) + delta
+            if token.start + shift == start and token.end + shift == end and token.value == value:
+                return index
+            return None
+        return resync
+
+    def _relex(self, text: str):
+        """前回のトークン列のうち、書き換えられた範囲だけを字句解析し直して入れ替える"""
+        old_text = self.text
+        tokens = self._tokens
+        if tokens is None:
+            self._reset(_lex(text, 0)[0])
+            return
+
+        # 前回と共通の先頭と末尾を除いた範囲 [prefix, old_end) が [prefix, new_end) に変わった
+        limit = min(len(old_text), len(text))
+        prefix = _common_prefix(old_text, text, limit)
+        suffix = _common_suffix(old_text, text, limit - prefix)
+        old_end = len(old_text) - suffix
+        new_end = len(text) - suffix
+        delta = new_end - old_end
+
+        # 書き換えられた範囲を調べずに読めたトークンまでは変わらない
+        low, high = 0, len(tokens)
+        while low < high:
+            middle = (low + high) // 2
+            if tokens[middle].end + self._delta(middle) + LOOKAHEAD <= prefix:
+                low = middle + 1
+            else:
+                high = middle
+        first = low
+        if first < len(tokens):
+            start = tokens[first].start + self._delta(first)
+        else:
+            start = tokens[-1].end + self._delta(len(tokens) - 1) if tokens else 0
+        middle_tokens, resume = _lex(text, start, self._resync(first, delta, new_end))
+        if resume is None:
+            resume = len(tokens)
+
+        # 境目を前回のトークンを使い始める位置に動かしてから入れ替える
+        self._move_gap(resume)
+        tokens[first:resume] = middle_tokens
+        self._types[first:resume] = [token.type for token in middle_tokens]
+        self._values[first:resume] = [token.value for token in middle_tokens]
+        self._groups.replace(first, resume, len(middle_tokens))
+        self._gap = first + len(middle_tokens)
+        self._offset += delta
+
+    def update(self, text: str) -> Dict[str, Any]:
+        """入力を text に変え、判定の結果を返す
+
+        Returns:
+            {"input", "well_formed", "formal", "formula", "error",
+             "position": エラーになった文字列上の位置 (エラーがなければ None)}
+        """
+        result: Dict[str, Any] = {
+            "input": text, "well_formed": False, "formal": False,
+            "formula": None, "error": None, "position": None,
+        }
+        if not text or text.strip() == "":
+            self.text = text
+            self._reset([])
+            result["error"] = "入力が空です。記号文ではありません。"
+            return result
+        try:
+            self._relex(text)
+        except LexError as e:
+            self.text = text
+            self._reset(None)
+            result["error"] = f"記号文ではありません: {e}"
+            result["position"] = e.position
+            return result
+        self.text = text
+
+        stream = TokenStream.from_tokens(self._types, self._values)
+        parser = InformalParser(stream, self._groups)
+        try:
+            node = parser.parse()
+        except ValueError as e:
+            result["error"] = f"記号文ではありません: 記号文として解釈できません: {e}"
+            if stream.pos < len(self._types):
+                result["position"] = self._tokens[stream.pos].position + self._delta(stream.pos)
+            else:
+                result["position"] = len(text)
+            return result
+        result.update(well_formed=True, formal=parser.is_formal, formula=repr(node))
+        return result
+
+
+def apply_edit(text: str, edit: Dict[str, Any]) -> str:
+    """編集を文字列に適用する
+
+    Args:
+        edit: {"text": 新しい全体} または {"start": 開始位置, "end": 終了位置, "insert": 挿入する文字列}
+    """
+    if "text" in edit:
+        if not isinstance(edit["text"], str):
+            raise ValueError("text は文字列でなければなりません")
+        return edit["text"]
+    start, end, insert = edit.get("start"), edit.get("end", edit.get("start")), edit.get("insert", "")
+    if not isinstance(start, int) or not isinstance(end, int) or not isinstance(insert, str):
+        raise ValueError("編集は text、または start・end・insert で指定してください")
+    if not 0 <= start <= end <= len(text):
+        raise ValueError(f"編集の範囲が不正です: {start}..{end}")
+    return text[:start] + insert + text[end:]
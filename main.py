@@ -1,8 +1,330 @@
-from fastapi import FastAPI
-from typing import Optional
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
 
-app = FastAPI()
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
-@app.post("/api/turnstile")
-def read_root():
-    return {"Hello": "World"}
+import grading
+import instrumentation
+import jobs
+import live
+from inference import Inference
+
+# 1回のリクエストで受け付ける推論の数
+MAX_ARGUMENTS = 100
+# 推論1件あたりの文記号の数の上限
+MAX_ATOMS = 20
+# 推論1件あたりの処理時間の上限 (秒)
+TIMEOUT_SECONDS = 5.0
+# 真偽値表や妥当性の計算を行うワーカープロセスの数
+MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# 妥当性の判定結果を保存する SQLite のファイル (空文字列ならメモリだけに保持する)
+CACHE_PATH = os.environ.get("TURNSTILE_CACHE_PATH", "turnstile_cache.sqlite3")
+# 反例の部分的な割り当てを1ページに返す既定の数
+CUBES_PER_PAGE = 100
+# 入力中の記号文の判定で、最後の編集からこの時間 (秒) 次の編集がなければ判定する
+DEBOUNCE_SECONDS = 0.03
+# 編集が続いていても、最初の編集からこの時間 (秒) たったら判定する
+MAX_DEBOUNCE_SECONDS = 0.2
+# 入力中の記号文の長さの上限
+MAX_LIVE_LENGTH = 10000
+
+
+class Workers:
+    """判定を行うワーカープロセスのプール
+
+    ワーカーに投入する仕事は MAX_WORKERS 個までにして、それを超えた分はイベントループ側で
+    待たせる。投入した仕事はすぐに実行が始まるので、制限時間は投入したときから数える。
+    制限時間を過ぎた仕事はワーカーごと止める必要があるので、プールを作り直して古いプールの
+    ワーカーを終了させる。同じプールで実行中だった他の仕事は新しいプールでやり直す。
+    """
+    def __init__(self):
+        self.pool = self._new_pool()
+        self.running = asyncio.Semaphore(MAX_WORKERS)
+
+    @staticmethod
+    def _new_pool() -> ProcessPoolExecutor:
+        # 各ワーカーは同じファイルを使う判定結果のキャッシュを持つ
+        return ProcessPoolExecutor(
+            max_workers=MAX_WORKERS, initializer=grading.configure_cache, initargs=(CACHE_PATH or None,)
+        )
+
+    async def run(self, function, *args):
+        """function(*args) をワーカーで実行して結果を返す
+
+        Raises:
+            asyncio.TimeoutError: 実行を始めてから TIMEOUT_SECONDS 以内に終わらなかった
+            BrokenProcessPool: ワーカーが異常終了した
+        """
+        async with self.running:
+            while True:
+                pool = self.pool
+                future = pool.submit(function, *args)
+                try:
+                    return await asyncio.wait_for(asyncio.wrap_future(future), TIMEOUT_SECONDS)
+                except asyncio.TimeoutError:
+                    self._recycle(pool)
+                    raise
+                except BrokenProcessPool:
+                    if pool is self.pool:
+                        self._recycle(pool)
+                        raise
+                    # 他の仕事の打ち切りでプールが作り直されたので、新しいプールでやり直す
+
+    def _recycle(self, pool: ProcessPoolExecutor):
+        """プールを作り直し、古いプールのワーカーを終了させる"""
+        if pool is not self.pool:
+            return
+        self.pool = self._new_pool()
+        self._terminate(pool)
+
+    @staticmethod
+    def _terminate(pool: ProcessPoolExecutor):
+        terminate = getattr(pool, "terminate_workers", None)
+        if terminate is not None:
+            terminate()
+            return
+        # Python 3.14 より前はワーカーを止める公開の方法がない
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def shutdown(self):
+        self._terminate(self.pool)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.workers = Workers()
+    app.state.jobs = jobs.JobQueue()
+    yield
+    app.state.jobs.shutdown()
+    app.state.workers.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+# ワーカーから返された段階ごとの所要時間とカウンタを、プロセス全体で集計する
+metrics = instrumentation.Registry()
+
+
+class Argument(BaseModel):
+    premises: List[str] = Field(default_factory=list)
+    conclusion: str
+
+
+class TurnstileRequest(BaseModel):
+    arguments: List[Argument] = Field(max_length=MAX_ARGUMENTS)
+    # True なら推論ごとに段階別の所要時間とカウンタを返す
+    timings: bool = False
+
+
+class FormulaResult(BaseModel):
+    input: str
+    # ワーカーが判定できなかった場合は None
+    well_formed: Optional[bool]
+    formal: Optional[bool]
+    formula: Optional[str]
+    error: Optional[str]
+
+
+class Timings(BaseModel):
+    stages: Dict[str, float]
+    calls: Dict[str, int]
+    counters: Dict[str, int]
+
+
+class ArgumentResult(BaseModel):
+    premises: List[FormulaResult]
+    conclusion: FormulaResult
+    atoms: List[str]
+    valid: Optional[bool]
+    counterexample: Optional[Dict[str, bool]]
+    # 量化子を含む推論の反証モデルの表記
+    countermodel: Optional[str] = None
+    error: Optional[str]
+    timings: Optional[Timings] = None
+
+
+class TurnstileResponse(BaseModel):
+    results: List[ArgumentResult]
+
+
+class CounterexampleRequest(BaseModel):
+    premises: List[str] = Field(default_factory=list)
+    conclusion: str
+    offset: int = Field(default=0, ge=0)
+    limit: int = Field(default=CUBES_PER_PAGE, ge=1, le=Inference.MAX_CUBES)
+
+
+class CounterexampleResponse(BaseModel):
+    atoms: List[str]
+    count: Optional[int]
+    cubes: List[Dict[str, Optional[bool]]]
+    next_offset: Optional[int]
+    error: Optional[str]
+
+
+class JobStatus(BaseModel):
+    id: str
+    status: str
+    atoms: List[str]
+    rows_total: int
+    rows_evaluated: int
+    counterexamples: int
+    valid: Optional[bool]
+    error: Optional[str]
+
+
+def _failed(argument: Argument, message: str) -> Dict[str, Any]:
+    """ワーカーで判定できなかった推論の結果 (記号文かどうかも分からないので None にする)"""
+    def unknown(text: str) -> Dict[str, Any]:
+        return {"input": text, "well_formed": None, "formal": None, "formula": None, "error": None}
+    return {
+        "premises": [unknown(text) for text in argument.premises],
+        "conclusion": unknown(argument.conclusion),
+        "atoms": [],
+        "valid": None,
+        "counterexample": None,
+        "countermodel": None,
+        "error": message,
+    }
+
+
+async def _grade(argument: Argument, timings: bool = False) -> Dict[str, Any]:
+    """推論1件をワーカープロセスで判定する (イベントループは止めない)"""
+    try:
+        result, stats = await app.state.workers.run(
+            grading.grade_argument_with_stats, argument.premises, argument.conclusion, MAX_ATOMS
+        )
+    except asyncio.TimeoutError:
+        return _failed(argument, f"{TIMEOUT_SECONDS} 秒以内に判定できませんでした")
+    except BrokenProcessPool:
+        return _failed(argument, "ワーカープロセスが異常終了しました")
+    metrics.add(instrumentation.Stats.from_dict(stats))
+    if timings:
+        result["timings"] = stats
+    return result
+
+
+@app.post("/api/turnstile", response_model=TurnstileResponse)
+async def turnstile(request: TurnstileRequest):
+    """推論をまとめて受け取り、それぞれの整形式性・公式性・妥当性・反例を返す"""
+    results = await asyncio.gather(*(_grade(argument, request.timings) for argument in request.arguments))
+    return {"results": results}
+
+
+@app.post("/api/counterexamples", response_model=CounterexampleResponse)
+async def counterexamples(request: CounterexampleRequest):
+    """推論の反例の数と、反例をまとめた部分的な割り当て (値が null の原子文はどちらでもよい) を1ページずつ返す"""
+    try:
+        return await app.state.workers.run(
+            grading.list_counterexamples, request.premises, request.conclusion,
+            request.offset, request.limit, MAX_ATOMS,
+        )
+    except asyncio.TimeoutError:
+        message = f"{TIMEOUT_SECONDS} 秒以内に判定できませんでした"
+    except BrokenProcessPool:
+        message = "ワーカープロセスが異常終了しました"
+    return {"atoms": [], "count": None, "cubes": [], "next_offset": None, "error": message}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """判定にかかった段階ごとの所要時間とカウンタの累計を Prometheus のテキスト形式で返す"""
+    return metrics.render_prometheus()
+
+
+def _job(job_id: str) -> jobs.Job:
+    try:
+        return app.state.jobs.get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+
+
+@app.post("/api/jobs", response_model=JobStatus, status_code=202)
+async def submit_job(argument: Argument):
+    """推論の真偽値表を作るジョブを登録する (結果は /api/jobs/{id}/result で受け取る)"""
+    try:
+        job = app.state.jobs.submit(argument.premises, argument.conclusion)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except jobs.JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return job.to_dict()
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """ジョブの状態と計算済みの行数を返す"""
+    return _job(job_id).to_dict()
+
+
+@app.delete("/api/jobs/{job_id}", response_model=JobStatus)
+async def cancel_job(job_id: str):
+    """ジョブを取り消す"""
+    try:
+        return app.state.jobs.cancel(job_id).to_dict()
+    except KeyError:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str, format: str = "csv"):
+    """終わったジョブの真偽値表を CSV または NDJSON で少しずつ返す"""
+    if format not in jobs.FORMATS:
+        raise HTTPException(status_code=400, detail=f"未知の形式です: {format}")
+    job = _job(job_id)
+    if job.status != jobs.DONE:
+        raise HTTPException(status_code=409, detail=f"ジョブが終わっていません: {job.status}")
+    if format == "csv":
+        return StreamingResponse(job.iter_csv(), media_type="text/csv")
+    return StreamingResponse(job.iter_ndjson(), media_type="application/x-ndjson")
+
+
+@app.websocket("/ws/formula")
+async def live_formula(websocket: WebSocket):
+    """入力中の記号文を編集のたびに受け取り、整形式性・公式性・エラーの位置を返す
+
+    受け取るメッセージは {"text": 全体} または {"start", "end", "insert"} の編集
+    (任意で "seq" に通し番号)。編集が DEBOUNCE_SECONDS 続けて来る間はまとめて適用し、
+    止まるか MAX_DEBOUNCE_SECONDS たったら1回だけ判定して {"seq", "input", "well_formed", "formal", "formula",
+    "error", "position"} を返す。接続ごとに前回のトークン列と括弧の木を覚えておき、
+    変わった部分だけを読み直す。
+    """
+    await websocket.accept()
+    session = live.LiveFormula()
+    text = ""
+    seq = None
+    try:
+        while True:
+            message = await websocket.receive_json()
+            # 編集が続いている間は判定を待つ (ただし MAX_DEBOUNCE_SECONDS まで)
+            deadline = asyncio.get_running_loop().time() + MAX_DEBOUNCE_SECONDS
+            while True:
+                try:
+                    if not isinstance(message, dict):
+                        raise ValueError("メッセージは JSON のオブジェクトでなければなりません")
+                    edited = live.apply_edit(text, message)
+                    if len(edited) > MAX_LIVE_LENGTH:
+                        raise ValueError(f"記号文が長すぎます (上限 {MAX_LIVE_LENGTH} 文字)")
+                    text = edited
+                    seq = message.get("seq", seq)
+                except ValueError as e:
+                    await websocket.send_json({"seq": message.get("seq") if isinstance(message, dict) else None,
+                                               "error": str(e)})
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(websocket.receive_json(), min(DEBOUNCE_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    break
+            await websocket.send_json({"seq": seq, **session.update(text)})
+    except WebSocketDisconnect:
+        pass
@@ -0,0 +1,242 @@
+from itertools import product
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import tree
+from inference import Formula, Inference
+
+# 述語論理の推論の有限の反証モデルを探す
+#
+# 領域の大きさ n = 1, 2, ..., max_size の順に、領域 {0, ..., n-1} の上で記号文を
+# 命題論理の記号文に展開 (基礎化) し、命題論理の推論として妥当性を判定する。
+#   ∀xφ は φ[x:=0] ∧ ... ∧ φ[x:=n-1]、∃xφ は φ[x:=0] ∨ ... ∨ φ[x:=n-1]
+#   述語 F と要素の組 (d1, ..., dk) の原子式は文記号 F__d1_..._dk
+# 反例の行がそのまま反証モデル (各述語が真になる要素の組) になる。最初に見つかった
+# 反証モデルで探索をやめるので、見つかるのは要素の数が最も少ないモデルである。
+#
+# 要素を並べ替えただけのモデルを何度も調べないように、対称性を除く。
+# 1. 個体定項は名前の順に、それまでに使った要素か、まだ使っていない最小の要素だけに割り当てる
+#    (最小番号の規則)。
+# 2. 個体定項が指さない要素どうしは入れ替えても同じなので、各要素 d の
+#    「F d, G d d, ... の真偽の並び」(要素1つだけで決まる性質) が番号順に辞書式で
+#    降順になるという制約を前提に加える。どのモデルも要素を並べ替えればこの制約を満たす。
+#
+# 同じ部分記号文と変数の割り当ての展開は、領域の大きさごとに1度だけ行う。
+
+# 既定の領域の大きさの上限
+MAX_SIZE = 4
+
+
+class Model:
+    """有限のモデル
+
+    Attributes:
+        size: 領域の要素の数 (要素は 0, ..., size-1)
+        constants: 個体定項 -> 要素
+        extensions: 述語 -> 述語が真になる要素の組の集合
+        sentences: 文記号 -> 真偽値
+    """
+    def __init__(self, size: int, constants: Dict[str, int],
+                 extensions: Dict[str, Set[Tuple[int, ...]]], sentences: Dict[str, bool]):
+        self.size = size
+        self.constants = constants
+        self.extensions = extensions
+        self.sentences = sentences
+
+    def evaluate(self, node: tree.Node) -> bool:
+        """閉じた記号文をこのモデルで評価する"""
+        ground = _Grounder(self.size, self.constants).ground(node)
+        env: Dict[str, bool] = dict(self.sentences)
+        for predicate, tuples in self.extensions.items():
+            for elements in tuples:
+                env[ground_atom(predicate, elements)] = True
+        return bool(_evaluate_ground(ground, env))
+
+    def __repr__(self) -> str:
+        parts = [f"領域 {{{', '.join(map(str, range(self.size)))}}}"]
+        parts += [f"{name}={element}" for name, element in sorted(self.constants.items())]
+        for predicate, tuples in sorted(self.extensions.items()):
+            items = ", ".join("(" + ",".join(map(str, t)) + ")" for t in sorted(tuples))
+            parts.append(f"{predicate}={{{items}}}")
+        parts += [f"{name}={value}" for name, value in sorted(self.sentences.items())]
+        return "; ".join(parts)
+
+
+def ground_atom(predicate: str, elements: Sequence[int]) -> str:
+    """述語と要素の組の原子式を表す文記号の名前 (Python の識別子として使える)"""
+    return f"{predicate}__{'_'.join(map(str, elements))}"
+
+
+def _evaluate_ground(node: tree.Node, env: Dict[str, bool]) -> bool:
+    # 真偽値の決まっていない原子式は偽とする
+    missing = {atom: False for atom in node.atoms if atom not in env}
+    return bool(node.evaluate({**missing, **env} if missing else env))
+
+
+def free_variables(node: tree.Node, memo: Optional[Dict[tree.Node, frozenset]] = None) -> frozenset:
+    """記号文の自由変数の集合"""
+    if memo is None:
+        memo = {}
+    for n in tree.postorder(node, memo):
+        if isinstance(n, tree.Predicate):
+            memo[n] = frozenset(term for term in n.terms if tree.is_variable(term))
+        elif isinstance(n, tree.Atom):
+            memo[n] = frozenset()
+        elif isinstance(n, tree.Quantifier):
+            memo[n] = memo[n.child] - {n.variable}
+        else:
+            memo[n] = frozenset().union(*(memo[arg] for arg in n.args))
+    return memo[node]
+
+
+def _symbols(nodes: Sequence[tree.Node]) -> Tuple[List[str], Dict[str, int], List[str]]:
+    """(個体定項のリスト, 述語 -> 項の数, 文記号のリスト) を返す"""
+    constants: Set[str] = set()
+    arities: Dict[str, int] = {}
+    sentences: Set[str] = set()
+    for node in nodes:
+        for n in tree.postorder(node):
+            if isinstance(n, tree.Predicate):
+                constants.update(term for term in n.terms if not tree.is_variable(term))
+                if arities.setdefault(n.predicate, len(n.terms)) != len(n.terms):
+                    raise ValueError(f"述語 {n.predicate} の項の数が一定ではありません")
+            elif isinstance(n, tree.Atom):
+                sentences.add(n.value)
+    return sorted(constants), arities, sorted(sentences)
+
+
+class _Grounder:
+    """領域の大きさと個体定項の解釈を決めて、記号文を命題論理の記号文に展開する"""
+    def __init__(self, size: int, constants: Dict[str, int]):
+        self.size = size
+        self.constants = constants
+        self.free: Dict[tree.Node, frozenset] = {}
+        # (部分記号文, 自由変数の割り当て) -> 展開した記号文
+        self.memo: Dict[Tuple[tree.Node, Tuple[Tuple[str, int], ...]], tree.Node] = {}
+
+    def _children(self, node: tree.Node, env: Dict[str, int]) -> List[Tuple[tree.Node, Tuple[Tuple[str, int], ...]]]:
+        if isinstance(node, tree.Quantifier):
+            bindings = [{**env, node.variable: d} for d in range(self.size)]
+            return [(node.child, self._restrict(node.child, binding)) for binding in bindings]
+        return [(arg, self._restrict(arg, env)) for arg in node.args]
+
+    def _restrict(self, node: tree.Node, env: Dict[str, int]) -> Tuple[Tuple[str, int], ...]:
+        """割り当てを node の自由変数だけに絞る (メモのキーにする)"""
+        free = free_variables(node, self.free)
+        return tuple(sorted((var, d) for var, d in env.items() if var in free))
+
+    def _atom(self, node: tree.Node, env: Dict[str, int]) -> tree.Node:
+        if not isinstance(node, tree.Predicate):
+            return node
+        elements = []
+        for term in node.terms:
+            if tree.is_variable(term):
+                if term not in env:
+                    raise ValueError(f"自由変数 {term} を含む記号文は判定できません")
+                elements.append(env[term])
+            else:
+                elements.append(self.constants[term])
+        return tree.Atom(ground_atom(node.predicate, elements))
+
+    def ground(self, node: tree.Node) -> tree.Node:
+        memo = self.memo
+        root = (node, self._restrict(node, {}))
+        stack = [(root, False)]
+        while stack:
+            key, expanded = stack.pop()
+            if key in memo:
+                continue
+            n, env_items = key
+            env = dict(env_items)
+            if isinstance(n, tree.Atom):
+                memo[key] = self._atom(n, env)
+                continue
+            children = self._children(n, env)
+            if not expanded:
+                stack.append((key, True))
+                stack += [(child, False) for child in children if child not in memo]
+                continue
+            values = [memo[child] for child in children]
+            if isinstance(n, tree.Quantifier):
+                # 同じ展開は1つにまとめて、左寄せの連言・選言にする
+                combine = tree.And if isinstance(n, tree.Universal) else tree.Or
+                result = None
+                for value in dict.fromkeys(values):
+                    result = value if result is None else combine(result, value)
+                memo[key] = result
+            elif isinstance(n, tree.Not):
+                memo[key] = tree.Not(values[0])
+            else:
+                memo[key] = type(n)(values[0], values[1])
+        return memo[root]
+
+
+def _constant_assignments(constants: List[str], size: int) -> Iterator[Dict[str, int]]:
+    """個体定項の割り当てを、最小番号の規則で並べ替えを除いて列挙する"""
+    # (割り当てた要素, 使った要素の数)
+    stack: List[Tuple[List[int], int]] = [([], 0)]
+    while stack:
+        assigned, used = stack.pop()
+        if len(assigned) == len(constants):
+            yield dict(zip(constants, assigned))
+            continue
+        for d in reversed(range(min(used + 1, size))):
+            stack.append((assigned + [d], max(used, d + 1)))
+
+
+def _symmetry_breaking(size: int, named: int, arities: Dict[str, int]) -> List[tree.Node]:
+    """個体定項が指さない要素 named, ..., size-1 の性質の並びを辞書式の降順にする制約"""
+    if not arities:
+        return []
+    keys = []
+    for d in range(size):
+        keys.append([tree.Atom(ground_atom(p, (d,) * arities[p])) for p in sorted(arities)])
+    constraints = []
+    for d in range(named, size - 1):
+        a, b = keys[d], keys[d + 1]
+        # a ≥ b (辞書式): 後ろの桁から組み立てる
+        constraint: tree.Node = tree.Implies(b[-1], a[-1])
+        for x, y in zip(reversed(a[:-1]), reversed(b[:-1])):
+            constraint = tree.Or(tree.And(x, tree.Not(y)), tree.And(tree.Equivalence(x, y), constraint))
+        constraints.append(constraint)
+    return constraints
+
+
+def find_countermodel(premises: Sequence[tree.Node], conclusion: tree.Node, max_size: int = MAX_SIZE,
+                      engine: str = "auto") -> Optional[Model]:
+    """前提がすべて真で結論が偽になる有限のモデルを、要素の少ない順に探す
+
+    Args:
+        premises: 前提の記号文の木 (自由変数を含まない)
+        conclusion: 結論の記号文の木 (自由変数を含まない)
+        max_size: 調べる領域の大きさの上限
+        engine: 展開した命題論理の推論の評価方式 (Inference.ENGINES)
+
+    Returns:
+        見つかった反証モデル (max_size 以下の領域に反証モデルがなければ None。
+        その場合も、より大きな領域や無限の領域に反証モデルがある可能性は残る)
+    """
+    nodes = list(premises) + [conclusion]
+    for node in nodes:
+        free = free_variables(node)
+        if free:
+            raise ValueError(f"自由変数 {', '.join(sorted(free))} を含む記号文は判定できません")
+    constants, arities, sentence_letters = _symbols(nodes)
+    for size in range(1, max_size + 1):
+        for assignment in _constant_assignments(constants, size):
+            grounder = _Grounder(size, assignment)
+            named = len(set(assignment.values()))
+            ground_premises = [grounder.ground(premise) for premise in premises]
+            ground_premises += _symmetry_breaking(size, named, arities)
+            ground_conclusion = grounder.ground(conclusion)
+            inference = Inference([Formula.from_tree(p) for p in ground_premises],
+                                  Formula.from_tree(ground_conclusion), engine=engine)
+            row = inference.get_counterexample()
+            if row is None:
+                continue
+            extensions: Dict[str, Set[Tuple[int, ...]]] = {p: set() for p in arities}
+            for p, arity in arities.items():
+                for elements in product(range(size), repeat=arity):
+                    if row.get(ground_atom(p, elements), False):
+                        extensions[p].add(elements)
+            sentences = {atom: bool(row.get(atom, False)) for atom in sentence_letters}
+            return Model(size, assignment, extensions, sentences)
+    return None
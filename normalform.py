@@ -0,0 +1,296 @@
+from array import array
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+import tree
+
+# 記号文の標準形への変換
+#
+#   nnf      否定標準形 (否定は文記号の直前だけ、結合子は ∧ と ∨ だけ)
+#   tseitin  連言標準形 (CNF)。部分記号文ごとに新しい変数を導入するので、節の数は
+#            記号文の大きさに比例する。変数の定義は部分記号文が現れる極性 (肯定・否定) に
+#            必要な向きだけ作る (Plaisted-Greenbaum 変換)。充足可能性は元の記号文と同じで、
+#            充足する割り当てを文記号に制限すると元の記号文を充足する
+#   dnf      選言標準形 (DNF)。分配法則で展開するので、項の数が上限を超えたら打ち切る
+#
+# どの変換も部分木ごとに結果を記録するので、共有された部分木は一度だけ変換する。
+# 節・項は DIMACS 形式と同じく、変数番号 v (1以上) の正負の整数のリテラルで表す。
+
+# 極性のビット
+POSITIVE = 1
+NEGATIVE = 2
+
+# dnf の既定の項の数の上限
+MAX_TERMS = 4096
+
+
+def nnf(node: tree.Node) -> tree.Node:
+    """否定標準形に変換する (→ は ~φ∨ψ、↔ は (φ∧ψ)∨(~φ∧~ψ) に展開する)"""
+    # (部分木, 否定するか) -> 変換結果
+    memo: Dict[Tuple[tree.Node, bool], tree.Node] = {}
+    stack: List[Tuple[tree.Node, bool, bool]] = [(node, False, False)]
+    while stack:
+        n, negated, expanded = stack.pop()
+        key = (n, negated)
+        if key in memo:
+            continue
+        if isinstance(n, tree.Atom):
+            memo[key] = tree.Not(n) if negated else n
+            continue
+        if isinstance(n, tree.Not):
+            # 子を逆の極性で変換したものがそのまま結果になる
+            child = (n.child, not negated)
+            if child in memo:
+                memo[key] = memo[child]
+            else:
+                stack += [(n, negated, True), (n.child, not negated, False)]
+            continue
+        # 子を (部分木, 否定するか) の組で列挙する
+        if isinstance(n, tree.Equivalence):
+            needed = [(n.left, False), (n.right, False), (n.left, True), (n.right, True)]
+        elif isinstance(n, tree.Implies):
+            needed = [(n.left, True), (n.right, False)] if not negated else [(n.left, False), (n.right, True)]
+        elif isinstance(n, (tree.And, tree.Or)):
+            needed = [(n.left, negated), (n.right, negated)]
+        else:
+            raise ValueError(f"未知の結合子です: {n!r}")
+        missing = [child for child in needed if child not in memo]
+        if missing and not expanded:
+            stack.append((n, negated, True))
+            stack += [(child, child_negated, False) for child, child_negated in reversed(missing)]
+            continue
+        if isinstance(n, tree.Equivalence):
+            a, b = memo[(n.left, False)], memo[(n.right, False)]
+            not_a, not_b = memo[(n.left, True)], memo[(n.right, True)]
+            if negated:
+                # ~(φ↔ψ) は (φ∧~ψ)∨(~φ∧ψ)
+                memo[key] = tree.Or(tree.And(a, not_b), tree.And(not_a, b))
+            else:
+                memo[key] = tree.Or(tree.And(a, b), tree.And(not_a, not_b))
+        elif isinstance(n, tree.Implies):
+            left, right = (memo[child] for child in needed)
+            # φ→ψ は ~φ∨ψ、~(φ→ψ) は φ∧~ψ
+            memo[key] = tree.And(left, right) if negated else tree.Or(left, right)
+        else:
+            left, right = (memo[child] for child in needed)
+            # ド・モルガンの法則
+            is_and = isinstance(n, tree.And) != negated
+            memo[key] = tree.And(left, right) if is_and else tree.Or(left, right)
+    return memo[(node, False)]
+
+
+class ClauseSet:
+    """連言標準形の節の集まり
+
+    Attributes:
+        num_vars: 変数の数
+        clauses: 節のリスト (各節はリテラルのリスト)
+        atom_vars: 原子文 -> 変数番号 (それ以外の変数は Tseitin 変換で導入したもの)
+    """
+    def __init__(self):
+        self.num_vars = 0
+        self.clauses: List[List[int]] = []
+        self.atom_vars: Dict[str, int] = {}
+        # 記号文の部分木 -> その真偽値を表すリテラル
+        self._literals: Dict[tree.Node, int] = {}
+        # 記号文の部分木 -> 定義節を作った極性
+        self._defined: Dict[tree.Node, int] = {}
+
+    def new_var(self) -> int:
+        self.num_vars += 1
+        return self.num_vars
+
+    def literal(self, node: tree.Node, polarity: int = POSITIVE | NEGATIVE) -> int:
+        """部分木の真偽値を表すリテラルを返す (必要な極性の定義節を追加する)
+
+        Args:
+            node: 部分木
+            polarity: 部分木が現れる極性。POSITIVE なら「リテラルが真なら部分木も真」、
+                      NEGATIVE なら「部分木が真ならリテラルも真」の向きの定義節だけを作る
+        """
+        # 親から子へ、必要な極性を伝える (帰りがけ順の逆順は親が子より先になる)
+        order = list(tree.postorder(node))
+        needed: Dict[tree.Node, int] = {node: polarity}
+        for n in reversed(order):
+            flags = needed.get(n, 0) & ~self._defined.get(n, 0)
+            if not flags or not isinstance(n, tree.Operator):
+                continue
+            flipped = ((flags & POSITIVE) << 1) | ((flags & NEGATIVE) >> 1)
+            if isinstance(n, tree.Not):
+                children = [(n.child, flipped)]
+            elif isinstance(n, (tree.And, tree.Or)):
+                children = [(n.left, flags), (n.right, flags)]
+            elif isinstance(n, tree.Implies):
+                children = [(n.left, flipped), (n.right, flags)]
+            elif isinstance(n, tree.Equivalence):
+                children = [(n.left, POSITIVE | NEGATIVE), (n.right, POSITIVE | NEGATIVE)]
+            else:
+                raise ValueError(f"未知の結合子です: {n!r}")
+            for child, child_flags in children:
+                needed[child] = needed.get(child, 0) | child_flags
+
+        literals = self._literals
+        for n in order:
+            flags = needed.get(n, 0) & ~self._defined.get(n, 0)
+            if isinstance(n, tree.Atom):
+                if n.value not in self.atom_vars:
+                    self.atom_vars[n.value] = self.new_var()
+                literals[n] = self.atom_vars[n.value]
+                continue
+            if isinstance(n, tree.Not):
+                # 否定は変数を増やさずリテラルの符号で表す
+                literals[n] = -literals[n.child]
+                self._defined[n] = self._defined.get(n, 0) | flags
+                continue
+            if n not in literals:
+                literals[n] = self.new_var()
+            if not flags:
+                continue
+            x, a, b = literals[n], literals[n.left], literals[n.right]
+            if isinstance(n, tree.And):
+                positive, negative = [[-x, a], [-x, b]], [[x, -a, -b]]
+            elif isinstance(n, tree.Or):
+                positive, negative = [[-x, a, b]], [[x, -a], [x, -b]]
+            elif isinstance(n, tree.Implies):
+                positive, negative = [[-x, -a, b]], [[x, a], [x, -b]]
+            else:
+                positive, negative = [[-x, -a, b], [-x, a, -b]], [[x, a, b], [x, -a, -b]]
+            if flags & POSITIVE:
+                self.clauses += positive
+            if flags & NEGATIVE:
+                self.clauses += negative
+            self._defined[n] = self._defined.get(n, 0) | flags
+        return literals[node]
+
+    def assert_true(self, node: tree.Node):
+        """記号文が真であるという節を追加する"""
+        self.clauses.append([self.literal(node, POSITIVE)])
+
+    def assert_false(self, node: tree.Node):
+        """記号文が偽であるという節を追加する"""
+        self.clauses.append([-self.literal(node, NEGATIVE)])
+
+    def to_array(self) -> array:
+        """節を 0 で区切って1列に並べた整数の配列 (DIMACS 形式の節の並び) にする"""
+        return clause_array(self.clauses)
+
+    def to_dimacs(self) -> str:
+        lines = [f"p cnf {self.num_vars} {len(self.clauses)}"]
+        lines += [" ".join(map(str, clause)) + " 0" for clause in self.clauses]
+        return "\n".join(lines) + "\n"
+
+    def var_names(self) -> Dict[int, str]:
+        """変数番号 -> 文記号の名前 (Tseitin 変換で導入した変数には使われていない名前を付ける)"""
+        names = {v: atom for atom, v in self.atom_vars.items()}
+        used = set(self.atom_vars)
+        k = 0
+        for v in range(1, self.num_vars + 1):
+            if v in names:
+                continue
+            while f"X_{k}" in used:
+                k += 1
+            names[v] = f"X_{k}"
+            k += 1
+        return names
+
+
+def tseitin(true_nodes: Sequence[tree.Node], false_nodes: Sequence[tree.Node] = ()) -> ClauseSet:
+    """true_nodes が全て真、false_nodes が全て偽という条件の連言標準形を作る"""
+    clauses = ClauseSet()
+    for node in true_nodes:
+        clauses.assert_true(node)
+    for node in false_nodes:
+        clauses.assert_false(node)
+    return clauses
+
+
+def clause_array(clauses: Sequence[Sequence[int]]) -> array:
+    """節 (または項) を 0 で区切って1列に並べた整数の配列にする"""
+    flat = array("i")
+    for clause in clauses:
+        flat.extend(clause)
+        flat.append(0)
+    return flat
+
+
+def dnf(node: tree.Node, atoms: Optional[Sequence[str]] = None,
+        max_terms: int = MAX_TERMS) -> Tuple[List[Tuple[int, ...]], Dict[str, int]]:
+    """選言標準形に変換する
+
+    矛盾する項 (P∧~P を含む項) と、他の項に含まれる項は取り除く。
+
+    Args:
+        node: 変換する記号文の木
+        atoms: 変数番号を振る順の原子文 (省略時はソートした原子文)
+        max_terms: 途中の部分記号文も含めた項の数の上限。超えると MemoryError を送出する
+
+    Returns:
+        (項のリスト (各項はリテラルを変数番号の順に並べたタプル), 原子文 -> 変数番号)
+    """
+    variables = {atom: v for v, atom in enumerate(sorted(node.atoms) if atoms is None else atoms, 1)}
+    root = nnf(node)
+    memo: Dict[tree.Node, List[FrozenSet[int]]] = {}
+    for n in tree.postorder(root, memo):
+        terms: List[FrozenSet[int]]
+        if isinstance(n, tree.Atom):
+            terms = [frozenset((variables[n.value],))]
+        elif isinstance(n, tree.Not):
+            # 否定標準形なので子は文記号
+            terms = [frozenset((-variables[n.child.value],))]
+        elif isinstance(n, tree.Or):
+            terms = _minimize(memo[n.left] + memo[n.right])
+        else:
+            left, right = memo[n.left], memo[n.right]
+            if len(left) * len(right) > max_terms:
+                raise MemoryError(f"DNF の項の数が上限 ({max_terms}) を超えました")
+            product = []
+            for a in left:
+                for b in right:
+                    term = a | b
+                    if not any(-literal in term for literal in term):
+                        product.append(term)
+            terms = _minimize(product)
+        if len(terms) > max_terms:
+            raise MemoryError(f"DNF の項の数が上限 ({max_terms}) を超えました")
+        memo[n] = terms
+    return [tuple(sorted(term, key=abs)) for term in memo[root]], variables
+
+
+def _minimize(terms: List[FrozenSet[int]]) -> List[FrozenSet[int]]:
+    """重複した項と、より短い項を含む項を取り除く (残す項の順は元の順)"""
+    kept: List[FrozenSet[int]] = []
+    seen: Set[FrozenSet[int]] = set()
+    for term in sorted(terms, key=len):
+        if term in seen or any(other <= term for other in kept):
+            continue
+        seen.add(term)
+        kept.append(term)
+    order = {term: idx for idx, term in reversed(list(enumerate(terms)))}
+    return sorted(kept, key=order.__getitem__)
+
+
+def to_node(clauses: Sequence[Sequence[int]], names: Dict[int, str], conjunctive: bool = True) -> tree.Node:
+    """整数のリテラルの節 (または項) を記号文の木に戻す
+
+    Args:
+        clauses: 節のリスト (conjunctive が False なら項のリスト)
+        names: 変数番号 -> 文記号の名前
+        conjunctive: True なら節の連言 (CNF)、False なら項の選言 (DNF) とみなす
+
+    Returns:
+        同じ結合子の並びは左寄せにした木 (Operator.__repr__ で公式な記号文として表示できる)
+    """
+    inner, outer = (tree.Or, tree.And) if conjunctive else (tree.And, tree.Or)
+    if not clauses or any(not clause for clause in clauses):
+        raise ValueError("空の節や項は記号文で表せません")
+
+    def literal(value: int) -> tree.Node:
+        atom = tree.Atom(names[abs(value)])
+        return atom if value > 0 else tree.Not(atom)
+
+    result: Optional[tree.Node] = None
+    for clause in clauses:
+        part = literal(clause[0])
+        for value in clause[1:]:
+            part = inner(part, literal(value))
+        result = part if result is None else outer(result, part)
+    assert result is not None
+    return result
@@ -0,0 +1,171 @@
+import atexit
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import columns
+import serialize
+import tree
+
+# 真偽値表を先頭の k 個の原子文の値 (接頭辞) で 2^k 個の区画に分け、
+# 各区画をワーカープロセスで列単位のビット演算により評価する。
+#
+# 第 i 行の上位 k ビットが接頭辞なので、接頭辞 s の区画は第 s * 2^m 行から
+# 2^m 行 (m = n - k) が連続して並ぶ。区画の列を s * 2^m ビットずらして足し合わせれば
+# 真偽値表全体の列になり、区画の分け方やワーカーの数によらず結果は同じになる。
+#
+# ワーカーには Formula や木を pickle して渡すのではなく、serialize のバイト列を渡し、
+# ワーカーは木を作り直さずにそのまま評価する。
+#
+# ワーカープロセスの起動は1回の判定より重いことが多いので、プールはワーカーの数ごとに
+# 最初に使うときに作り、プロセスの終了まで使い回す (fork した子プロセスでは作り直す)。
+
+# ワーカー1つあたりの区画の数 (区画を細かくして、反例が見つかったときに
+# まだ始まっていない区画を取り消せるようにする)
+SHARDS_PER_WORKER = 4
+
+def shard_bits(n: int, workers: int) -> int:
+    """区画の数を決める接頭辞の長さ k (2^k >= workers * SHARDS_PER_WORKER となる最小の k、ただし n 以下)"""
+    k = 0
+    while (1 << k) < workers * SHARDS_PER_WORKER and k < n:
+        k += 1
+    return k
+
+
+def shard_columns(data: bytes, atoms: Tuple[str, ...], k: int, prefix: int) -> List[int]:
+    """接頭辞 prefix の区画で、各記号文の列を計算する (ワーカーで実行する)"""
+    m = len(atoms) - k
+    mask = columns.table_mask(m)
+    atom_columns: Dict[str, int] = {}
+    for j, atom in enumerate(atoms):
+        if j < k:
+            # 接頭辞の原子文は区画の中で値が変わらない
+            atom_columns[atom] = mask if (prefix >> (k - 1 - j)) & 1 else 0
+        else:
+            atom_columns[atom] = columns.atom_column(j - k, m)
+    return serialize.Program(data).evaluate_columns(atom_columns, mask)
+
+
+def _shard_counterexample(data: bytes, atoms: Tuple[str, ...], k: int, prefix: int) -> int:
+    """接頭辞 prefix の区画で最初の反例の行 (区画の中での番号、なければ -1) を返す
+
+    記号文は前提、結論の順に並んでいるものとする。
+    """
+    *premise_columns, conclusion_column = shard_columns(data, atoms, k, prefix)
+    bad = conclusion_column ^ columns.table_mask(len(atoms) - k)
+    for column in premise_columns:
+        bad &= column
+    return columns.lowest_row(bad)
+
+
+# ワーカーの数 -> プール (_pools_pid のプロセスで作ったもの)
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+
+
+def _pool(workers: Optional[int]) -> Tuple[ProcessPoolExecutor, int]:
+    """ワーカーの数ごとに使い回すプールを返す"""
+    global _pools_pid
+    workers = max(1, workers or os.cpu_count() or 1)
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # fork する前に親プロセスで作ったプールは使えない
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return pool, workers
+
+
+def _discard(workers: int, pool: ProcessPoolExecutor):
+    """壊れたプールを捨てる (次に使うときに作り直す)"""
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    """使い回しているプールを全て止める (プロセスの終了時にも呼ばれる)"""
+    with _pools_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown)
+
+
+def evaluate_columns(nodes: Sequence[tree.Node], atoms: Sequence[str],
+                     workers: Optional[int] = None) -> List[int]:
+    """各記号文の真偽値表全体の列を、区画ごとに並列に計算する
+
+    Args:
+        nodes: 評価する記号文の木
+        atoms: ソート済みの原子文 (真偽値表の行の順を決める)
+        workers: ワーカープロセスの数 (None なら CPU の数)
+
+    Returns:
+        columns.evaluate_column と同じ形の、各記号文の列
+    """
+    data = serialize.dumps(nodes)
+    atoms = tuple(atoms)
+    pool, workers = _pool(workers)
+    k = shard_bits(len(atoms), workers)
+    size = 1 << (len(atoms) - k)
+    try:
+        futures = [pool.submit(shard_columns, data, atoms, k, prefix) for prefix in range(1 << k)]
+        results = [0] * len(nodes)
+        for prefix, future in enumerate(futures):
+            for idx, column in enumerate(future.result()):
+                results[idx] |= column << (prefix * size)
+    except BrokenProcessPool:
+        _discard(workers, pool)
+        raise
+    return results
+
+
+def find_counterexample_row(premises: Sequence[tree.Node], conclusion: tree.Node,
+                            atoms: Sequence[str], workers: Optional[int] = None) -> int:
+    """全ての前提が真で結論が偽になる最初の行の番号を、区画ごとに並列に探す
+
+    ある区画で反例が見つかったら、それより後ろの区画は取り消し、既に始まっていても待たない。
+    前の区画の結果は待つので、返す行はワーカーの数によらず逐次の探索と同じになる。
+
+    Returns:
+        最初の反例の行番号 (なければ -1)
+    """
+    data = serialize.dumps(list(premises) + [conclusion])
+    atoms = tuple(atoms)
+    pool, workers = _pool(workers)
+    k = shard_bits(len(atoms), workers)
+    size = 1 << (len(atoms) - k)
+    try:
+        prefixes: Dict[Future, int] = {
+            pool.submit(_shard_counterexample, data, atoms, k, prefix): prefix for prefix in range(1 << k)
+        }
+        pending = set(prefixes)
+        found: Dict[int, int] = {}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                row = future.result()
+                if row >= 0:
+                    found[prefixes[future]] = row
+            if found:
+                first = min(found)
+                for future in [f for f in pending if prefixes[f] > first]:
+                    future.cancel()
+                    pending.discard(future)
+    except BrokenProcessPool:
+        _discard(workers, pool)
+        raise
+    if not found:
+        return -1
+    first = min(found)
+    return first * size + found[first]
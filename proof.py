@@ -0,0 +1,514 @@
+import time
+from collections import deque
+from typing import Dict, FrozenSet, Iterator, List, Optional, Sequence, Set, Tuple
+import columns
+import instrumentation
+import normalform
+import sat
+import tree
+
+# 妥当な推論の統語論的な演繹 (自然演繹) を探す
+#
+# 推論規則は {MP, MT, DN, R, Adj, S, Add, MTP, BC, CB, DM, CDJ}、演繹の形式は {CD, ID} とする。
+#   MP   φ→ψ, φ ⊢ ψ            MT   φ→ψ, ~ψ ⊢ ~φ
+#   DN   φ ⊢ ~~φ, ~~φ ⊢ φ      R    φ ⊢ φ (外側の行を副演繹の中に繰り返す)
+#   Adj  φ, ψ ⊢ φ∧ψ            S    φ∧ψ ⊢ φ, φ∧ψ ⊢ ψ
+#   Add  φ ⊢ φ∨ψ, ψ ⊢ φ∨ψ      MTP  φ∨ψ, ~φ ⊢ ψ, φ∨ψ, ~ψ ⊢ φ
+#   BC   φ↔ψ ⊢ φ→ψ, φ↔ψ ⊢ ψ→φ  CB   φ→ψ, ψ→φ ⊢ φ↔ψ
+#   DM   ~(φ∧ψ) ⊣⊢ ~φ∨~ψ, ~(φ∨ψ) ⊣⊢ ~φ∧~ψ
+#   CDJ  φ→ψ ⊣⊢ ~φ∨ψ
+#   CD   φ を仮定 (ACD) して ψ を導けば φ→ψ
+#   ID   ~φ (φ が ~ψ なら ψ) を仮定 (AID) して χ と ~χ を導けば φ
+#
+# 探索の状態は (使える記号文の集合, 目標) で、目標は記号文か矛盾 (None) である。
+# 1. 使える記号文から、前提と結論の部分記号文 (とその否定・DM・CDJ で移り合う形) の範囲で
+#    推論規則を前向きに適用し尽くす。範囲が有限なので必ず止まる。
+# 2. 目標が導けていなければ、目標の形に応じて CD・Adj・CB・Add・DN・ID に分解する。
+#    矛盾が目標なら、真偽の決まっていない部分記号文 φ で場合分けする (ID で ~φ を示してから続ける)。
+#    どの部分記号文も真偽が決まれば矛盾が導けるので、妥当な推論なら必ず演繹が見つかる。
+# 意味論的に導けない目標 (SAT で反例が見つかるもの) は探索しない。
+# まず最初に見つかる演繹を求め、次に状態ごとに行数の上限を 0 から1ずつ増やして
+# (反復深化で) それより短い演繹を探す。反復深化が終われば、同じ状態の演繹は
+# この探索の範囲で最も短いものになる。状態ごとの結果 (見つけた演繹と、失敗した行数の上限) は
+# 置換表に記録する。木の節点は構造ごとに1つなので、記号文の集合はそのまま辞書のキーにできる。
+
+# 探索する状態の数の既定の上限
+MAX_NODES = 50000
+
+# 演繹の行数 (前提の行を除く) の既定の上限
+MAX_LINES = 60
+
+# 意味論的に導けない状態の、失敗した行数の上限
+UNREACHABLE = 1 << 30
+
+# 帰結の判定を真偽値表の列で行う原子文の数の上限 (超えたら SAT で判定する)
+COLUMN_ATOMS = 16
+
+
+class Line:
+    """演繹の1行
+
+    Attributes:
+        number: 行番号 (1 始まり)
+        formula: 記号文の木
+        rule: 規則の名前 (前提は "PR"、仮定は "ACD" か "AID")
+        cites: 根拠の行番号 (CD・ID は副演繹の最初と最後の行)
+        depth: 副演繹の深さ
+    """
+    __slots__ = ("number", "formula", "rule", "cites", "depth")
+
+    def __init__(self, number: int, formula: tree.Node, rule: str, cites: Tuple[int, ...] = (), depth: int = 0):
+        self.number = number
+        self.formula = formula
+        self.rule = rule
+        self.cites = cites
+        self.depth = depth
+
+    @property
+    def citation(self) -> str:
+        if not self.cites:
+            return self.rule
+        if self.rule in ("CD", "ID"):
+            return f"{self.rule} {self.cites[0]}-{self.cites[-1]}"
+        return f"{self.rule} {','.join(map(str, self.cites))}"
+
+    def __repr__(self) -> str:
+        return f"{self.number:>3}  {'| ' * self.depth}{self.formula!r}  {self.citation}"
+
+
+class Proof:
+    """前提から結論を導く演繹 (行番号つきの行の並び)"""
+    def __init__(self, premises: Sequence[tree.Node], conclusion: tree.Node, lines: List[Line]):
+        self.premises = list(premises)
+        self.conclusion = conclusion
+        self.lines = lines
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __iter__(self) -> Iterator[Line]:
+        return iter(self.lines)
+
+    def __repr__(self) -> str:
+        return "\n".join(repr(line) for line in self.lines)
+
+
+# 探索中の演繹の断片の要素:
+#   ("line", 記号文, 規則, 根拠の記号文のタプル)
+#   ("sub", "CD" か "ID", 仮定, 副演繹の要素のリスト, 結論)
+#   ("contradiction", χ)  矛盾の目標で導いた χ と ~χ (行にはならない)
+Item = tuple
+Fragment = Tuple[List[Item], int]
+# 前向きの推論: (導く記号文, 規則, 根拠の記号文のタプル)
+Rule = Tuple[tree.Node, str, Tuple[tree.Node, ...]]
+
+
+def _subformulas(nodes: Sequence[tree.Node]) -> List[tree.Node]:
+    done: Dict[tree.Node, None] = {}
+    for node in nodes:
+        for n in tree.postorder(node, done):
+            done[n] = None
+    return list(done)
+
+
+def _transforms(node: tree.Node) -> List[tree.Node]:
+    """DM・CDJ で node と移り合う記号文"""
+    results = []
+    if isinstance(node, tree.Implies):
+        results.append(tree.Or(tree.Not(node.left), node.right))
+    elif isinstance(node, tree.Or):
+        if isinstance(node.left, tree.Not):
+            results.append(tree.Implies(node.left.child, node.right))
+            if isinstance(node.right, tree.Not):
+                results.append(tree.Not(tree.And(node.left.child, node.right.child)))
+    elif isinstance(node, tree.And):
+        if isinstance(node.left, tree.Not) and isinstance(node.right, tree.Not):
+            results.append(tree.Not(tree.Or(node.left.child, node.right.child)))
+    elif isinstance(node, tree.Not):
+        inner = node.child
+        if isinstance(inner, tree.And):
+            results.append(tree.Or(tree.Not(inner.left), tree.Not(inner.right)))
+        elif isinstance(inner, tree.Or):
+            results.append(tree.And(tree.Not(inner.left), tree.Not(inner.right)))
+    return results
+
+
+def _entails_sat(hyps: FrozenSet[tree.Node], goal: Optional[tree.Node]) -> bool:
+    """hyps が goal (None なら矛盾) を意味論的に帰結するか (SAT で判定する)"""
+    cnf = normalform.tseitin(list(hyps), [] if goal is None else [goal])
+    solver = sat.Solver(cnf.num_vars)
+    for clause in cnf.clauses:
+        if not solver.add_clause(clause):
+            return True
+    return solver.solve() is None
+
+
+def _cost(items: List[Item]) -> int:
+    total = 0
+    for item in items:
+        if item[0] == "line":
+            total += 1
+        elif item[0] == "sub":
+            total += 2 + _cost(item[3])
+    return total
+
+
+def _established(items: List[Item]) -> Set[tree.Node]:
+    """断片の行のうち、同じ深さで後から使える記号文"""
+    results = set()
+    for item in items:
+        if item[0] == "line":
+            results.add(item[1])
+        elif item[0] == "sub":
+            results.add(item[4])
+    return results
+
+
+class _Search:
+    def __init__(self, premises: Sequence[tree.Node], conclusion: tree.Node,
+                 max_nodes: int, deadline: Optional[float]):
+        self.max_nodes = max_nodes
+        self.deadline = deadline
+        self.nodes = 0
+        self.greedy = False
+        self.subformulas = _subformulas(list(premises) + [conclusion])
+        universe = set(self.subformulas)
+        universe |= {tree.Not(s) for s in self.subformulas}
+        for s in self.subformulas:
+            if isinstance(s, tree.Equivalence):
+                universe |= {tree.Implies(s.left, s.right), tree.Implies(s.right, s.left)}
+        for s in list(universe):
+            universe.update(_transforms(s))
+        # 前向きの推論で新しく導いてよい記号文
+        self.universe: FrozenSet[tree.Node] = frozenset(universe)
+        # 根拠 -> それを使う導入の規則 (Adj・Add・CB・DN)
+        self.introductions: Dict[tree.Node, List[Rule]] = {}
+        for u in self.universe:
+            if isinstance(u, tree.And):
+                uses = [(u.left, (u, "Adj", (u.left, u.right))), (u.right, (u, "Adj", (u.left, u.right)))]
+            elif isinstance(u, tree.Or):
+                uses = [(u.left, (u, "Add", (u.left,))), (u.right, (u, "Add", (u.right,)))]
+            elif isinstance(u, tree.Equivalence):
+                parents = (tree.Implies(u.left, u.right), tree.Implies(u.right, u.left))
+                uses = [(parent, (u, "CB", parents)) for parent in parents]
+            elif isinstance(u, tree.Not) and isinstance(u.child, tree.Not):
+                uses = [(u.child.child, (u, "DN", (u.child.child,)))]
+            else:
+                continue
+            for part, rule in uses:
+                self.introductions.setdefault(part, []).append(rule)
+        self.rules: Dict[tree.Node, List[Rule]] = {}
+        # 原子文が少なければ、帰結の判定は真偽値表の列で行う
+        self.atoms = sorted(set().union(*(node.atoms for node in self.subformulas)))
+        self.atom_columns: Optional[Dict[str, int]] = None
+        if len(self.atoms) <= COLUMN_ATOMS:
+            self.atom_columns = columns.atom_columns(self.atoms)
+        self.mask = columns.table_mask(len(self.atoms)) if self.atom_columns is not None else 0
+        self.column_memo: Dict[tree.Node, int] = {}
+        # 置換表 (closures と entailed は探索の方針によらない)
+        self.closures: Dict[FrozenSet[tree.Node], Dict[tree.Node, Tuple[str, Tuple[tree.Node, ...]]]] = {}
+        self.entailed: Dict[Tuple[FrozenSet[tree.Node], Optional[tree.Node]], bool] = {}
+        self.solved: Dict[Tuple[FrozenSet[tree.Node], Optional[tree.Node]], Fragment] = {}
+        self.failed: Dict[Tuple[FrozenSet[tree.Node], Optional[tree.Node]], int] = {}
+
+    def _rules(self, node: tree.Node) -> List[Rule]:
+        """node を主な根拠とする推論 (除去の規則と DM・CDJ)"""
+        rules = self.rules.get(node)
+        if rules is not None:
+            return rules
+        rules = []
+        if isinstance(node, tree.And):
+            rules += [(node.left, "S", (node,)), (node.right, "S", (node,))]
+        elif isinstance(node, tree.Implies):
+            rules += [(node.right, "MP", (node, node.left)),
+                      (tree.Not(node.left), "MT", (node, tree.Not(node.right)))]
+        elif isinstance(node, tree.Or):
+            rules += [(node.right, "MTP", (node, tree.Not(node.left))),
+                      (node.left, "MTP", (node, tree.Not(node.right)))]
+        elif isinstance(node, tree.Equivalence):
+            rules += [(g, "BC", (node,)) for g in (tree.Implies(node.left, node.right),
+                                                    tree.Implies(node.right, node.left)) if g in self.universe]
+        elif isinstance(node, tree.Not) and isinstance(node.child, tree.Not):
+            rules.append((node.child.child, "DN", (node,)))
+        for g in _transforms(node):
+            if g in self.universe:
+                is_cdj = isinstance(node, tree.Implies) or isinstance(g, tree.Implies)
+                rules.append((g, "CDJ" if is_cdj else "DM", (node,)))
+        self.rules[node] = rules
+        return rules
+
+    def _closure(self, hyps: FrozenSet[tree.Node]) -> Dict[tree.Node, Tuple[str, Tuple[tree.Node, ...]]]:
+        """hyps から前向きに導ける記号文 -> (規則, 根拠) (導いた順に並ぶ)"""
+        derived = self.closures.get(hyps)
+        if derived is not None:
+            return derived
+        derived = {h: ("", ()) for h in hyps}
+        queue = deque(hyps)
+        # まだ導いていない根拠 -> それを待っている推論
+        waiting: Dict[tree.Node, List[Rule]] = {}
+        while queue:
+            node = queue.popleft()
+            for rule in self._rules(node) + self.introductions.get(node, []) + waiting.pop(node, []):
+                result, name, parents = rule
+                if result in derived:
+                    continue
+                missing = next((p for p in parents if p not in derived), None)
+                if missing is not None:
+                    waiting.setdefault(missing, []).append(rule)
+                    continue
+                derived[result] = (name, parents)
+                queue.append(result)
+        self.closures[hyps] = derived
+        return derived
+
+    @staticmethod
+    def _derivation(derived: Dict[tree.Node, Tuple[str, Tuple[tree.Node, ...]]],
+                    targets: Sequence[tree.Node]) -> List[Item]:
+        """targets を導く行を、導いた順に並べる (hyps の記号文は行にしない)"""
+        needed: Set[tree.Node] = set()
+        stack = list(targets)
+        while stack:
+            node = stack.pop()
+            if node in needed:
+                continue
+            needed.add(node)
+            stack.extend(derived[node][1])
+        return [("line", node, rule, parents) for node, (rule, parents) in derived.items()
+                if rule and node in needed]
+
+    def _entails(self, hyps: FrozenSet[tree.Node], goal: Optional[tree.Node]) -> bool:
+        """hyps が goal (None なら矛盾) を意味論的に帰結するか"""
+        if self.atom_columns is None:
+            return _entails_sat(hyps, goal)
+        memo = self.column_memo
+        bad = self.mask
+        if goal is not None:
+            bad ^= columns.evaluate_column(goal, self.atom_columns, self.mask, memo)
+        for h in hyps:
+            bad &= columns.evaluate_column(h, self.atom_columns, self.mask, memo)
+        return bad == 0
+
+    def solve(self, hyps: FrozenSet[tree.Node], goal: Optional[tree.Node], bound: int) -> Optional[Fragment]:
+        """hyps から goal (None なら矛盾) を bound 行以内で導く断片を返す
+
+        greedy が False なら最も短い断片、True なら最初に見つかった断片を返す。
+        """
+        key = (hyps, goal)
+        fragment = self.solved.get(key)
+        if fragment is not None:
+            return fragment if fragment[1] <= bound else None
+        failed = self.failed.get(key)
+        if failed is None:
+            entailed = self.entailed.get(key)
+            if entailed is None:
+                entailed = self.entailed[key] = self._entails(hyps, goal)
+            # 意味論的に導けない目標は探索しない
+            failed = -1 if entailed else UNREACHABLE
+        bounds = range(failed + 1, bound + 1)
+        if self.greedy:
+            bounds = bounds[-1:]
+        for b in bounds:
+            fragment = self._expand(hyps, goal, b)
+            if fragment is not None:
+                self.solved[key] = fragment
+                return fragment
+            self.failed[key] = b
+        return None
+
+    def _expand(self, hyps: FrozenSet[tree.Node], goal: Optional[tree.Node], bound: int) -> Optional[Fragment]:
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise TimeoutError(f"証明探索の状態数が上限 ({self.max_nodes}) を超えました")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TimeoutError("証明探索の制限時間を超えました")
+
+        derived = self._closure(hyps)
+        if goal is None:
+            return self._contradiction(hyps, derived, bound)
+
+        if goal in derived:
+            items = self._derivation(derived, [goal])
+            if len(items) <= bound:
+                return items, len(items)
+        if bound < 1:
+            return None
+
+        if isinstance(goal, tree.Implies):
+            fragment = self._subproof("CD", goal.left, hyps, goal.right, goal, bound)
+            if fragment is not None:
+                return fragment
+        elif isinstance(goal, tree.And):
+            fragment = self._combine(hyps, [goal.left, goal.right], goal, "Adj", bound)
+            if fragment is not None:
+                return fragment
+        elif isinstance(goal, tree.Equivalence):
+            parts = [tree.Implies(goal.left, goal.right), tree.Implies(goal.right, goal.left)]
+            fragment = self._combine(hyps, parts, goal, "CB", bound)
+            if fragment is not None:
+                return fragment
+        elif isinstance(goal, tree.Or):
+            for part in (goal.left, goal.right):
+                fragment = self._combine(hyps, [part], goal, "Add", bound)
+                if fragment is not None:
+                    return fragment
+        elif isinstance(goal, tree.Not) and isinstance(goal.child, tree.Not):
+            fragment = self._combine(hyps, [goal.child.child], goal, "DN", bound)
+            if fragment is not None:
+                return fragment
+
+        assumption = goal.child if isinstance(goal, tree.Not) else tree.Not(goal)
+        return self._subproof("ID", assumption, hyps, None, goal, bound)
+
+    def _combine(self, hyps: FrozenSet[tree.Node], parts: List[tree.Node], goal: tree.Node,
+                 rule: str, bound: int) -> Optional[Fragment]:
+        """parts を順に導いてから rule で goal を導く"""
+        items: List[Item] = []
+        remaining = bound - 1
+        for part in parts:
+            fragment = self.solve(hyps, part, remaining)
+            if fragment is None:
+                return None
+            items += fragment[0]
+            remaining -= fragment[1]
+            hyps = hyps | _established(fragment[0])
+        items.append(("line", goal, rule, tuple(parts)))
+        return items, bound - remaining
+
+    def _subproof(self, kind: str, assumption: tree.Node, hyps: FrozenSet[tree.Node],
+                  goal: Optional[tree.Node], conclusion: tree.Node, bound: int) -> Optional[Fragment]:
+        """assumption を仮定する副演繹で goal を導き、kind (CD か ID) で conclusion を導く"""
+        if bound < 2:
+            return None
+        fragment = self.solve(hyps | {assumption}, goal, bound - 2)
+        if fragment is None:
+            return None
+        inner = list(fragment[0])
+        local = {assumption} | _established(inner)
+        if goal is None:
+            chi = inner[-1][1]
+            needed = [chi, tree.Not(chi)]
+        else:
+            needed = [goal]
+        for node in needed:
+            if node not in local:
+                # 外側の行は R で副演繹の中に繰り返す
+                inner.insert(len(inner) - 1 if goal is None else len(inner), ("line", node, "R", (node,)))
+                local.add(node)
+        cost = _cost(inner) + 2
+        if cost > bound:
+            return None
+        return [("sub", kind, assumption, inner, conclusion)], cost
+
+    def _contradiction(self, hyps: FrozenSet[tree.Node], derived: Dict[tree.Node, Tuple[str, Tuple[tree.Node, ...]]],
+                       bound: int) -> Optional[Fragment]:
+        best: Optional[Fragment] = None
+        for node in derived:
+            negation = tree.Not(node)
+            if negation in derived:
+                items = self._derivation(derived, [node, negation])
+                if len(items) <= bound and (best is None or len(items) < best[1]):
+                    best = items + [("contradiction", node)], len(items)
+        if best is not None:
+            return best
+        if bound < 1:
+            return None
+
+        # 真偽の決まっていない部分記号文で場合分けする
+        # (根拠になっている記号文の直接の部分記号文から試す)
+        candidates = [s for s in self.subformulas if s not in derived and tree.Not(s) not in derived]
+        direct = set()
+        for f in derived:
+            if isinstance(f, tree.Operator):
+                direct.update(f.args)
+        candidates.sort(key=lambda s: s not in direct)
+        for s in candidates:
+            lemma = s.child if isinstance(s, tree.Not) else tree.Not(s)
+            first = self.solve(hyps, lemma, bound - 1)
+            if first is None:
+                continue
+            rest = self.solve(hyps | _established(first[0]), None, bound - first[1])
+            if rest is not None:
+                return first[0] + rest[0], first[1] + rest[1]
+        return None
+
+
+def find_proof(premises: Sequence[tree.Node], conclusion: tree.Node, max_nodes: int = MAX_NODES,
+               timeout: Optional[float] = None, max_lines: int = MAX_LINES) -> Optional[Proof]:
+    """前提から結論を導く、できるだけ短い演繹を探す
+
+    推論が意味論的に妥当かは確かめないので、妥当な推論だけを渡すこと
+    (Inference.find_proof は妥当性を確かめてから呼ぶ)。
+    最初に見つかった演繹より短いものを探す途中で予算を使い切った場合は、
+    それまでに見つかった最も短い演繹を返す。
+
+    Args:
+        premises: 前提の記号文の木
+        conclusion: 結論の記号文の木
+        max_nodes: 探索する状態の数の上限。演繹が1つも見つからないうちに超えると TimeoutError を送出する
+        timeout: 探索の制限時間 (秒)。演繹が1つも見つからないうちに超えると TimeoutError を送出する
+        max_lines: 演繹の行数 (前提の行を除く) の上限
+
+    Returns:
+        見つかった演繹 (max_lines 行以内の演繹がなければ None)
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    search = _Search(premises, conclusion, max_nodes, deadline)
+    hyps = frozenset(premises)
+    try:
+        with instrumentation.stage("proof"):
+            # 最初に見つかる演繹を求めてから、それより短い演繹を反復深化で探す
+            search.greedy = True
+            fragment = search.solve(hyps, conclusion, max_lines)
+            if fragment is None:
+                return None
+            search.greedy = False
+            search.solved.clear()
+            search.failed.clear()
+            try:
+                shorter = search.solve(hyps, conclusion, fragment[1] - 1)
+            except TimeoutError:
+                # 予算を使い切ったら、それまでに見つかった演繹を返す
+                shorter = None
+            if shorter is not None:
+                fragment = shorter
+    finally:
+        instrumentation.count("proof_nodes", search.nodes)
+
+    lines: List[Line] = []
+    scopes: List[Dict[tree.Node, int]] = [{}]
+
+    def emit(formula: tree.Node, rule: str, cites: Tuple[int, ...], depth: int):
+        lines.append(Line(len(lines) + 1, formula, rule, cites, depth))
+        scopes[-1][formula] = len(lines)
+
+    def lookup(formula: tree.Node) -> int:
+        for scope in reversed(scopes):
+            if formula in scope:
+                return scope[formula]
+        raise ValueError(f"根拠の行が見つかりません: {formula!r}")
+
+    for premise in premises:
+        if premise not in scopes[0]:
+            emit(premise, "PR", (), 0)
+    # (要素の並び, 次の位置, 深さ, 副演繹の要素, 仮定の行番号) を積む
+    stack: List[Tuple[List[Item], int, int, Optional[Item], int]] = [(fragment[0], 0, 0, None, 0)]
+    while stack:
+        items, position, depth, parent, start = stack.pop()
+        if position == len(items):
+            if parent is not None:
+                end = len(lines)
+                scopes.pop()
+                emit(parent[4], parent[1], (start, end), depth - 1)
+            continue
+        item = items[position]
+        stack.append((items, position + 1, depth, parent, start))
+        if item[0] == "line":
+            emit(item[1], item[2], tuple(lookup(p) for p in item[3]), depth)
+        elif item[0] == "sub":
+            scopes.append({})
+            emit(item[2], "ACD" if item[1] == "CD" else "AID", (), depth + 1)
+            stack.append((item[3], 0, depth + 1, item, len(lines)))
+    if lines[-1].formula is not conclusion:
+        # 結論が前提にある場合は、最後の行に繰り返す
+        emit(conclusion, "R", (lookup(conclusion),), 0)
+    return Proof(premises, conclusion, lines)
@@ -0,0 +1,183 @@
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import tree
+
+# 推論の前処理: 真偽値表を作る前に、判定する問題を小さくする
+#
+# 1. 単位伝播: 文記号1つ (またはその否定) だけの前提はその文記号の値を決めるので、
+#    値を他の前提と結論に代入して簡約する。真になった前提は取り除き、
+#    偽になった前提があれば前提が矛盾しているので推論は妥当である。
+# 2. 連結成分への分割: 文記号を共有する前提どうしを結び、結論と文記号を共有する
+#    前提 (結論の成分) とそれ以外の成分に分ける。成分どうしは文記号を共有しないので、
+#    反例があるのは「結論の成分で 前提∧~結論 が充足可能」かつ
+#    「他の成分がそれぞれ充足可能」なときに限る。他の成分のどれかが充足不能なら
+#    前提が矛盾しているので推論は妥当である。
+#
+# 各成分で真偽値表の最初の行 (文記号の辞書順で最小の割り当て) を求めて組み合わせると、
+# 成分どうしは文記号を共有しないので、元の推論の真偽値表の最初の反例の行と一致する。
+# 簡約で消えた文記号はどちらの値でもよいので偽にする。
+
+Simplified = Union[bool, tree.Node]
+
+
+def _negate(value: Simplified) -> Simplified:
+    if isinstance(value, bool):
+        return not value
+    return tree.Not(value)
+
+
+def simplify(node: tree.Node, fixed: Dict[str, bool]) -> Simplified:
+    """値の決まった文記号を代入して記号文を簡約する
+
+    Returns:
+        真偽値が決まれば True または False、決まらなければ簡約した記号文の木
+    """
+    memo: Dict[tree.Node, Simplified] = {}
+    for n in tree.postorder(node, memo):
+        result: Simplified
+        if isinstance(n, tree.Atom):
+            result = fixed.get(n.value, n)
+        elif isinstance(n, tree.Not):
+            result = _negate(memo[n.child])
+        else:
+            left = memo[n.left]
+            right = memo[n.right]
+            if isinstance(n, tree.And):
+                if left is False or right is False:
+                    result = False
+                elif left is True:
+                    result = right
+                elif right is True:
+                    result = left
+                else:
+                    result = tree.And(left, right)
+            elif isinstance(n, tree.Or):
+                if left is True or right is True:
+                    result = True
+                elif left is False:
+                    result = right
+                elif right is False:
+                    result = left
+                else:
+                    result = tree.Or(left, right)
+            elif isinstance(n, tree.Implies):
+                if left is False or right is True:
+                    result = True
+                elif left is True:
+                    result = right
+                elif right is False:
+                    result = _negate(left)
+                else:
+                    result = tree.Implies(left, right)
+            elif isinstance(n, tree.Equivalence):
+                if isinstance(left, bool) and isinstance(right, bool):
+                    result = left == right
+                elif isinstance(left, bool):
+                    result = right if left else _negate(right)
+                elif isinstance(right, bool):
+                    result = left if right else _negate(left)
+                else:
+                    result = tree.Equivalence(left, right)
+            else:
+                raise ValueError(f"未知の結合子です: {n!r}")
+        memo[n] = result
+    return memo[node]
+
+
+def _literal(node: tree.Node) -> Optional[Tuple[str, bool]]:
+    """文記号1つ、またはその否定なら (文記号, 真になる値) を返す"""
+    if isinstance(node, tree.Atom):
+        return node.value, True
+    if isinstance(node, tree.Not) and isinstance(node.child, tree.Atom):
+        return node.child.value, False
+    return None
+
+
+class Reduction:
+    """推論を前処理した結果
+
+    Attributes:
+        fixed: 単位伝播で値の決まった文記号
+        inconsistent: 単位伝播で前提の矛盾が分かったか (分かれば推論は妥当)
+        conclusion: 簡約した結論 (真偽値または木)
+        main: 結論と文記号を共有する成分の、簡約した前提
+        independent: 結論と文記号を共有しない成分ごとの、簡約した前提
+        dropped: 単位伝播で取り除いた前提の数 (値を決めた前提と、真になった前提)
+    """
+    def __init__(self):
+        self.fixed: Dict[str, bool] = {}
+        self.inconsistent = False
+        self.conclusion: Simplified = False
+        self.main: List[tree.Node] = []
+        self.independent: List[List[tree.Node]] = []
+        self.dropped = 0
+
+    def is_trivial(self, premise_count: int) -> bool:
+        """前処理で問題が小さくならなかったか (成分が1つで、前提も文記号も減っていない)"""
+        return (not self.inconsistent and not self.fixed and not self.independent
+                and len(self.main) == premise_count and not isinstance(self.conclusion, bool))
+
+
+def reduce_argument(premises: Sequence[tree.Node], conclusion: tree.Node) -> Reduction:
+    """単位伝播と連結成分への分割で推論を前処理する"""
+    result = Reduction()
+    fixed = result.fixed
+    current: List[tree.Node] = list(premises)
+    while True:
+        remaining: List[tree.Node] = []
+        propagated = False
+        for premise in current:
+            value = simplify(premise, fixed) if fixed else premise
+            if value is False:
+                result.inconsistent = True
+                return result
+            if value is True:
+                result.dropped += 1
+                continue
+            literal = _literal(value)
+            if literal is not None:
+                atom, truth = literal
+                if fixed.get(atom, truth) != truth:
+                    result.inconsistent = True
+                    return result
+                fixed[atom] = truth
+                result.dropped += 1
+                propagated = True
+                continue
+            remaining.append(value)
+        current = remaining
+        if not propagated:
+            break
+    result.conclusion = simplify(conclusion, fixed) if fixed else conclusion
+
+    # 文記号の union-find で成分を求める
+    parent: Dict[str, str] = {}
+
+    def find(atom: str) -> str:
+        root = atom
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[atom] != root:
+            parent[atom], atom = root, parent[atom]
+        return root
+
+    def union(atoms) -> Optional[str]:
+        roots = [find(atom) for atom in atoms]
+        for root in roots[1:]:
+            parent[root] = roots[0]
+        return find(roots[0]) if roots else None
+
+    for premise in current:
+        union(premise.atoms)
+    main_root = None
+    if not isinstance(result.conclusion, bool):
+        main_root = union(result.conclusion.atoms)
+
+    groups: Dict[str, List[tree.Node]] = {}
+    for premise in current:
+        root = find(next(iter(premise.atoms)))
+        if root == main_root:
+            result.main.append(premise)
+        else:
+            groups.setdefault(root, []).append(premise)
+    result.independent = list(groups.values())
+    return result
@@ -0,0 +1,285 @@
+import heapq
+from typing import Dict, List, Optional, Sequence
+import instrumentation
+import normalform
+import tree
+
+# 充足可能性判定 (SAT) による意味論的妥当性の判断
+#
+# 推論が妥当でないことは「前提すべて ∧ ~結論」が充足可能であることと同値なので、
+# これを Tseitin 変換 (normalform.tseitin) で連言標準形 (CNF) にして CDCL ソルバで解く。
+# 充足する割り当てがあれば、それがそのまま反例になる。
+#
+# リテラルは DIMACS 形式と同じく、変数番号 v (1以上) の正負の整数で表す。
+
+
+# Tseitin 変換で作る連言標準形 (定義節は部分木の現れる極性に必要な向きだけ作る)
+CNF = normalform.ClauseSet
+
+
+def luby(i: int) -> int:
+    """Luby 数列の第 i 項 (i は 1 始まり): 1, 1, 2, 1, 1, 2, 4, ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while i != (1 << k) - 1:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+class Solver:
+    """監視リテラル・VSIDS・リスタートを備えた CDCL ソルバ"""
+    RESTART_BASE = 100
+    VAR_DECAY = 0.95
+
+    def __init__(self, num_vars: int):
+        self.num_vars = num_vars
+        self.clauses: List[List[int]] = []
+        # 監視リストはリテラルで添字を引く (負のリテラルはリストの後半に対応する)
+        self.watches: List[List[int]] = [[] for _ in range(2 * num_vars + 1)]
+        # 変数の値: 1 真, -1 偽, 0 未割り当て
+        self.assigns: List[int] = [0] * (num_vars + 1)
+        self.level: List[int] = [0] * (num_vars + 1)
+        self.reason: List[Optional[int]] = [None] * (num_vars + 1)
+        self.polarity: List[int] = [-1] * (num_vars + 1)
+        self.activity: List[float] = [0.0] * (num_vars + 1)
+        self.var_inc = 1.0
+        self.heap = [(0.0, v) for v in range(1, num_vars + 1)]
+        self.trail: List[int] = []
+        self.trail_lim: List[int] = []
+        self.qhead = 0
+        self.ok = True
+        self.conflicts = 0
+
+    def value(self, lit: int) -> int:
+        v = self.assigns[abs(lit)]
+        return v if lit > 0 else -v
+
+    def add_clause(self, lits: Sequence[int]) -> bool:
+        """節を追加する (決定レベル 0 でのみ呼ぶ)。矛盾が確定したら False を返す"""
+        if not self.ok:
+            return False
+        clause: List[int] = []
+        for lit in lits:
+            value = self.value(lit)
+            if value == 1 or -lit in clause:
+                return True  # 既に充足しているか恒真
+            if value == 0 and lit not in clause:
+                clause.append(lit)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self._enqueue(clause[0], None)
+            self.ok = self._propagate() is None
+        else:
+            self._attach(clause)
+        return self.ok
+
+    def _attach(self, clause: List[int]) -> int:
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    def _enqueue(self, lit: int, reason: Optional[int]):
+        v = abs(lit)
+        self.assigns[v] = 1 if lit > 0 else -1
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def _propagate(self) -> Optional[int]:
+        """単位伝播を行い、矛盾した節があればその番号を返す"""
+        assigns = self.assigns
+        clauses = self.clauses
+        watches = self.watches
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            ws = watches[false_lit]
+            i = j = 0
+            n = len(ws)
+            while i < n:
+                index = ws[i]
+                i += 1
+                clause = clauses[index]
+                # 偽になった監視リテラルを clause[1] に置く
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                first_value = assigns[abs(first)] if first > 0 else -assigns[abs(first)]
+                if first_value == 1:
+                    ws[j] = index
+                    j += 1
+                    continue
+                # 偽でない別のリテラルを探して監視を付け替える
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    if (assigns[abs(lit)] if lit > 0 else -assigns[abs(lit)]) != -1:
+                        clause[1], clause[k] = lit, false_lit
+                        watches[lit].append(index)
+                        break
+                else:
+                    ws[j] = index
+                    j += 1
+                    if first_value == -1:
+                        # 矛盾: 残りの監視はそのまま残す
+                        while i < n:
+                            ws[j] = ws[i]
+                            j += 1
+                            i += 1
+                        del ws[j:]
+                        return index
+                    self._enqueue(first, index)
+            del ws[j:]
+        return None
+
+    def _bump(self, v: int):
+        self.activity[v] += self.var_inc
+        if self.activity[v] > 1e100:
+            # 桁あふれを防ぐため全体を縮める
+            for u in range(1, self.num_vars + 1):
+                self.activity[u] *= 1e-100
+            self.var_inc *= 1e-100
+            self.heap = [(-self.activity[u], u) for u in range(1, self.num_vars + 1) if self.assigns[u] == 0]
+            heapq.heapify(self.heap)
+        elif self.assigns[v] == 0:
+            heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def _analyze(self, conflict: int):
+        """1UIP で学習節を作り、(学習節, 戻り先の決定レベル) を返す"""
+        seen = [False] * (self.num_vars + 1)
+        current_level = len(self.trail_lim)
+        learnt = [0]
+        counter = 0
+        lit: Optional[int] = None
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            # 理由節の先頭は伝播されたリテラル自身なので飛ばす
+            for q in (clause if lit is None else clause[1:]):
+                v = abs(q)
+                if not seen[v] and self.level[v] > 0:
+                    seen[v] = True
+                    self._bump(v)
+                    if self.level[v] >= current_level:
+                        counter += 1
+                    else:
+                        learnt.append(q)
+            while not seen[abs(self.trail[index])]:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            seen[abs(lit)] = False
+            counter -= 1
+            if counter == 0:
+                break
+            reason = self.reason[abs(lit)]
+            assert reason is not None
+            clause = self.clauses[reason]
+        learnt[0] = -lit
+
+        if len(learnt) == 1:
+            return learnt, 0
+        # 2番目の監視リテラルには最も新しい決定レベルのリテラルを置く
+        best = max(range(1, len(learnt)), key=lambda k: self.level[abs(learnt[k])])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def _backtrack(self, level: int):
+        if len(self.trail_lim) <= level:
+            return
+        limit = self.trail_lim[level]
+        for lit in self.trail[limit:]:
+            v = abs(lit)
+            self.polarity[v] = self.assigns[v]
+            self.assigns[v] = 0
+            self.reason[v] = None
+            heapq.heappush(self.heap, (-self.activity[v], v))
+        del self.trail[limit:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def _decide(self) -> Optional[int]:
+        while self.heap:
+            _, v = heapq.heappop(self.heap)
+            if self.assigns[v] == 0:
+                return v if self.polarity[v] == 1 else -v
+        return None
+
+    def solve(self, max_conflicts: Optional[int] = None) -> Optional[Dict[int, bool]]:
+        """充足する割り当てを探す
+
+        Args:
+            max_conflicts: 矛盾の回数の上限。超えた場合は TimeoutError を送出する
+
+        Returns:
+            充足可能なら {変数番号: 真偽値}、充足不能なら None
+        """
+        if not self.ok or self._propagate() is not None:
+            self.ok = False
+            return None
+        restarts = 1
+        budget = luby(restarts) * self.RESTART_BASE
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return None
+                if max_conflicts is not None and self.conflicts > max_conflicts:
+                    raise TimeoutError("SAT ソルバの矛盾回数が上限を超えました")
+                learnt, level = self._analyze(conflict)
+                self._backtrack(level)
+                if len(learnt) == 1:
+                    self._enqueue(learnt[0], None)
+                else:
+                    self._enqueue(learnt[0], self._attach(learnt))
+                self.var_inc /= self.VAR_DECAY
+                budget -= 1
+                continue
+
+            if budget <= 0:
+                # Luby 数列に従ってリスタートする (学習節と活性度は残す)
+                restarts += 1
+                budget = luby(restarts) * self.RESTART_BASE
+                self._backtrack(0)
+                continue
+
+            lit = self._decide()
+            if lit is None:
+                return {v: self.assigns[v] == 1 for v in range(1, self.num_vars + 1)}
+            self.trail_lim.append(len(self.trail))
+            self._enqueue(lit, None)
+
+
+def find_counterexample(premises: Sequence[tree.Node], conclusion: tree.Node,
+                        max_conflicts: Optional[int] = None) -> Optional[Dict[str, bool]]:
+    """前提がすべて真で結論が偽になる原子文の割り当てを SAT で探す
+
+    Args:
+        premises: 前提の記号文の木
+        conclusion: 結論の記号文の木
+        max_conflicts: ソルバの矛盾回数の上限
+
+    Returns:
+        反例となる {原子文: 真偽値} (推論が妥当なら None)
+    """
+    cnf = normalform.tseitin(premises, [conclusion])
+
+    solver = Solver(cnf.num_vars)
+    for clause in cnf.clauses:
+        if not solver.add_clause(clause):
+            return None
+    try:
+        model = solver.solve(max_conflicts)
+    finally:
+        instrumentation.count("sat_conflicts", solver.conflicts)
+    if model is None:
+        return None
+    return {atom: model[v] for atom, v in cnf.atom_vars.items()}
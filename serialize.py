@@ -0,0 +1,257 @@
+import struct
+import sys
+from array import array
+from typing import Dict, List, Mapping, Sequence, Tuple, Union
+import tree
+
+# 記号文の木を、後置記法の命令列と名前の表からなるバイト列にする。
+#
+# ワーカープロセスやキャッシュに木を渡すときに、節点ごとのオブジェクトを pickle する
+# 代わりに使う。読み込みは memoryview で命令列を直接参照するだけで (コピーしない)、
+# evaluate と evaluate_columns は木を作り直さずに命令列のまま評価する。
+#
+# 形式 (整数はすべてリトルエンディアン)
+#   MAGIC (4 バイト)
+#   名前の数, 根の数, 命令の語数 (各 uint32)
+#   名前の終わりの位置 (名前の数だけの uint32、名前の UTF-8 を並べた列の中での位置)
+#   名前の UTF-8 を並べた列 (4 バイト境界まで 0 で埋める)
+#   命令列 (int32)
+#
+# 命令 (0 以上の語は、その番号の名前の原子文)
+#   NOT, AND, OR, IMPLIES, EQUIVALENCE: スタックの上の1つ・2つから節点を作る
+#   REF i:                 i 番目に作った節点をもう一度積む (共有された部分木)
+#   PREDICATE p n t1..tn:  述語 p に項 t1..tn を並べた原子式
+#   UNIVERSAL v, EXISTENTIAL v: スタックの上の節点を変数 v で量化する
+#   OPERATOR s n:          記号 s でスタックの上の n 個をまとめた節点 (Operator そのもの)
+# REF 以外の命令は1つずつ節点を作り、作った順に 0, 1, 2, ... と番号をつける。
+# 最後にスタックに残った節点が、dumps に渡した順の根になる。
+
+MAGIC = b"TSA1"
+NOT, AND, OR, IMPLIES, EQUIVALENCE = -1, -2, -3, -4, -5
+REF, PREDICATE, UNIVERSAL, EXISTENTIAL, OPERATOR = -6, -7, -8, -9, -10
+
+_BINARY_CODES = {tree.And: AND, tree.Or: OR, tree.Implies: IMPLIES, tree.Equivalence: EQUIVALENCE}
+_BINARY_CLASSES = {code: cls for cls, code in _BINARY_CODES.items()}
+_QUANTIFIER_CODES = {tree.Universal: UNIVERSAL, tree.Existential: EXISTENTIAL}
+_QUANTIFIER_CLASSES = {code: cls for cls, code in _QUANTIFIER_CODES.items()}
+
+_HEADER = struct.Struct("<4sIII")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def dumps(nodes: Sequence[tree.Node]) -> bytes:
+    """記号文の木をバイト列にする (共有された部分木は1度だけ書き出す)"""
+    names: Dict[str, int] = {}
+    code = array("i")
+    # 書き出した節点 -> 番号
+    index: Dict[tree.Node, int] = {}
+    count = 0
+
+    def name(text: str) -> int:
+        return names.setdefault(text, len(names))
+
+    for root in nodes:
+        stack: List[Tuple[tree.Node, bool]] = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if not expanded and node in index and type(node) is not tree.Atom:
+                code.extend((REF, index[node]))
+                continue
+            if type(node) is tree.Atom:
+                code.append(name(node.value))
+            elif isinstance(node, tree.Predicate):
+                code.extend((PREDICATE, name(node.predicate), len(node.terms)))
+                code.extend(name(term) for term in node.terms)
+            elif not isinstance(node, tree.Operator):
+                raise ValueError(f"書き出せない節点です: {node!r}")
+            elif not expanded:
+                stack.append((node, True))
+                stack += [(arg, False) for arg in reversed(node.args)]
+                continue
+            elif type(node) is tree.Not:
+                code.append(NOT)
+            elif type(node) in _BINARY_CODES:
+                code.append(_BINARY_CODES[type(node)])
+            elif type(node) in _QUANTIFIER_CODES:
+                code.extend((_QUANTIFIER_CODES[type(node)], name(node.variable)))
+            elif type(node) is tree.Operator:
+                code.extend((OPERATOR, name(node.symbol), len(node.args)))
+            else:
+                raise ValueError(f"書き出せない節点です: {node!r}")
+            index[node] = count
+            count += 1
+
+    encoded = [text.encode("utf-8") for text in names]
+    ends = array("I")
+    total = 0
+    for text in encoded:
+        total += len(text)
+        ends.append(total)
+    blob = b"".join(encoded)
+    blob += b"\0" * (-len(blob) % 4)
+    if not _LITTLE_ENDIAN:
+        ends.byteswap()
+        code.byteswap()
+    header = _HEADER.pack(MAGIC, len(names), len(nodes), len(code))
+    return header + ends.tobytes() + blob + code.tobytes()
+
+
+def loads(data: Buffer) -> List[tree.Node]:
+    """dumps の結果から記号文の木を復元する"""
+    return Program(data).to_nodes()
+
+
+class Program:
+    """dumps の結果をコピーせずに参照し、木を作らずに評価する
+
+    Attributes:
+        names: 名前の表
+        roots: 根の数
+        code: 命令列 (int32 の memoryview)
+    """
+    def __init__(self, data: Buffer):
+        view = memoryview(data).cast("B")
+        if len(view) < _HEADER.size:
+            raise ValueError("記号文のバイト列が短すぎます")
+        magic, name_count, self.roots, words = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("記号文のバイト列ではありません")
+        offset = _HEADER.size
+        ends = _words(view, offset, name_count, "I")
+        offset += 4 * name_count
+        blob_size = ends[-1] if name_count else 0
+        blob = view[offset:offset + blob_size]
+        offset += blob_size + (-blob_size % 4)
+        if len(view) != offset + 4 * words:
+            raise ValueError("記号文のバイト列の長さが合いません")
+        start = 0
+        self.names: List[str] = []
+        for end in ends:
+            self.names.append(str(blob[start:end], "utf-8"))
+            start = end
+        self.code = _words(view, offset, words, "i")
+
+    def _atom_name(self, code, pc: int) -> Tuple[str, int]:
+        """pc の PREDICATE 命令の原子式の表記と、次の命令の位置"""
+        names = self.names
+        count = code[pc + 2]
+        terms = [names[code[pc + 3 + j]] for j in range(count)]
+        return names[code[pc + 1]] + "".join(terms), pc + 3 + count
+
+    def to_nodes(self) -> List[tree.Node]:
+        """木を復元する (同じ構造の節点は tree の共有により同じオブジェクトになる)"""
+        code, names = self.code, self.names
+        stack: List[tree.Node] = []
+        made: List[tree.Node] = []
+        pc = 0
+        while pc < len(code):
+            op = code[pc]
+            if op >= 0:
+                node: tree.Node = tree.Atom(names[op])
+                pc += 1
+            elif op == REF:
+                stack.append(made[code[pc + 1]])
+                pc += 2
+                continue
+            elif op == NOT:
+                node = tree.Not(stack.pop())
+                pc += 1
+            elif op in _BINARY_CLASSES:
+                right = stack.pop()
+                node = _BINARY_CLASSES[op](stack.pop(), right)
+                pc += 1
+            elif op == PREDICATE:
+                count = code[pc + 2]
+                node = tree.Predicate(names[code[pc + 1]], *(names[code[pc + 3 + j]] for j in range(count)))
+                pc += 3 + count
+            elif op in _QUANTIFIER_CLASSES:
+                node = _QUANTIFIER_CLASSES[op](names[code[pc + 1]], stack.pop())
+                pc += 2
+            elif op == OPERATOR:
+                count = code[pc + 2]
+                args = stack[len(stack) - count:]
+                del stack[len(stack) - count:]
+                node = tree.Operator(names[code[pc + 1]], *args)
+                pc += 3
+            else:
+                raise ValueError(f"未知の命令です: {op}")
+            stack.append(node)
+            made.append(node)
+        return stack
+
+    def _run(self, atom, negate, binary) -> list:
+        """命令列を順に実行し、根ごとの値を返す
+
+        Args:
+            atom: 原子文の名前 -> 値
+            negate: 値の否定
+            binary: (命令, 左辺の値, 右辺の値) -> 値
+        """
+        code, names = self.code, self.names
+        stack: list = []
+        made: list = []
+        pc = 0
+        while pc < len(code):
+            op = code[pc]
+            if op >= 0:
+                value = atom(names[op])
+                pc += 1
+            elif op == REF:
+                stack.append(made[code[pc + 1]])
+                pc += 2
+                continue
+            elif op == NOT:
+                value = negate(stack.pop())
+                pc += 1
+            elif op in _BINARY_CLASSES:
+                right = stack.pop()
+                value = binary(op, stack.pop(), right)
+                pc += 1
+            elif op == PREDICATE:
+                text, pc = self._atom_name(code, pc)
+                value = atom(text)
+            elif op in _QUANTIFIER_CLASSES:
+                raise ValueError("量化子を含む記号文は、文記号の真偽値だけでは評価できません")
+            else:
+                raise ValueError(f"評価できない命令です: {op}")
+            stack.append(value)
+            made.append(value)
+        return stack
+
+    def evaluate(self, env: Mapping[str, bool]) -> List[bool]:
+        """真偽値の割り当てで各根を評価する (tree の evaluate と同じ真偽値)"""
+        def binary(op: int, left: bool, right: bool) -> bool:
+            if op == AND:
+                return left and right
+            if op == OR:
+                return left or right
+            if op == IMPLIES:
+                return (not left) or right
+            return left == right
+        return [bool(value) for value in self._run(lambda name: bool(env[name]), lambda value: not value, binary)]
+
+    def evaluate_columns(self, columns: Mapping[str, int], mask: int) -> List[int]:
+        """各根を列単位のビット演算で評価する (columns.evaluate_column と同じ列)"""
+        def binary(op: int, left: int, right: int) -> int:
+            if op == AND:
+                return left & right
+            if op == OR:
+                return left | right
+            if op == IMPLIES:
+                return (left ^ mask) | right
+            return (left ^ right) ^ mask
+        return self._run(columns.__getitem__, lambda value: value ^ mask, binary)
+
+
+def _words(view: memoryview, offset: int, count: int, typecode: str):
+    """view の offset から count 語の 32 ビット整数 (リトルエンディアンならコピーしない)"""
+    if len(view) < offset + 4 * count:
+        raise ValueError("記号文のバイト列が短すぎます")
+    chunk = view[offset:offset + 4 * count]
+    if _LITTLE_ENDIAN:
+        return chunk.cast(typecode)
+    words = array(typecode, chunk)
+    words.byteswap()
+    return words
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+
+import batch
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.directory.name, "in.jsonl")
+        self.output_path = os.path.join(self.directory.name, "out.ndjson")
+        # 空行と壊れた行も混ぜる
+        lines = []
+        for number in range(30):
+            if number % 7 == 3:
+                lines.append("")
+            elif number == 12:
+                lines.append("{broken")
+            else:
+                lines.append(json.dumps({"id": number, "premises": [f"P_{number % 4}|Q"], "conclusion": "Q"}))
+        with open(self.input_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        self.graded = [number + 1 for number, line in enumerate(lines) if line]
+        batch.CHUNK_SIZE, self.chunk_size = 4, batch.CHUNK_SIZE
+
+    def tearDown(self):
+        batch.CHUNK_SIZE = self.chunk_size
+        self.directory.cleanup()
+
+    def read_output(self):
+        with open(self.output_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_ordered(self):
+        count, skipped, _ = batch.run(self.input_path, self.output_path, 2)
+        self.assertEqual((count, skipped), (len(self.graded), 0))
+        results = self.read_output()
+        self.assertEqual([result["line"] for result in results], self.graded)
+        broken = next(result for result in results if result["line"] == 13)
+        self.assertIsNone(broken["id"])
+        self.assertIsNotNone(broken["error"])
+        self.assertTrue(all(result["valid"] is False for result in results if result["line"] != 13))
+
+    def test_resume_after_crash(self):
+        batch.run(self.input_path, self.output_path, 2)
+        with open(self.output_path, encoding="utf-8") as f:
+            lines = f.readlines()
+        # 9行書き出したところで、10行目を書きかけで止まったことにする
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            f.write("".join(lines[:9]) + lines[9][:10])
+        count, skipped, _ = batch.run(self.input_path, self.output_path, 2)
+        self.assertEqual((count, skipped), (len(self.graded) - 9, 9))
+        self.assertEqual([result["line"] for result in self.read_output()], self.graded)
+        # 全部書き出し済みなら何もしない
+        self.assertEqual(batch.run(self.input_path, self.output_path, 2)[:2], (0, len(self.graded)))
+
+    def test_resume_unordered(self):
+        batch.run(self.input_path, self.output_path, 3, ordered=False)
+        self.assertEqual(sorted(result["line"] for result in self.read_output()), self.graded)
+        # 判定が終わった順の出力から、途中の行が抜けた状態を作る
+        results = self.read_output()
+        missing = {self.graded[5], self.graded[6], self.graded[-1]}
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            for result in results:
+                if result["line"] not in missing:
+                    f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        done = batch.load_done(self.output_path, self.input_path)
+        self.assertEqual(len(done), len(self.graded) - len(missing))
+        # 抜けた最初の行の手前までは mark にまとめ、それより後だけを個別に持つ
+        self.assertEqual(done.mark, self.graded[5] - 1)
+        self.assertEqual(done.above, set(self.graded[7:-1]))
+        count, skipped, _ = batch.run(self.input_path, self.output_path, 3, ordered=False)
+        self.assertEqual((count, skipped), (len(missing), len(self.graded) - len(missing)))
+        self.assertEqual(sorted(result["line"] for result in self.read_output()), self.graded)
+
+
+if __name__ == "__main__":
+    unittest.main()
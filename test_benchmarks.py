@@ -0,0 +1,78 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from benchmarks import suite
+from benchmarks.generator import FormulaConfig, random_argument, random_formula, render
+from inference import Formula
+
+
+class GeneratorTest(unittest.TestCase):
+    def test_seeded(self):
+        config = FormulaConfig(atoms=5, depth=4, notation="informal")
+        first = [random_argument(random.Random(7), config) for _ in range(3)]
+        second = [random_argument(random.Random(7), config) for _ in range(3)]
+        self.assertEqual(first, second)
+
+    def test_render_parses_back(self):
+        rng = random.Random(10)
+        for _ in range(200):
+            config = FormulaConfig(atoms=rng.randint(1, 6), depth=rng.randint(0, 6))
+            node = random_formula(rng, config)
+            for notation in ("formal", "informal"):
+                with self.subTest(node=node, notation=notation):
+                    formula = Formula(render(node, notation, rng))
+                    self.assertIs(formula.symbolic_representation_tree, node)
+                    if notation == "formal":
+                        self.assertTrue(formula.is_formal)
+
+    def test_argument_uses_every_atom(self):
+        rng = random.Random(11)
+        config = FormulaConfig(atoms=8, depth=1, premises=1)
+        for _ in range(50):
+            premises, conclusion = random_argument(rng, config)
+            atoms = set()
+            for text in [*premises, conclusion]:
+                atoms |= Formula(text).get_atoms()
+            self.assertEqual(atoms, set(config.atom_names()))
+
+
+class SuiteTest(unittest.TestCase):
+    def test_save_and_compare(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            options = ["--atoms", "2", "3", "--arguments", "2", "--repeat", "1", "--depth", "2"]
+            with contextlib.redirect_stdout(io.StringIO()):
+                suite.main(options + ["--save", path])
+            with open(path, encoding="utf-8") as f:
+                baseline = json.load(f)
+            self.assertEqual(set(baseline["results"]), set(suite.STAGES))
+            self.assertEqual(set(baseline["results"]["validity"]), {"2", "3"})
+            # 許容する劣化を大きくすれば、同じ条件の計測は劣化とみなされない
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                suite.main(["--compare", path, "--tolerance", "1000"])
+            self.assertNotIn("REGRESSION", output.getvalue())
+
+    def test_compare(self):
+        baseline = {"results": {stage: {"4": 1.0} for stage in suite.STAGES}}
+        report = {"results": {stage: {"4": 1.2} for stage in suite.STAGES}}
+        self.assertEqual(suite.compare(report, baseline, 0.25), [])
+        report["results"]["validity"]["4"] = 1.5
+        regressions = suite.compare(report, baseline, 0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("validity n=4"))
+
+    def test_parse_connectives(self):
+        self.assertEqual(suite.parse_connectives("and=2,not"), {"and": 2.0, "not": 1.0})
+        with self.assertRaises(argparse.ArgumentTypeError):
+            suite.parse_connectives("xor=1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from typing import Dict, List
+
+import cache
+import tree
+from inference import Formula, Inference
+from test_engines import is_counterexample, make_inference, random_arguments
+
+
+def transform(node: tree.Node, names: Dict[str, str], rng: random.Random) -> tree.Node:
+    """文記号の名前を names で付け替え、ところどころに二重否定を加えた木を作る"""
+    memo: Dict[tree.Node, tree.Node] = {}
+    for n in tree.postorder(node):
+        if isinstance(n, tree.Atom):
+            result = tree.Atom(names[n.value])
+        else:
+            result = type(n)(*(memo[arg] for arg in n.args))
+        if rng.random() < 0.2:
+            result = tree.Not(tree.Not(result))
+        memo[n] = result
+    return memo[node]
+
+
+def parse_key(key: str):
+    """正規形のキーを (前提の木, 結論の木) に戻す"""
+    premises, conclusion = key.rsplit("|-", 1)
+    nodes = [Formula(text).symbolic_representation_tree for text in premises.split(",") if text]
+    return nodes, Formula(conclusion).symbolic_representation_tree
+
+
+def trees(texts: List[str]) -> List[tree.Node]:
+    return [Formula(text).symbolic_representation_tree for text in texts]
+
+
+class CanonicalizeTest(unittest.TestCase):
+    def test_round_trip(self):
+        rng = random.Random(17)
+        for premises, conclusion in random_arguments(17, 150):
+            nodes, goal = trees(premises), Formula(conclusion).symbolic_representation_tree
+            atoms = sorted(set().union(goal.atoms, *(node.atoms for node in nodes)))
+            renamed = dict(zip(atoms, rng.sample([f"X_{idx}" for idx in range(20)], len(atoms))))
+            other_nodes = [transform(node, renamed, rng) for node in nodes]
+            other_goal = transform(goal, renamed, rng)
+            with self.subTest(premises=premises, conclusion=conclusion):
+                key, names = cache.canonicalize(nodes, goal)
+                other_key, other_names = cache.canonicalize(other_nodes, other_goal)
+                # 文記号の名前と二重否定によらない
+                self.assertEqual(other_key, key)
+                self.assertEqual({renamed[atom]: name for atom, name in names.items()}, other_names)
+                # 重複した前提は1つにまとめる
+                self.assertEqual(cache.canonicalize(nodes + nodes, goal)[0], key)
+                # 形の違う前提は並べ替えても同じキーになる
+                shapes = [cache._normalize(node, {})[1] for node in nodes]
+                if len(set(shapes)) == len(shapes):
+                    self.assertEqual(cache.canonicalize(nodes[::-1], goal)[0], key)
+                # キーの表す推論は元の推論と妥当性が同じ
+                canonical_premises, canonical_goal = parse_key(key)
+                self.assertEqual(
+                    make_inference([repr(node) for node in canonical_premises], repr(canonical_goal), "rows")
+                    .is_semantically_valid(),
+                    make_inference(premises, conclusion, "rows").is_semantically_valid(),
+                )
+
+    def test_stored_counterexample_maps_back(self):
+        rng = random.Random(18)
+        validity_cache = cache.ValidityCache()
+        for premises, conclusion in random_arguments(18, 100):
+            nodes, goal = trees(premises), Formula(conclusion).symbolic_representation_tree
+            inference = make_inference(premises, conclusion, "rows", cache=validity_cache)
+            valid = inference.is_semantically_valid()
+            atoms = sorted(inference.get_all_atoms())
+            renamed = dict(zip(atoms, rng.sample([f"X_{idx}" for idx in range(20)], len(atoms))))
+            other_premises = [repr(transform(node, renamed, rng)) for node in nodes]
+            other_conclusion = repr(transform(goal, renamed, rng))
+            hits = validity_cache.hits
+            other = make_inference(other_premises, other_conclusion, "rows", cache=validity_cache)
+            with self.subTest(premises=premises, conclusion=conclusion):
+                self.assertEqual(other.is_semantically_valid(), valid)
+                self.assertEqual(validity_cache.hits, hits + 1)
+                row = other.get_counterexample()
+                self.assertEqual(row is None, valid)
+                self.assertEqual(is_counterexample(other_premises, other_conclusion, row), not valid)
+
+
+class ValidityCacheTest(unittest.TestCase):
+    def test_lru(self):
+        validity_cache = cache.ValidityCache(max_entries=2)
+        arguments = [(trees([f"({a}->{b})"]), tree.Atom(b)) for a, b in [("P", "Q"), ("P", "~Q"), ("~P", "~Q")]]
+        for premises, conclusion in arguments:
+            validity_cache.store(premises, conclusion, True, None)
+        self.assertEqual(len(validity_cache), 2)
+        self.assertIsNone(validity_cache.lookup(*arguments[0]))
+        self.assertEqual(validity_cache.lookup(*arguments[2]), (True, None))
+
+    def test_persisted_and_versioned(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite3")
+            premises, conclusion = trees(["(P|Q)"]), tree.Atom("P")
+            first = cache.ValidityCache(path)
+            first.store(premises, conclusion, False, {"P": False, "Q": True})
+            first.close()
+            second = cache.ValidityCache(path)
+            self.assertEqual(second.lookup(trees(["(R|S)"]), tree.Atom("R")), (False, {"R": False, "S": True}))
+            second.close()
+            # 版の違うファイルの判定結果は使わない
+            db = sqlite3.connect(path)
+            db.execute(f"PRAGMA user_version = {cache.FORMAT_VERSION + 1}")
+            db.commit()
+            db.close()
+            third = cache.ValidityCache(path)
+            self.assertIsNone(third.lookup(premises, conclusion))
+            third.close()
+
+    def test_default_cache(self):
+        previous = cache.default_cache()
+        validity_cache = cache.ValidityCache()
+        cache.set_default_cache(validity_cache)
+        try:
+            premises, conclusion = [Formula("(P->Q)"), Formula("P")], Formula("Q")
+            self.assertIs(Inference(premises, conclusion).cache, validity_cache)
+            self.assertTrue(Inference(premises, conclusion).is_semantically_valid())
+            self.assertEqual(len(validity_cache), 1)
+            self.assertTrue(Inference(premises, conclusion).is_semantically_valid())
+            self.assertEqual(validity_cache.hits, 1)
+            # 使わないこともできる
+            self.assertIsNone(Inference(premises, conclusion, cache=False).cache)
+        finally:
+            cache.set_default_cache(previous)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from itertools import product
+
+import compiler
+import tree
+from inference import Formula
+from test_engines import random_arguments
+
+
+class CompilerTest(unittest.TestCase):
+    def check(self, node: tree.Node, atoms):
+        function = compiler.compile_node(node, atoms)
+        for values in product((False, True), repeat=len(atoms)):
+            self.assertEqual(function(*values), node.evaluate(dict(zip(atoms, values))), values)
+
+    def test_random_formulas(self):
+        for premises, conclusion in random_arguments(2, 150):
+            for text in [*premises, conclusion]:
+                node = Formula(text).symbolic_representation_tree
+                with self.subTest(text=text):
+                    self.check(node, sorted(node.atoms))
+
+    def test_atom_names_are_not_identifiers(self):
+        # 述語の原子式は None のような Python の予約語と同じ表記にもなる
+        node = Formula("(None->(Fa&Gab))").symbolic_representation_tree
+        self.check(node, ["Fa", "Gab", "None"])
+        self.check(node, ["Z", "None", "Gab", "Fa"])
+
+    def test_deep_and_shared_subtrees(self):
+        node: tree.Node = tree.Atom("P")
+        for idx in range(3 * compiler.MAX_INLINE_DEPTH):
+            node = tree.Implies(node, tree.Atom("Q")) if idx % 2 else tree.Not(node)
+        shared = tree.And(node, tree.Or(node, tree.Atom("R")))
+        self.check(shared, ["P", "Q", "R"])
+        source = compiler.generate_source(shared, ["P", "Q", "R"])
+        self.assertIn("_t", source)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from itertools import product
+from typing import Dict, List, Optional
+
+from inference import Inference
+from test_engines import make_inference, random_arguments
+
+
+def expand(cube: Dict[str, Optional[bool]]) -> List[tuple]:
+    """部分的な割り当てがまとめている行 (原子文の値のタプル、原子文はソート順)"""
+    choices = [(value,) if value is not None else (False, True) for _, value in sorted(cube.items())]
+    return list(product(*choices))
+
+
+class CountingTest(unittest.TestCase):
+    def expected(self, premises: List[str], conclusion: str):
+        """1行ずつ評価した (前提が全て真の行の数, 反例の行)"""
+        rows = list(make_inference(premises, conclusion, "rows").iter_truth_table())
+        keys = [f"premise_{idx}" for idx in range(len(premises))]
+        atoms = sorted(key for key in rows[0] if key not in keys and key != "conclusion")
+        models = [row for row in rows if all(row[key] for key in keys)]
+        bad = [tuple(row[atom] for atom in atoms) for row in models if not row["conclusion"]]
+        return len(models), bad
+
+    def check_cubes(self, inference: Inference, bad: List[tuple], page: int):
+        cubes = list(inference.iter_counterexamples())
+        rows = [row for cube in cubes for row in expand(cube)]
+        # 部分的な割り当ては重ならずに反例の行をちょうど覆う
+        self.assertEqual(len(rows), len(set(rows)))
+        self.assertEqual(sorted(rows), bad)
+        pages = []
+        offset = 0
+        while True:
+            chunk = list(inference.iter_counterexamples(offset, page))
+            pages += chunk
+            if len(chunk) < page:
+                break
+            offset += page
+        self.assertEqual(pages, cubes)
+
+    def test_counts_and_cubes(self):
+        for premises, conclusion in random_arguments(25, 150):
+            models, bad = self.expected(premises, conclusion)
+            with self.subTest(premises=premises, conclusion=conclusion):
+                # BDD から数える
+                inference = make_inference(premises, conclusion, "rows")
+                self.assertEqual(inference.count_models(), models)
+                self.assertEqual(inference.count_counterexamples(), len(bad))
+                self.check_cubes(inference, bad, 3)
+                # 列を計算済みなら列から数える
+                inference = make_inference(premises, conclusion, "bitwise")
+                inference.generate_truth_table()
+                self.assertEqual(inference.count_models(), models)
+                self.assertEqual(inference.count_counterexamples(), len(bad))
+                # BDD が大きすぎるときは1行ずつの割り当てを返す
+                inference = make_inference(premises, conclusion, "bitwise")
+                inference._bdd_too_large = True
+                self.assertEqual(inference.count_counterexamples(), len(bad))
+                self.check_cubes(inference, bad, 2)
+                self.assertTrue(all(None not in cube.values() for cube in inference.iter_counterexamples()))
+
+    def test_many_atoms(self):
+        # 真偽値表を作らずに数える
+        atoms = [f"P_{idx}" for idx in range(40)]
+        inference = make_inference(["|".join(atoms)], "&".join(atoms), "sat")
+        self.assertEqual(inference.count_models(), (1 << 40) - 1)
+        self.assertEqual(inference.count_counterexamples(), (1 << 40) - 2)
+        cubes = list(inference.iter_counterexamples(0, 5))
+        self.assertEqual(len(cubes), 5)
+        self.assertIsNone(inference._columns)
+
+    def test_limits(self):
+        inference = make_inference(["P|Q"], "P", "rows")
+        with self.assertRaises(ValueError):
+            inference.iter_counterexamples(-1)
+        with self.assertRaises(ValueError):
+            inference.iter_counterexamples(0, Inference.MAX_CUBES + 1)
+        self.assertEqual(list(inference.iter_counterexamples(0, 0)), [])
+        self.assertEqual(list(inference.iter_counterexamples(5)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
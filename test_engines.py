@@ -0,0 +1,215 @@
+import random
+import unittest
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import bdd
+import columns
+import graycode
+import parallel
+import sat
+from benchmarks.generator import FormulaConfig, random_formula, render
+from inference import Formula, Inference
+
+# 推論に使う原子文 (述語の原子式や、None のように Python の予約語と同じ表記のものも含める)
+ATOM_NAMES = ["P", "Q", "R", "S", "T", "P_1", "Z_12", "Fa", "Gab", "Hxyz", "None", "Ia_1"]
+
+
+def random_arguments(seed: int, count: int, max_atoms: int = 6) -> Iterator[Tuple[List[str], str]]:
+    """benchmarks.generator で、シードを固定した推論 (前提の文字列, 結論の文字列) を作る"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        config = FormulaConfig(
+            atoms=rng.randint(1, max_atoms), depth=rng.randint(1, 5), premises=rng.randint(0, 3),
+            notation=rng.choice(["formal", "informal"]),
+        )
+        names = rng.sample(ATOM_NAMES, config.atoms)
+        formulas = [random_formula(rng, config, names) for _ in range(config.premises + 1)]
+        texts = [render(formula, config.notation, rng) for formula in formulas]
+        yield texts[:-1], texts[-1]
+
+
+def make_inference(premises: List[str], conclusion: str, engine: str, **options) -> Inference:
+    """判定結果のキャッシュと前処理を使わずに、engine で判定する Inference を作る"""
+    options.setdefault("cache", False)
+    options.setdefault("reduce", False)
+    return Inference([Formula(text) for text in premises], Formula(conclusion), engine=engine, **options)
+
+
+def is_counterexample(premises: List[str], conclusion: str, row: Optional[Dict[str, bool]]) -> bool:
+    """row が推論の反例 (全ての前提が真で結論が偽になる割り当て) か"""
+    if row is None:
+        return False
+    return all(Formula(text).evaluate(row) for text in premises) and not Formula(conclusion).evaluate(row)
+
+
+class EngineTests:
+    """engine の判定・最初の反例・真偽値表を、1行ずつ評価する "rows" と比べる (unittest.TestCase と混ぜて使う)"""
+    engine = ""
+    options: Dict = {}
+    # 反例が真偽値表の最初の行とは限らない評価方式なら False
+    first_counterexample = True
+    seed = 0
+    count = 150
+
+    def check_arguments(self, seed: int, count: int, max_atoms: int = 6):
+        for premises, conclusion in random_arguments(seed, count, max_atoms):
+            with self.subTest(premises=premises, conclusion=conclusion):
+                expected = make_inference(premises, conclusion, "rows")
+                actual = make_inference(premises, conclusion, self.engine, **self.options)
+                self.assertEqual(actual.is_semantically_valid(), expected.is_semantically_valid())
+                row = actual.get_counterexample()
+                if self.first_counterexample:
+                    self.assertEqual(row, expected.get_counterexample())
+                elif expected.get_counterexample() is None:
+                    self.assertIsNone(row)
+                else:
+                    self.assertTrue(is_counterexample(premises, conclusion, row), row)
+                table = make_inference(premises, conclusion, self.engine, **self.options)
+                self.assertEqual(table.generate_truth_table().to_list(),
+                                 make_inference(premises, conclusion, "rows").generate_truth_table().to_list())
+
+    def test_random_arguments(self):
+        self.check_arguments(self.seed, self.count)
+
+
+class BitwiseTest(EngineTests, unittest.TestCase):
+    engine = "bitwise"
+    seed = 1
+
+    def test_keyword_atoms(self):
+        inference = make_inference(["(Fa->None)", "(Gb|None)"], "(Fa&Gb)", self.engine)
+        self.assertFalse(inference.is_semantically_valid())
+        self.assertEqual(inference.get_counterexample(), make_inference(
+            ["(Fa->None)", "(Gb|None)"], "(Fa&Gb)", "rows").get_counterexample())
+
+
+class SatTest(EngineTests, unittest.TestCase):
+    engine = "sat"
+    first_counterexample = False
+    seed = 4
+
+    def test_many_atoms(self):
+        # 真偽値表では扱えない数の原子文でも、反例が推論の反例になっている
+        atoms = [f"P_{idx}" for idx in range(40)]
+        premises = [f"({a}->{b})" for a, b in zip(atoms, atoms[1:])]
+        self.assertTrue(make_inference(premises, f"({atoms[0]}->{atoms[-1]})", self.engine).is_semantically_valid())
+        inference = make_inference(premises, f"({atoms[-1]}->{atoms[0]})", self.engine)
+        self.assertFalse(inference.is_semantically_valid())
+        self.assertTrue(is_counterexample(premises, f"({atoms[-1]}->{atoms[0]})", inference.get_counterexample()))
+
+    def test_pigeonhole(self):
+        # 4羽の鳩は3つの巣に1羽ずつ入れない (充足不能)
+        pigeons, holes = 4, 3
+        var = {(p, h): p * holes + h + 1 for p in range(pigeons) for h in range(holes)}
+        solver = sat.Solver(len(var))
+        for p in range(pigeons):
+            solver.add_clause([var[p, h] for h in range(holes)])
+        for h in range(holes):
+            for p in range(pigeons):
+                for q in range(p + 1, pigeons):
+                    solver.add_clause([-var[p, h], -var[q, h]])
+        self.assertIsNone(solver.solve())
+
+    def test_luby(self):
+        self.assertEqual([sat.luby(i) for i in range(1, 16)], [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8])
+
+
+class ParallelTest(EngineTests, unittest.TestCase):
+    engine = "parallel"
+    options = {"workers": 2}
+    seed = 12
+
+    def test_columns_match_sequential(self):
+        for premises, conclusion in random_arguments(13, 20, max_atoms=8):
+            nodes = [Formula(text).symbolic_representation_tree for text in [*premises, conclusion]]
+            atoms = sorted(set().union(*(node.atoms for node in nodes)))
+            mask = columns.table_mask(len(atoms))
+            expected = [columns.evaluate_column(node, columns.atom_columns(atoms), mask) for node in nodes]
+            for workers in (1, 3):
+                with self.subTest(premises=premises, conclusion=conclusion, workers=workers):
+                    self.assertEqual(parallel.evaluate_columns(nodes, atoms, workers), expected)
+
+    def test_pool_is_reused(self):
+        make_inference(["P|Q"], "P", self.engine, **self.options).is_semantically_valid()
+        pool = parallel._pools[2]
+        make_inference(["P&Q"], "P", self.engine, **self.options).is_semantically_valid()
+        self.assertIs(parallel._pools[2], pool)
+        parallel.shutdown()
+        self.assertEqual(parallel._pools, {})
+        # 止めた後に使えば作り直す
+        self.assertFalse(make_inference(["P|Q"], "P", self.engine, **self.options).is_semantically_valid())
+        self.assertIsNot(parallel._pools[2], pool)
+
+    def test_shard_bits(self):
+        self.assertEqual(parallel.shard_bits(10, 2), 3)
+        self.assertEqual(parallel.shard_bits(2, 4), 2)
+        self.assertEqual(parallel.shard_bits(0, 4), 0)
+
+
+class GrayTest(EngineTests, unittest.TestCase):
+    engine = "gray"
+    seed = 13
+
+    def test_values_match_tree_evaluation(self):
+        for premises, conclusion in random_arguments(14, 60):
+            nodes = [Formula(text).symbolic_representation_tree for text in [*premises, conclusion]]
+            # 記号文に出てこない原子文も混ぜる
+            atoms = sorted(set().union(*(node.atoms for node in nodes)) | {"Z_99"})
+            with self.subTest(premises=premises, conclusion=conclusion):
+                values = graycode.truth_table_values(nodes, atoms)
+                self.assertEqual(len(values), 1 << len(atoms))
+                for row, value in enumerate(values):
+                    env = {atom: bool(row >> (len(atoms) - 1 - idx) & 1) for idx, atom in enumerate(atoms)}
+                    self.assertEqual(value, tuple(node.evaluate(env) for node in nodes))
+
+
+class BddTest(EngineTests, unittest.TestCase):
+    engine = "bdd"
+    first_counterexample = False
+    seed = 15
+
+    def test_count_and_cubes(self):
+        for premises, conclusion in random_arguments(16, 60):
+            node = Formula(conclusion).symbolic_representation_tree
+            atoms = sorted(node.atoms | {"Z_99"})
+            manager = bdd.BDD(bdd.order_atoms([node]))
+            f = manager.build(node)
+            rows = []
+            for row in range(1 << len(atoms)):
+                env = {atom: bool(row >> (len(atoms) - 1 - idx) & 1) for idx, atom in enumerate(atoms)}
+                if node.evaluate(env):
+                    rows.append(env)
+            with self.subTest(conclusion=conclusion):
+                self.assertEqual(sorted(manager.order), sorted(node.atoms))
+                self.assertEqual(manager.count(f, atoms), len(rows))
+                # 部分的な割り当ては重ならずに、真になる行をちょうど覆う
+                covered = [env for env in rows for cube in manager.cubes(f)
+                           if all(env[atom] == value for atom, value in cube.items())]
+                self.assertEqual(covered, rows)
+                self.assertEqual(next(manager.cubes(f), None), manager.cube(f))
+
+    def test_equivalent(self):
+        texts = [text for premises, conclusion in random_arguments(17, 40, max_atoms=3) for text in [*premises, conclusion]]
+        nodes = [Formula(text).symbolic_representation_tree for text in texts]
+        for a, b in zip(nodes, nodes[1:]):
+            same = make_inference([], f"({a!r}<->{b!r})", "rows").is_semantically_valid()
+            with self.subTest(a=a, b=b):
+                self.assertEqual(bdd.equivalent(a, b), same)
+        self.assertTrue(bdd.equivalent(Formula("~(P&Q)").symbolic_representation_tree,
+                                       Formula("(~P|~Q)").symbolic_representation_tree))
+
+    def test_node_limit(self):
+        # 変数順の悪い記号文は節点の数が指数的に増える
+        pairs = [(f"P_{idx}", f"Q_{idx}") for idx in range(12)]
+        node = Formula("|".join(f"({p}&{q})" for p, q in pairs)).symbolic_representation_tree
+        order = [p for p, _ in pairs] + [q for _, q in pairs]
+        with self.assertRaises(MemoryError):
+            bdd.BDD(order, max_nodes=1000).build(node)
+        # 一緒に現れる原子文を隣り合わせにすれば小さい
+        manager = bdd.BDD(bdd.order_atoms([node]))
+        manager.build(node)
+        self.assertLess(len(manager), 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+
+import batch
+import grading
+
+# 述語論理の推論を含む推論の並び (前提, 結論, 妥当か)
+MIXED = [
+    (["P->Q", "P"], "Q", True),
+    (["exists x Fx"], "Fa", False),
+    (["forall x Fx"], "Fa", None),
+    (["P|Q"], "P", False),
+]
+
+
+class GradeArgumentTest(unittest.TestCase):
+    def test_mixed_arguments(self):
+        for premises, conclusion, valid in MIXED:
+            result = grading.grade_argument(premises, conclusion, 20)
+            self.assertEqual(result["valid"], valid, (premises, conclusion, result))
+        quantified = grading.grade_argument(["exists x Fx"], "Fa", 20)
+        self.assertIsNotNone(quantified["countermodel"])
+        self.assertIsNone(quantified["error"])
+        # 反証モデルが見つからない推論は、判定できなかった理由を返す
+        self.assertIsNotNone(grading.grade_argument(["forall x Fx"], "Fa", 20)["error"])
+        # 自由変数を含む記号文は判定できない
+        free = grading.grade_argument(["forall x Fxy"], "Fa", 20)
+        self.assertIsNone(free["valid"])
+        self.assertIsNotNone(free["error"])
+
+    def test_api(self):
+        os.environ["TURNSTILE_CACHE_PATH"] = ""
+        from fastapi.testclient import TestClient
+        import main
+        with TestClient(main.app) as client:
+            response = client.post("/api/turnstile", json={"arguments": [
+                {"premises": premises, "conclusion": conclusion} for premises, conclusion, _ in MIXED
+            ]})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([result["valid"] for result in results], [valid for _, _, valid in MIXED])
+        self.assertIsNotNone(results[1]["countermodel"])
+
+    def test_batch(self):
+        directory = tempfile.mkdtemp()
+        input_path = os.path.join(directory, "in.jsonl")
+        output_path = os.path.join(directory, "out.ndjson")
+        with open(input_path, "w", encoding="utf-8") as f:
+            for number, (premises, conclusion, _) in enumerate(MIXED):
+                f.write(json.dumps({"id": number, "premises": premises, "conclusion": conclusion}) + "\n")
+        count, skipped, _ = batch.run(input_path, output_path, 2)
+        self.assertEqual((count, skipped), (len(MIXED), 0))
+        with open(output_path, encoding="utf-8") as f:
+            results = [json.loads(line) for line in f]
+        self.assertEqual([result["valid"] for result in results], [valid for _, _, valid in MIXED])
+
+
+if __name__ == "__main__":
+    unittest.main()
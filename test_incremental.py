@@ -0,0 +1,65 @@
+import random
+import unittest
+
+from inference import Formula, IncrementalInference
+from test_engines import make_inference, random_arguments
+
+
+class IncrementalInferenceTest(unittest.TestCase):
+    def check(self, incremental: IncrementalInference):
+        premises = [formula.input_string for formula in incremental.premises]
+        conclusion = incremental.conclusion.input_string
+        expected = make_inference(premises, conclusion, "rows")
+        self.assertEqual(incremental.is_semantically_valid(), expected.is_semantically_valid())
+        self.assertEqual(incremental.get_counterexample(), expected.get_counterexample())
+        self.assertEqual(incremental.get_all_atoms(), expected.get_all_atoms())
+
+    def test_random_edits(self):
+        rng = random.Random(21)
+        pool = [text for premises, conclusion in random_arguments(21, 60, max_atoms=5) for text in [*premises, conclusion]]
+        for _ in range(20):
+            incremental = IncrementalInference(conclusion=Formula(rng.choice(pool)))
+            self.check(incremental)
+            for _ in range(25):
+                edit = rng.randrange(4)
+                if edit == 0 or not incremental.premises:
+                    incremental.add_premise(Formula(rng.choice(pool)))
+                elif edit == 1:
+                    incremental.remove_premise(rng.randrange(-len(incremental.premises), len(incremental.premises)))
+                elif edit == 2:
+                    incremental.replace_premise(rng.randrange(len(incremental.premises)), Formula(rng.choice(pool)))
+                else:
+                    incremental.replace_conclusion(Formula(rng.choice(pool)))
+                with self.subTest(premises=incremental.premises, conclusion=incremental.conclusion):
+                    self.check(incremental)
+                    # 使われている原子文だけの列を持つ
+                    self.assertEqual(set(incremental._atoms), incremental.get_all_atoms())
+
+    def test_to_inference(self):
+        incremental = IncrementalInference([Formula("P->Q"), Formula("Q->R")], Formula("P->R"))
+        inference = incremental.to_inference(engine="bitwise", cache=False)
+        self.assertTrue(inference.is_semantically_valid())
+        self.assertEqual(inference.engine, "bitwise")
+        self.assertIsNone(inference.cache)
+
+    def test_errors(self):
+        incremental = IncrementalInference([Formula("P")], max_atoms=3)
+        with self.assertRaises(ValueError):
+            incremental.is_semantically_valid()
+        with self.assertRaises(ValueError):
+            incremental.to_inference()
+        with self.assertRaises(ValueError):
+            incremental.remove_premise(1)
+        with self.assertRaises(ValueError):
+            incremental.add_premise(Formula("forall x Fx"))
+        with self.assertRaises(MemoryError):
+            incremental.replace_conclusion(Formula("Q&R&S"))
+        # 失敗した編集は何も変えない
+        self.assertEqual([premise.input_string for premise in incremental.premises], ["P"])
+        self.assertIsNone(incremental.conclusion)
+        incremental.replace_conclusion(Formula("Q|R"))
+        self.assertFalse(incremental.is_semantically_valid())
+
+
+if __name__ == "__main__":
+    unittest.main()
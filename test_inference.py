@@ -0,0 +1,36 @@
+import unittest
+
+import instrumentation
+from test_engines import make_inference, random_arguments
+
+
+class StreamingSearchTest(unittest.TestCase):
+    def test_first_counterexample_without_table(self):
+        for premises, conclusion in random_arguments(3, 150):
+            with self.subTest(premises=premises, conclusion=conclusion):
+                streamed = make_inference(premises, conclusion, "rows")
+                row = streamed.get_counterexample()
+                valid = streamed.is_semantically_valid()
+                # 判定しても真偽値表は作らない
+                self.assertIsNone(streamed.tf_table)
+
+                table = make_inference(premises, conclusion, "rows")
+                rows = table.generate_truth_table().to_list()
+                keys = [f"premise_{idx}" for idx in range(len(premises))]
+                first = next((r for r in rows if all(r[key] for key in keys) and not r["conclusion"]), None)
+                self.assertEqual(row, first)
+                self.assertEqual(valid, first is None)
+                self.assertEqual(list(streamed.iter_truth_table()), rows)
+
+    def test_stops_at_first_counterexample(self):
+        atoms = [f"P_{idx}" for idx in range(20)]
+        inference = make_inference([], "&".join(atoms), "rows")
+        with instrumentation.collect() as stats:
+            row = inference.get_counterexample()
+        self.assertEqual(row, {**{atom: False for atom in atoms}, "conclusion": False})
+        self.assertEqual(stats.as_dict()["counters"].get("early_exits"), 1)
+        self.assertIsNone(inference.tf_table)
+
+
+if __name__ == "__main__":
+    unittest.main()
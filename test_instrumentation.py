@@ -0,0 +1,89 @@
+import os
+import threading
+import unittest
+
+os.environ["TURNSTILE_CACHE_PATH"] = ""
+
+import instrumentation
+from test_engines import make_inference
+
+
+class InstrumentationTest(unittest.TestCase):
+    def test_collect(self):
+        with instrumentation.collect() as stats:
+            inference = make_inference(["(P->Q)", "(Q->R)"], "(P->R)", "rows")
+            self.assertTrue(inference.is_semantically_valid())
+        data = stats.as_dict()
+        for name in ("lex", "parse", "validity"):
+            self.assertIn(name, data["stages"])
+            self.assertGreaterEqual(data["calls"][name], 1)
+        self.assertEqual(data["counters"]["parse_attempts"], 3)
+        self.assertEqual(data["counters"]["tokens"], 15)
+        self.assertEqual(data["counters"]["rows_evaluated"], 8)
+        self.assertNotIn("parse_fallbacks", data["counters"])
+        # 記録していなければ何もしない
+        self.assertIsNone(instrumentation.current())
+        instrumentation.count("tokens")
+        with instrumentation.stage("lex"):
+            pass
+        self.assertEqual(stats.as_dict(), data)
+
+    def test_nested_and_threads(self):
+        outer = instrumentation.Stats()
+        inner = instrumentation.Stats()
+        with instrumentation.collect(outer):
+            instrumentation.count("a")
+            with instrumentation.collect(inner):
+                instrumentation.count("a", 2)
+            instrumentation.count("a")
+            # 別のスレッドには記録中の Stats は引き継がれない
+            seen = []
+            thread = threading.Thread(target=lambda: seen.append(instrumentation.current()))
+            thread.start()
+            thread.join()
+        self.assertEqual(outer.counters, {"a": 2})
+        self.assertEqual(inner.counters, {"a": 2})
+        self.assertEqual(seen, [None])
+
+    def test_merge_and_round_trip(self):
+        first = instrumentation.Stats()
+        first.add_time("lex", 0.5)
+        first.count("tokens", 3)
+        second = instrumentation.Stats.from_dict(first.as_dict())
+        second.add_time("parse", 0.25)
+        second.merge(first)
+        self.assertEqual(second.as_dict(), {
+            "stages": {"lex": 1.0, "parse": 0.25},
+            "calls": {"lex": 2, "parse": 1},
+            "counters": {"tokens": 6},
+        })
+
+    def test_prometheus(self):
+        registry = instrumentation.Registry()
+        stats = instrumentation.Stats()
+        stats.add_time("lex", 0.5)
+        stats.count("tokens", 3)
+        registry.add(stats)
+        registry.add(stats)
+        text = registry.render_prometheus()
+        self.assertIn('turnstile_stage_seconds_total{stage="lex"} 1.000000000\n', text)
+        self.assertIn('turnstile_stage_calls_total{stage="lex"} 2\n', text)
+        self.assertIn("# TYPE turnstile_tokens_total counter\nturnstile_tokens_total 6\n", text)
+
+    def test_api_timings_and_metrics(self):
+        from fastapi.testclient import TestClient
+        import main
+        with TestClient(main.app) as client:
+            response = client.post("/api/turnstile", json={
+                "arguments": [{"premises": ["P|Q"], "conclusion": "P"}], "timings": True,
+            })
+            metrics = client.get("/metrics")
+        timings = response.json()["results"][0]["timings"]
+        self.assertIn("validity", timings["stages"])
+        self.assertGreaterEqual(timings["counters"]["tokens"], 4)
+        self.assertEqual(metrics.status_code, 200)
+        self.assertIn("turnstile_tokens_total", metrics.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import time
+import unittest
+
+import jobs
+from inference import Formula, Inference
+
+
+def _wait(job: jobs.Job, timeout: float = 30.0):
+    """ジョブが終わるまで状態を問い合わせて待つ"""
+    deadline = time.monotonic() + timeout
+    while job.finished_at is None:
+        if time.monotonic() > deadline:
+            raise AssertionError(f"ジョブが終わりません: {job.to_dict()}")
+        time.sleep(0.01)
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = jobs.JobQueue(workers=2, ttl=60.0)
+
+    def tearDown(self):
+        self.queue.shutdown()
+
+    def test_submit_and_poll(self):
+        premises, conclusion = ["P->Q", "Q->R"], "P->R"
+        job = self.queue.submit(premises, conclusion)
+        self.assertIs(self.queue.get(job.id), job)
+        _wait(job)
+        state = self.queue.get(job.id).to_dict()
+        self.assertEqual(state["status"], jobs.DONE)
+        self.assertEqual(state["rows_evaluated"], state["rows_total"])
+        self.assertEqual(state["atoms"], ["P", "Q", "R"])
+        self.assertTrue(state["valid"])
+
+    def test_results_match_truth_table(self):
+        premises, conclusion = ["P|Q", "~P|R", "(R&S)->T"], "Q|T"
+        # 区画が1つより多くなるように、区画の大きさを小さくする
+        jobs.BLOCK_BITS, block_bits = 2, jobs.BLOCK_BITS
+        try:
+            job = self.queue.submit(premises, conclusion)
+            _wait(job)
+        finally:
+            jobs.BLOCK_BITS = block_bits
+        self.assertEqual(job.status, jobs.DONE)
+        inference = Inference([Formula(text) for text in premises], Formula(conclusion))
+        expected = list(inference.iter_truth_table())
+        self.assertEqual(job.rows_total, len(expected))
+
+        rows = [json.loads(line) for line in "".join(job.iter_ndjson()).splitlines()]
+        self.assertEqual(rows, expected)
+
+        table = list(csv.reader(io.StringIO("".join(job.iter_csv()))))
+        self.assertEqual(table[0], job.atoms + ["P1", "P2", "P3", "C"])
+        keys = job.atoms + [f"premise_{i}" for i in range(len(premises))] + ["conclusion"]
+        self.assertEqual(table[1:], [["T" if row[key] else "F" for key in keys] for row in expected])
+
+        counterexamples = sum(
+            all(row[f"premise_{i}"] for i in range(len(premises))) and not row["conclusion"] for row in expected
+        )
+        self.assertEqual(job.counterexamples, counterexamples)
+        self.assertEqual(job.to_dict()["valid"], counterexamples == 0)
+
+    def test_cancel(self):
+        # 区画を小さくして、区画の間で取り消しが効くようにする
+        jobs.BLOCK_BITS, block_bits = 1, jobs.BLOCK_BITS
+        try:
+            atoms = [f"P_{i}" for i in range(16)]
+            job = self.queue.submit(["&".join(atoms)], "|".join(atoms))
+            self.queue.cancel(job.id)
+            _wait(job)
+        finally:
+            jobs.BLOCK_BITS = block_bits
+        state = self.queue.get(job.id).to_dict()
+        self.assertEqual(state["status"], jobs.CANCELLED)
+        self.assertLess(state["rows_evaluated"], state["rows_total"])
+        self.assertIsNone(state["valid"])
+        self.assertEqual(job.blocks, [])
+
+    def test_ttl_eviction(self):
+        self.queue.ttl = 0.05
+        job = self.queue.submit(["P"], "P|Q")
+        _wait(job)
+        self.assertIs(self.queue.get(job.id), job)
+        time.sleep(0.1)
+        with self.assertRaises(KeyError):
+            self.queue.get(job.id)
+
+    def test_limits(self):
+        with self.assertRaises(ValueError):
+            self.queue.submit(["P&"], "Q")
+        queue = jobs.JobQueue(workers=1, max_atoms=3)
+        try:
+            with self.assertRaises(ValueError):
+                queue.submit(["P&Q"], "R|S")
+        finally:
+            queue.shutdown()
+
+        # 2記号文 × 8行 = 16 ビットのジョブを2件まで保持できる
+        queue = jobs.JobQueue(workers=1, max_bits=32)
+        try:
+            with self.assertRaises(ValueError):
+                queue.submit(["P", "Q"], "P&Q&R&S")
+            first = queue.submit(["P"], "Q|R")
+            queue.submit(["P"], "Q&R")
+            # 終わったジョブがあれば古いものから捨てて受け付ける
+            _wait(first)
+            third = queue.submit(["Q"], "P|R")
+            with self.assertRaises(KeyError):
+                queue.get(first.id)
+            _wait(third)
+        finally:
+            queue.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import random
+import unittest
+
+import grading
+import live
+from test_engines import random_arguments
+
+# 編集で挿入する断片 (書きかけの記号や、記号文に使えない文字も混ぜる)
+PIECES = ["P", "Q_1", "Fa", "Gab", "None", "~", "&", "|", "->", "<->", "-", "<", "(", ")", "[", "]", " ",
+          "forall x ", "exists y ", "x", "$", "_"]
+
+
+class LiveFormulaTest(unittest.TestCase):
+    def check(self, formula: live.LiveFormula, text: str):
+        result = formula.update(text)
+        _, expected = grading.describe_formula(text)
+        # 差分だけを処理しても、記号文全体をパースした場合と同じ結果になる
+        self.assertEqual({key: value for key, value in result.items() if key != "position"}, expected)
+        self.assertEqual(result["position"], live.LiveFormula().update(text)["position"])
+        if result["position"] is not None:
+            self.assertLessEqual(result["position"], len(text))
+
+    def test_random_edits(self):
+        rng = random.Random(22)
+        texts = [text for premises, conclusion in random_arguments(22, 20) for text in [*premises, conclusion]]
+        for start in texts:
+            formula = live.LiveFormula()
+            text = start
+            self.check(formula, text)
+            for _ in range(30):
+                begin = rng.randint(0, len(text))
+                end = min(len(text), begin + rng.choice([0, 0, 1, 2, 5]))
+                insert = "".join(rng.choice(PIECES) for _ in range(rng.choice([0, 1, 1, 2])))
+                text = live.apply_edit(text, {"start": begin, "end": end, "insert": insert})
+                with self.subTest(text=text):
+                    self.check(formula, text)
+
+    def test_typing(self):
+        # 1文字ずつ入力してから、1文字ずつ消す
+        target = "((P->Q)&[~R|(S<->Fa)])->forall x Gxa"
+        formula = live.LiveFormula()
+        for end in list(range(len(target) + 1)) + list(range(len(target), -1, -1)):
+            with self.subTest(text=target[:end]):
+                self.check(formula, target[:end])
+
+    def test_positions(self):
+        formula = live.LiveFormula()
+        self.assertEqual(formula.update("P&&Q")["position"], 2)
+        self.assertEqual(formula.update("(P->Q")["position"], 5)
+        self.assertEqual(formula.update("P $ Q")["position"], 2)
+        self.assertIsNone(formula.update("(P->Q)")["position"])
+
+    def test_apply_edit(self):
+        self.assertEqual(live.apply_edit("P&Q", {"start": 1, "end": 2, "insert": "->"}), "P->Q")
+        self.assertEqual(live.apply_edit("P", {"start": 1, "insert": "|Q"}), "P|Q")
+        self.assertEqual(live.apply_edit("P", {"text": "Q"}), "Q")
+        for edit in [{"start": 2}, {"start": 1, "end": 0}, {"text": 1}, {}]:
+            with self.assertRaises(ValueError):
+                live.apply_edit("P", edit)
+
+
+if __name__ == "__main__":
+    unittest.main()
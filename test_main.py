@@ -0,0 +1,76 @@
+import asyncio
+import os
+import time
+import unittest
+
+os.environ["TURNSTILE_CACHE_PATH"] = ""
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+class TurnstileApiTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+        self.client.__enter__()
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+
+    def post(self, arguments):
+        return self.client.post("/api/turnstile", json={"arguments": [
+            {"premises": premises, "conclusion": conclusion} for premises, conclusion in arguments
+        ]})
+
+    def test_results(self):
+        response = self.post([(["P->Q", "P"], "Q"), (["P|Q"], "P"), (["P&"], "Q")])
+        self.assertEqual(response.status_code, 200)
+        valid, invalid, malformed = response.json()["results"]
+        self.assertTrue(valid["valid"])
+        self.assertEqual(valid["atoms"], ["P", "Q"])
+        self.assertEqual([result["well_formed"] for result in valid["premises"]], [True, True])
+        self.assertEqual(valid["premises"][0]["formal"], False)
+        self.assertIsNone(valid["counterexample"])
+        self.assertFalse(invalid["valid"])
+        self.assertEqual(invalid["counterexample"], {"P": False, "Q": True, "premise_0": True, "conclusion": False})
+        self.assertIsNone(malformed["valid"])
+        self.assertFalse(malformed["premises"][0]["well_formed"])
+        self.assertIsNotNone(malformed["premises"][0]["error"])
+
+    def test_limits(self):
+        atoms = [f"P_{idx}" for idx in range(main.MAX_ATOMS + 1)]
+        response = self.post([(["&".join(atoms)], "P_0"), (["P"], "P|Q")])
+        too_many, ok = response.json()["results"]
+        self.assertIsNone(too_many["valid"])
+        self.assertIsNotNone(too_many["error"])
+        # 他の推論の判定には影響しない
+        self.assertTrue(ok["valid"])
+        self.assertEqual(self.post([([], "P")] * (main.MAX_ARGUMENTS + 1)).status_code, 422)
+
+
+class WorkersTest(unittest.TestCase):
+    def test_timeout_recycles_pool(self):
+        async def run():
+            workers = main.Workers()
+            try:
+                pool = workers.pool
+                with self.assertRaises(asyncio.TimeoutError):
+                    await workers.run(time.sleep, 10)
+                # 打ち切った仕事のワーカーは止め、新しいプールで次の仕事を受け付ける
+                self.assertIsNot(workers.pool, pool)
+                self.assertEqual(await workers.run(pow, 2, 10), 1024)
+            finally:
+                workers.shutdown()
+
+        main.TIMEOUT_SECONDS, timeout = 0.5, main.TIMEOUT_SECONDS
+        try:
+            started = time.monotonic()
+            asyncio.run(run())
+            self.assertLess(time.monotonic() - started, 10)
+        finally:
+            main.TIMEOUT_SECONDS = timeout
+
+
+if __name__ == "__main__":
+    unittest.main()
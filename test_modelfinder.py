@@ -0,0 +1,105 @@
+import random
+import unittest
+from itertools import product
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import modelfinder
+import tree
+from inference import Formula
+
+
+def random_sentence(rng: random.Random, depth: int, bound: Tuple[str, ...] = ()) -> tree.Node:
+    """述語 F (1項)・G (2項)・個体定項 a・文記号 P からなる閉じた記号文を作る"""
+    if depth == 0 or rng.random() < 0.2:
+        terms = list(bound) + ["a"]
+        kind = rng.randrange(3)
+        if kind == 0:
+            return tree.Predicate("F", rng.choice(terms))
+        if kind == 1:
+            return tree.Predicate("G", rng.choice(terms), rng.choice(terms))
+        return tree.Atom("P")
+    kind = rng.randrange(6)
+    if kind == 0:
+        return tree.Not(random_sentence(rng, depth - 1, bound))
+    if kind in (1, 2):
+        variable = "y" if "x" in bound else "x"
+        quantifier = tree.Universal if kind == 1 else tree.Existential
+        return quantifier(variable, random_sentence(rng, depth - 1, bound + (variable,)))
+    operator = [tree.And, tree.Or, tree.Implies][kind - 3]
+    return operator(random_sentence(rng, depth - 1, bound), random_sentence(rng, depth - 1, bound))
+
+
+def all_models(size: int) -> Iterator[modelfinder.Model]:
+    """領域の大きさ size の全てのモデル (対称性を除かない)"""
+    elements = list(range(size))
+    pairs = list(product(elements, repeat=2))
+    for a, p in product(elements, (False, True)):
+        for f_bits in range(1 << size):
+            for g_bits in range(1 << len(pairs)):
+                extensions: Dict[str, Set[Tuple[int, ...]]] = {
+                    "F": {(d,) for d in elements if f_bits >> d & 1},
+                    "G": {pair for idx, pair in enumerate(pairs) if g_bits >> idx & 1},
+                }
+                yield modelfinder.Model(size, {"a": a}, extensions, {"P": p})
+
+
+def smallest_countermodel(premises: List[tree.Node], conclusion: tree.Node, max_size: int) -> Optional[int]:
+    for size in range(1, max_size + 1):
+        for model in all_models(size):
+            if all(model.evaluate(premise) for premise in premises) and not model.evaluate(conclusion):
+                return size
+    return None
+
+
+def sentence(text: str) -> tree.Node:
+    return Formula(text).symbolic_representation_tree
+
+
+class ModelFinderTest(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(20)
+        found = 0
+        for _ in range(40):
+            premises = [random_sentence(rng, 3) for _ in range(rng.randint(0, 2))]
+            conclusion = random_sentence(rng, 3)
+            with self.subTest(premises=premises, conclusion=conclusion):
+                model = modelfinder.find_countermodel(premises, conclusion, max_size=2)
+                size = smallest_countermodel(premises, conclusion, 2)
+                if model is None:
+                    self.assertIsNone(size)
+                    continue
+                found += 1
+                # 見つかるのは要素の数が最も少ない反証モデル
+                self.assertEqual(model.size, size)
+                self.assertTrue(all(model.evaluate(premise) for premise in premises))
+                self.assertFalse(model.evaluate(conclusion))
+        self.assertGreater(found, 5)
+
+    def test_known_arguments(self):
+        # 妥当な推論には反証モデルがない
+        for premises, conclusion in [
+            (["forall x Fx"], "Fa"),
+            (["forall x (Fx->Gx)", "Fa"], "Ga"),
+            (["exists x forall y Gxy"], "forall y exists x Gxy"),
+            (["~exists x Fx"], "forall x ~Fx"),
+        ]:
+            with self.subTest(premises=premises, conclusion=conclusion):
+                self.assertIsNone(modelfinder.find_countermodel(
+                    [sentence(text) for text in premises], sentence(conclusion)))
+        # 要素が2つ必要な反証モデル
+        model = modelfinder.find_countermodel([sentence("exists x Fx")], sentence("Fa"))
+        self.assertEqual(model.size, 2)
+        self.assertEqual(model.extensions["F"], {(1,)})
+        self.assertEqual(repr(model), "領域 {0, 1}; a=0; F={(1)}")
+        model = modelfinder.find_countermodel([sentence("forall x exists y Gxy")], sentence("exists y forall x Gxy"))
+        self.assertEqual(model.size, 2)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            modelfinder.find_countermodel([sentence("forall x Fxy")], sentence("Fa"))
+        with self.assertRaises(ValueError):
+            modelfinder.find_countermodel([sentence("Fa")], sentence("Fab"))
+
+
+if __name__ == "__main__":
+    unittest.main()
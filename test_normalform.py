@@ -0,0 +1,100 @@
+import unittest
+from itertools import product
+from typing import Iterator, List
+
+import normalform
+import sat
+import tree
+from inference import Formula
+from test_engines import random_arguments
+
+
+def random_nodes(seed: int, count: int) -> Iterator[tree.Node]:
+    for premises, conclusion in random_arguments(seed, count, max_atoms=5):
+        for text in [*premises, conclusion]:
+            yield Formula(text).symbolic_representation_tree
+
+
+def assignments(atoms: List[str]):
+    for values in product((False, True), repeat=len(atoms)):
+        yield dict(zip(atoms, values))
+
+
+class NormalFormTest(unittest.TestCase):
+    def assertEquivalent(self, a: tree.Node, b: tree.Node, atoms: List[str]):
+        for env in assignments(atoms):
+            self.assertEqual(a.evaluate(env), b.evaluate(env), env)
+
+    def test_nnf(self):
+        for node in random_nodes(18, 80):
+            with self.subTest(node=node):
+                result = normalform.nnf(node)
+                self.assertEquivalent(result, node, sorted(node.atoms))
+                for n in tree.postorder(result):
+                    self.assertIsInstance(n, (tree.Atom, tree.Not, tree.And, tree.Or))
+                    if isinstance(n, tree.Not):
+                        self.assertIsInstance(n.child, tree.Atom)
+
+    def test_tseitin(self):
+        for node in random_nodes(19, 40):
+            with self.subTest(node=node):
+                clauses = normalform.tseitin([node])
+                self.assertEqual(set(clauses.atom_vars), set(node.atoms))
+                # 文記号の値を固定すると、元の記号文が真のときだけ充足可能
+                for env in assignments(sorted(node.atoms)):
+                    solver = sat.Solver(clauses.num_vars)
+                    for clause in clauses.clauses:
+                        solver.add_clause(clause)
+                    for atom, value in env.items():
+                        v = clauses.atom_vars[atom]
+                        solver.add_clause([v if value else -v])
+                    self.assertEqual(solver.solve() is not None, node.evaluate(env), env)
+
+    def test_shared_subtrees_are_defined_once(self):
+        shared = Formula("((P<->Q)|(R&~P))").symbolic_representation_tree
+        once = normalform.tseitin([shared])
+        twice = normalform.tseitin([tree.And(shared, tree.Or(shared, tree.Atom("S")))])
+        # 共有された部分木の定義節は増えない (∧ と ∨ の分だけ増える)
+        self.assertLessEqual(twice.num_vars, once.num_vars + 3)
+
+    def test_dnf(self):
+        for node in random_nodes(20, 80):
+            with self.subTest(node=node):
+                try:
+                    terms, variables = normalform.dnf(node)
+                except MemoryError:
+                    continue
+                names = {v: atom for atom, v in variables.items()}
+                for term in terms:
+                    self.assertFalse(any(-literal in term for literal in term))
+                    self.assertFalse(any(set(other) < set(term) for other in terms))
+                if terms:
+                    self.assertEquivalent(normalform.to_node(terms, names, conjunctive=False), node,
+                                          sorted(node.atoms))
+                else:
+                    # 項がなければ矛盾している
+                    self.assertFalse(any(node.evaluate(env) for env in assignments(sorted(node.atoms))))
+
+    def test_dnf_limit(self):
+        atoms = [f"P_{idx}" for idx in range(12)]
+        text = "&".join(f"({a}|{b})" for a, b in zip(atoms[::2], atoms[1::2]))
+        node = Formula(text).symbolic_representation_tree
+        self.assertEqual(len(normalform.dnf(node)[0]), 64)
+        with self.assertRaises(MemoryError):
+            normalform.dnf(node, max_terms=32)
+
+    def test_output_formats(self):
+        clauses = normalform.ClauseSet()
+        clauses.num_vars = 3
+        clauses.clauses = [[1, -2], [3]]
+        self.assertEqual(clauses.to_dimacs(), "p cnf 3 2\n1 -2 0\n3 0\n")
+        self.assertEqual(list(clauses.to_array()), [1, -2, 0, 3, 0])
+        clauses.atom_vars = {"P": 1, "X_0": 3}
+        self.assertEqual(clauses.var_names(), {1: "P", 2: "X_1", 3: "X_0"})
+        self.assertEqual(repr(normalform.to_node(clauses.clauses, clauses.var_names())), "((P|~X_1)&X_0)")
+        with self.assertRaises(ValueError):
+            normalform.to_node([[1], []], {1: "P"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+from typing import List
+
+import proof
+import tree
+from inference import Formula
+from test_engines import make_inference, random_arguments
+
+Not, And, Or, Implies, Equivalence = tree.Not, tree.And, tree.Or, tree.Implies, tree.Equivalence
+
+
+def _derivable(rule: str, cited: List[tree.Node], goal: tree.Node) -> bool:
+    """goal が規則 rule で cited から1行で導けるか"""
+    if len(cited) == 1:
+        a = cited[0]
+        if rule == "R":
+            return goal is a
+        if rule == "DN":
+            return goal is Not(Not(a)) or (isinstance(a, Not) and isinstance(a.child, Not) and goal is a.child.child)
+        if rule == "S":
+            return isinstance(a, And) and goal in (a.left, a.right)
+        if rule == "Add":
+            return isinstance(goal, Or) and a in (goal.left, goal.right)
+        if rule == "BC":
+            return isinstance(a, Equivalence) and goal in (Implies(a.left, a.right), Implies(a.right, a.left))
+        if rule == "DM":
+            return goal is _de_morgan(a) or a is _de_morgan(goal)
+        if rule == "CDJ":
+            return isinstance(a, Implies) and goal is Or(Not(a.left), a.right) \
+                or isinstance(goal, Implies) and a is Or(Not(goal.left), goal.right)
+        return False
+    if len(cited) == 2:
+        for a, b in (cited, cited[::-1]):
+            if rule == "MP" and a is Implies(b, goal):
+                return True
+            if rule == "MT" and isinstance(a, Implies) and b is Not(a.right) and goal is Not(a.left):
+                return True
+            if rule == "Adj" and goal is And(a, b):
+                return True
+            if rule == "MTP" and isinstance(a, Or) and (
+                    (b is Not(a.left) and goal is a.right) or (b is Not(a.right) and goal is a.left)):
+                return True
+            if rule == "CB" and isinstance(a, Implies) and b is Implies(a.right, a.left) \
+                    and goal is Equivalence(a.left, a.right):
+                return True
+    return False
+
+
+def _de_morgan(node: tree.Node):
+    """~(φ∧ψ) を ~φ∨~ψ に、~(φ∨ψ) を ~φ∧~ψ にする (どちらでもなければ None)"""
+    if isinstance(node, Not) and isinstance(node.child, (And, Or)):
+        dual = Or if isinstance(node.child, And) else And
+        return dual(Not(node.child.left), Not(node.child.right))
+    return None
+
+
+def check_proof(test: unittest.TestCase, found: proof.Proof, premises: List[tree.Node], conclusion: tree.Node):
+    """演繹の各行が、その行から参照できる行から規則どおりに導かれているかを確かめる"""
+    lines = found.lines
+
+    def accessible(i: int, k: int) -> bool:
+        # 行 i が行 k の前にあり、その間で行 i の副演繹が閉じていない
+        return i < k and all(lines[j].depth >= lines[i].depth for j in range(i + 1, k + 1))
+
+    for k, line in enumerate(lines):
+        test.assertEqual(line.number, k + 1)
+        cited = [number - 1 for number in line.cites]
+        if line.rule == "PR":
+            test.assertEqual(line.depth, 0)
+            test.assertIn(line.formula, premises)
+        elif line.rule in ("ACD", "AID"):
+            test.assertEqual(line.depth, lines[k - 1].depth + 1 if k else 1)
+        elif line.rule in ("CD", "ID"):
+            first, last = cited
+            test.assertEqual(lines[first].rule, "A" + line.rule)
+            test.assertEqual(lines[first].depth, line.depth + 1)
+            test.assertEqual(last, k - 1)
+            test.assertEqual(lines[last].depth, line.depth + 1)
+            test.assertTrue(all(lines[j].depth > line.depth for j in range(first, k)))
+            assumption = lines[first].formula
+            if line.rule == "CD":
+                test.assertIs(line.formula, Implies(assumption, lines[last].formula))
+            else:
+                test.assertTrue(assumption is Not(line.formula) or Not(assumption) is line.formula)
+                inner = {lines[j].formula for j in range(first, k) if lines[j].depth == line.depth + 1}
+                test.assertTrue(any(Not(formula) in inner for formula in inner), found)
+        else:
+            for i in cited:
+                test.assertTrue(accessible(i, k), f"{line!r} は {i + 1} 行目を参照できません")
+            test.assertTrue(_derivable(line.rule, [lines[i].formula for i in cited], line.formula), repr(line))
+    test.assertEqual(lines[-1].depth, 0)
+    test.assertIs(lines[-1].formula, conclusion)
+
+
+class ProofTest(unittest.TestCase):
+    def test_random_valid_arguments(self):
+        found = 0
+        for premises, conclusion in random_arguments(19, 100, max_atoms=4):
+            inference = make_inference(premises, conclusion, "rows")
+            if not inference.is_semantically_valid():
+                continue
+            nodes = [Formula(text).symbolic_representation_tree for text in premises]
+            goal = Formula(conclusion).symbolic_representation_tree
+            with self.subTest(premises=premises, conclusion=conclusion):
+                try:
+                    result = inference.find_proof(max_nodes=2000, timeout=0.5)
+                except TimeoutError:
+                    continue
+                if result is None:
+                    continue
+                found += 1
+                check_proof(self, result, nodes, goal)
+        self.assertGreater(found, 20)
+
+    def test_textbook_arguments(self):
+        for premises, conclusion in [
+            (["P->Q", "Q->R"], "P->R"),
+            (["P|Q", "~P"], "Q"),
+            ([], "P|~P"),
+            (["~(P&Q)", "P"], "~Q"),
+            (["P<->Q", "~Q"], "~P"),
+            (["(P&Q)->R"], "P->(Q->R)"),
+            (["P->Q", "~P->Q"], "Q"),
+        ]:
+            with self.subTest(premises=premises, conclusion=conclusion):
+                result = make_inference(premises, conclusion, "rows").find_proof()
+                self.assertIsNotNone(result)
+                check_proof(self, result, [Formula(text).symbolic_representation_tree for text in premises],
+                            Formula(conclusion).symbolic_representation_tree)
+        # 最短の演繹を返す
+        self.assertEqual(len(make_inference(["P|Q", "~P"], "Q", "rows").find_proof()), 3)
+
+    def test_invalid_argument(self):
+        with self.assertRaises(ValueError):
+            make_inference(["P|Q"], "P", "rows").find_proof()
+
+
+if __name__ == "__main__":
+    unittest.main()
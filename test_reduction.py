@@ -0,0 +1,69 @@
+import random
+import unittest
+
+import instrumentation
+import reduction
+import tree
+from inference import Formula
+from test_engines import is_counterexample, make_inference, random_arguments
+
+
+def reducible_arguments(seed: int, count: int):
+    """単位伝播で値の決まる前提と、結論と文記号を共有しない前提を混ぜた推論を作る"""
+    rng = random.Random(seed)
+    others = random_arguments(seed + 1, count, max_atoms=3)
+    for (premises, conclusion), (extra, _) in zip(random_arguments(seed, count), others):
+        atoms = sorted(set().union(*(Formula(text).get_atoms() for text in [*premises, conclusion])))
+        chosen = rng.sample(atoms, min(len(atoms), rng.randint(0, 2)))
+        literals = [f"~{atom}" if rng.random() < 0.5 else atom for atom in chosen]
+        # 結論の成分と文記号を共有しない前提
+        independent = [text for text in extra if not Formula(text).get_atoms() & set(atoms)]
+        mixed = premises + literals + independent
+        rng.shuffle(mixed)
+        yield mixed, conclusion
+
+
+class ReductionTest(unittest.TestCase):
+    def test_matches_unreduced(self):
+        dropped = 0
+        for premises, conclusion in reducible_arguments(20, 200):
+            expected = make_inference(premises, conclusion, "rows")
+            valid = expected.is_semantically_valid()
+            for engine in ("rows", "bitwise", "gray", "sat", "bdd"):
+                with self.subTest(premises=premises, conclusion=conclusion, engine=engine):
+                    with instrumentation.collect() as stats:
+                        actual = make_inference(premises, conclusion, engine, reduce=True)
+                        self.assertEqual(actual.is_semantically_valid(), valid)
+                        row = actual.get_counterexample()
+                    dropped += stats.counters.get("premises_dropped", 0)
+                    if engine in ("rows", "bitwise", "gray"):
+                        # 成分ごとの最初の反例を組み合わせると、元の最初の反例になる
+                        self.assertEqual(row, expected.get_counterexample())
+                    else:
+                        self.assertEqual(row is None, valid)
+                        self.assertEqual(is_counterexample(premises, conclusion, row), not valid)
+        # 前処理が実際に効いている
+        self.assertGreater(dropped, 0)
+
+    def test_reduce_argument(self):
+        nodes = [Formula(text).symbolic_representation_tree for text in ["P", "(P->Q)", "(R|S)", "(T&~U)"]]
+        result = reduction.reduce_argument(nodes, Formula("(Q&V)").symbolic_representation_tree)
+        self.assertEqual(result.fixed, {"P": True, "Q": True})
+        self.assertFalse(result.inconsistent)
+        self.assertEqual(result.dropped, 2)
+        self.assertIs(result.conclusion, tree.Atom("V"))
+        self.assertEqual(result.main, [])
+        self.assertEqual(sorted(map(repr, sum(result.independent, []))), ["(R|S)", "(T&~U)"])
+        contradiction = reduction.reduce_argument(
+            [tree.Atom("P"), tree.Not(tree.Atom("P"))], tree.Atom("Q"))
+        self.assertTrue(contradiction.inconsistent)
+
+    def test_simplify(self):
+        node = Formula("((P->Q)&(R|~P))").symbolic_representation_tree
+        self.assertIs(reduction.simplify(node, {"P": True}), tree.And(tree.Atom("Q"), tree.Atom("R")))
+        self.assertIs(reduction.simplify(node, {"P": False}), True)
+        self.assertIs(reduction.simplify(node, {"P": True, "Q": False}), False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from itertools import product
+
+import columns
+import serialize
+import tree
+from inference import Formula
+from test_engines import random_arguments
+
+
+class SerializeTest(unittest.TestCase):
+    def test_round_trip(self):
+        for premises, conclusion in random_arguments(24, 150):
+            nodes = [Formula(text).symbolic_representation_tree for text in [*premises, conclusion]]
+            with self.subTest(premises=premises, conclusion=conclusion):
+                data = serialize.dumps(nodes)
+                # 木の節点は構造ごとに1つなので、復元した木は元の木そのもの
+                self.assertEqual(len(serialize.loads(data)), len(nodes))
+                for restored, node in zip(serialize.loads(data), nodes):
+                    self.assertIs(restored, node)
+                self.assertEqual(serialize.loads(bytearray(data)), nodes)
+                self.assertEqual(serialize.loads(memoryview(data)), nodes)
+
+    def test_other_nodes(self):
+        nodes = [
+            Formula("forall x (Fx->exists y Gxy)").symbolic_representation_tree,
+            tree.Operator("+", tree.Atom("P"), tree.Atom("Q"), tree.Atom("R")),
+            tree.Atom("日本"),
+            tree.Atom("P"),
+        ]
+        self.assertEqual(serialize.loads(serialize.dumps(nodes)), nodes)
+        self.assertEqual(serialize.loads(serialize.dumps([])), [])
+
+    def test_shared_subtrees_written_once(self):
+        node: tree.Node = tree.Atom("P")
+        for idx in range(200):
+            node = tree.And(node, node) if idx % 2 else tree.Or(node, tree.Atom("Q"))
+        data = serialize.dumps([node, node])
+        # 共有された部分木を展開すると 2^100 個を超える節点になる
+        self.assertLess(len(data), 10000)
+        self.assertEqual(serialize.loads(data), [node, node])
+
+    def test_evaluate(self):
+        for premises, conclusion in random_arguments(25, 100):
+            nodes = [Formula(text).symbolic_representation_tree for text in [*premises, conclusion]]
+            atoms = sorted(set().union(*(node.atoms for node in nodes)))
+            program = serialize.Program(serialize.dumps(nodes))
+            mask = columns.table_mask(len(atoms))
+            atom_columns = columns.atom_columns(atoms)
+            with self.subTest(premises=premises, conclusion=conclusion):
+                self.assertEqual(program.evaluate_columns(atom_columns, mask),
+                                 [columns.evaluate_column(node, atom_columns, mask) for node in nodes])
+                for values in product((False, True), repeat=min(len(atoms), 4)):
+                    env = dict(zip(atoms, values + (False,) * (len(atoms) - len(values))))
+                    self.assertEqual(program.evaluate(env), [node.evaluate(env) for node in nodes])
+        quantified = serialize.Program(serialize.dumps([Formula("forall x Fx").symbolic_representation_tree]))
+        with self.assertRaises(ValueError):
+            quantified.evaluate({"Fx": True})
+
+    def test_invalid_data(self):
+        data = serialize.dumps([Formula("(P->Q)").symbolic_representation_tree])
+        for broken in [b"", b"XXXX" + data[4:], data[:-4], data + b"\0\0\0\0"]:
+            with self.assertRaises(ValueError):
+                serialize.loads(broken)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import sys
+import unittest
+
+from inference import Formula
+from test_engines import make_inference, random_arguments
+from tokenizer import InformalParser, LexerGenerator, StrictParser, Token, TokenStream, TokenType
+
+
+def parse_strict(text: str):
+    """公式な記号文としてパースする (公式でなければ None)"""
+    try:
+        return StrictParser(TokenStream(text)).parse()
+    except ValueError:
+        return None
+
+
+class TokenizerTest(unittest.TestCase):
+    def test_is_formal_matches_strict_parser(self):
+        texts = ["P", "~P", "(P->Q)", "((P&Q)|~R)", "P->Q", "(P&Q&R)", "[P&Q]", "((P))", "~(P<->Fa)", "(P|Q)&R"]
+        for premises, conclusion in random_arguments(6, 150):
+            texts += [*premises, conclusion]
+        for text in texts:
+            with self.subTest(text=text):
+                formula = Formula(text)
+                strict = parse_strict(text)
+                self.assertEqual(formula.is_formal, strict is not None)
+                # 公式な記号文なら、どちらのパーサでも同じ木になる
+                if strict is not None:
+                    self.assertIs(formula.symbolic_representation_tree, strict)
+
+    def test_one_token_stream_for_both_parsers(self):
+        stream = TokenStream("((P->Q)&~Fa)")
+        informal = InformalParser(stream).parse()
+        stream.reset()
+        self.assertIs(StrictParser(stream).parse(), informal)
+        self.assertEqual(len(stream), 11)
+
+    def test_lexer_generator_api(self):
+        lexer = LexerGenerator("(P_1->~Q)")
+        self.assertEqual([repr(token) for token in lexer.tokens],
+                         [repr(Token(t, v)) for t, v in [
+                             (TokenType.LPAREN, "("), (TokenType.ATOM, "P_1"), (TokenType.IMPLIES, "->"),
+                             (TokenType.NOT, "~"), (TokenType.ATOM, "Q"), (TokenType.RPAREN, ")")]])
+        self.assertEqual(lexer.peek().value, "(")
+        self.assertEqual(lexer.consume(TokenType.LPAREN).value, "(")
+        with self.assertRaises(ValueError):
+            lexer.consume(TokenType.RPAREN)
+
+    def test_errors(self):
+        for text in ["", "P&", "(P->Q", "P Q", "p", "P$Q"]:
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    Formula(text)
+
+
+class DeepFormulaTest(unittest.TestCase):
+    # 再帰の上限よりずっと深い記号文
+    DEPTH = 5 * sys.getrecursionlimit()
+
+    def test_parse_print_and_check(self):
+        n = self.DEPTH
+        cases = {
+            "nots": "~" * (2 * n) + "P",
+            "right": "(P->" * n + "Q" + ")" * n,
+            "left": "(" * n + "P" + "".join(f"&Q_{idx % 5})" for idx in range(n)),
+            "informal": "&".join(f"P_{idx % 5}" for idx in range(n)),
+        }
+        for name, text in cases.items():
+            with self.subTest(name=name):
+                formula = Formula(text)
+                self.assertEqual(formula.is_formal, name != "informal")
+                node = formula.symbolic_representation_tree
+                self.assertIs(Formula(repr(node)).symbolic_representation_tree, node)
+                env = {atom: True for atom in node.atoms}
+                self.assertTrue(formula.evaluate(env))
+                for engine in ("rows", "bitwise", "sat", "bdd"):
+                    self.assertEqual(make_inference(["P"], text, engine).is_semantically_valid(), name == "nots", engine)
+
+    def test_evaluate_short_circuits(self):
+        # 値の決まった時点で評価をやめるので、残りの原子文の値はなくてもよい
+        self.assertFalse(Formula("(P&(Q|R))").evaluate({"P": False}))
+        self.assertTrue(Formula("(P|(Q&R))").evaluate({"P": True}))
+        self.assertTrue(Formula("(P->(Q&R))").evaluate({"P": False}))
+
+
+if __name__ == "__main__":
+    unittest.main()
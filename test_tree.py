@@ -0,0 +1,63 @@
+import copy
+import pickle
+import unittest
+
+import tree
+from inference import Formula
+from test_engines import random_arguments
+
+
+class HashConsingTest(unittest.TestCase):
+    def test_equal_subtrees_are_shared(self):
+        self.assertIs(tree.Atom("P"), tree.Atom("P"))
+        self.assertIs(tree.And(tree.Atom("P"), tree.Not(tree.Atom("Q"))),
+                      tree.And(tree.Atom("P"), tree.Not(tree.Atom("Q"))))
+        self.assertIs(tree.Predicate("G", "a", "b"), tree.Predicate("G", "a", "b"))
+        self.assertIsNot(tree.Atom("P"), tree.Atom("Q"))
+        self.assertIsNot(tree.And(tree.Atom("P"), tree.Atom("Q")), tree.Or(tree.Atom("P"), tree.Atom("Q")))
+        # 別々に構文解析しても同じ節点になる
+        for premises, conclusion in random_arguments(5, 100):
+            for text in [*premises, conclusion]:
+                with self.subTest(text=text):
+                    self.assertIs(Formula(text).symbolic_representation_tree,
+                                  Formula(text).symbolic_representation_tree)
+
+    def test_immutable(self):
+        node = tree.Implies(tree.Atom("P"), tree.Atom("Q"))
+        with self.assertRaises(AttributeError):
+            node.args = ()
+        with self.assertRaises(AttributeError):
+            tree.Atom("P").value = "Q"
+        with self.assertRaises(AttributeError):
+            del node.symbol
+        with self.assertRaises(AttributeError):
+            node.extra = 1
+
+    def test_atoms(self):
+        node = Formula("((P->Fa)&~(Q|P))").symbolic_representation_tree
+        self.assertEqual(node.atoms, frozenset({"P", "Q", "Fa"}))
+        self.assertEqual(tree.Atom("R").atoms, frozenset({"R"}))
+
+    def test_pickle_and_copy_keep_identity(self):
+        nodes = [
+            Formula("((P->Fa)<->~(Q_1|Gab))").symbolic_representation_tree,
+            tree.Operator("+", tree.Atom("P"), tree.Atom("Q"), tree.Atom("R")),
+            tree.Universal("x", tree.Predicate("F", "x")),
+        ]
+        for node in nodes:
+            with self.subTest(node=node):
+                self.assertIs(pickle.loads(pickle.dumps(node)), node)
+                self.assertIs(copy.copy(node), node)
+                self.assertIs(copy.deepcopy(node), node)
+
+    def test_deep_tree(self):
+        node: tree.Node = tree.Atom("P")
+        for _ in range(20000):
+            node = tree.Not(node)
+        self.assertIs(node.atoms, node.atoms)
+        self.assertEqual(node.atoms, frozenset({"P"}))
+        self.assertEqual(repr(node), "~" * 20000 + "P")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from test_engines import make_inference, random_arguments
+from truthtable import TruthTable
+
+
+class TruthTableTest(unittest.TestCase):
+    def test_matches_rows(self):
+        for premises, conclusion in random_arguments(15, 100):
+            with self.subTest(premises=premises, conclusion=conclusion):
+                table = make_inference(premises, conclusion, "bitwise").generate_truth_table()
+                rows = list(make_inference(premises, conclusion, "rows").iter_truth_table())
+                self.assertEqual(len(table), len(rows))
+                self.assertEqual(table, rows)
+                self.assertEqual(table.to_list(), rows)
+                self.assertEqual(table[-1], rows[-1])
+                self.assertEqual(table[1::3], rows[1::3])
+                self.assertEqual(list(table[-1]), list(rows[-1]))
+                bad = [row.index for row in table if all(row[f"premise_{idx}"] for idx in range(len(premises)))
+                       and not row["conclusion"]]
+                column = table.counterexample_column()
+                self.assertEqual([idx for idx in range(len(table)) if column >> idx & 1], bad)
+
+    def test_rows(self):
+        # P, Q の表で、前提 P|Q・結論 P
+        table = TruthTable(["P", "Q"], [0b1110], 0b1100)
+        row = table[1]
+        self.assertEqual(row.index, 1)
+        self.assertEqual(row, {"P": False, "Q": True, "premise_0": True, "conclusion": False})
+        self.assertEqual(len(row), 4)
+        with self.assertRaises(KeyError):
+            row["R"]
+        with self.assertRaises(IndexError):
+            table[4]
+        with self.assertRaises(IndexError):
+            table[-5]
+        self.assertEqual(table.counterexample_column(), 0b0010)
+        self.assertEqual(table, TruthTable(["P", "Q"], [0b1110], 0b1100))
+        self.assertNotEqual(table, TruthTable(["P", "Q"], [0b1110], 0b1000))
+
+    def test_pages(self):
+        table = make_inference(["P|Q"], "R->S", "bitwise").generate_truth_table()
+        self.assertEqual(table.page_count(5), 4)
+        pages = [table.page(number, 5) for number in range(table.page_count(5))]
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 1])
+        self.assertEqual([row for page in pages for row in page], list(table))
+        self.assertEqual(table.page(4, 5), [])
+        with self.assertRaises(ValueError):
+            table.page(-1)
+        with self.assertRaises(ValueError):
+            table.page(0, 0)
+
+    def test_large_table_is_lazy(self):
+        atoms = [f"P_{idx}" for idx in range(20)]
+        table = make_inference(["|".join(atoms)], "&".join(atoms), "bitwise").generate_truth_table()
+        self.assertEqual(len(table), 1 << 20)
+        self.assertEqual(table[-1], {**{atom: True for atom in atoms}, "premise_0": True, "conclusion": True})
+        self.assertTrue(table[1][table.atoms[-1]])
+        self.assertFalse(table[1][table.atoms[-2]])
+
+
+if __name__ == "__main__":
+    unittest.main()
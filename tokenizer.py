@@ -1,6 +1,7 @@
 import re
 from enum import Enum, auto
-from typing import Optional
+from typing import MutableMapping, Optional
+import instrumentation
 import tree
 
 class TokenType(Enum):
@@ -14,6 +15,24 @@ class TokenType(Enum):
     RPAREN = auto()
     LBRACKET = auto()
     RBRACKET = auto()
+    PREDICATE = auto()
+    TERM = auto()
+    FORALL = auto()
+    EXISTS = auto()
+
+# 二項演算子のトークンと木の節点の対応
+BINARY_NODES = {
+    TokenType.AND: tree.And,
+    TokenType.OR: tree.Or,
+    TokenType.IMPLIES: tree.Implies,
+    TokenType.EQUIV: tree.Equivalence,
+}
+
+# 量化子のトークンと木の節点の対応
+QUANTIFIER_NODES = {
+    TokenType.FORALL: tree.Universal,
+    TokenType.EXISTS: tree.Existential,
+}
 
 class Token:
     def __init__(self, type: TokenType, value: str):
@@ -34,163 +53,225 @@ TOKEN_DEFINITIONS = {
     TokenType.RPAREN:  [")"],
     TokenType.LBRACKET: ["["],
     TokenType.RBRACKET: ["]"],
+    TokenType.FORALL:  ["∀", "forall", chr(0x2200)],
+    TokenType.EXISTS:  ["∃", "exists", chr(0x2203)],
 }
 
-class LexerGenerator:
-    def __init__(self, text:str):
-        self.symbol_map:dict[str, TokenType] = {}
-        self._build_map()
-        self.pattern = self._build_regex()
+def _build_symbol_map() -> dict[str, TokenType]:
+    symbol_map: dict[str, TokenType] = {}
+    for token_type, symbols in TOKEN_DEFINITIONS.items():
+        for s in symbols:
+            # 重複チェック
+            if s in symbol_map:
+                if symbol_map[s] != token_type:
+                    raise ValueError(f"定義エラー: 記号 '{s}' が重複しています")
+            symbol_map[s] = token_type
+    return symbol_map
+
+
+def _build_regex(symbol_map: dict[str, TokenType]) -> re.Pattern:
+    # tokenを切り分ける用のパターンを作成する
+    sorted_symbols = sorted(symbol_map.keys(), key=len, reverse=True)
+    escaped_symbols = [re.escape(s) for s in sorted_symbols]
+    ops_pattern = '|'.join(escaped_symbols)
+    atom_pattern = r'[P-Z](?:_[0-9]+)?'
+    predicate_pattern = r'[A-O](?:_[0-9]+)?'
+    term_pattern = r'[a-z](?:_[0-9]+)?'
+    return re.compile(f'\\s*({ops_pattern}|{atom_pattern}|{predicate_pattern}|{term_pattern})\\s*')
+
+
+# 記号表と正規表現は import 時に一度だけ作る
+SYMBOL_MAP: dict[str, TokenType] = _build_symbol_map()
+TOKEN_PATTERN: re.Pattern = _build_regex(SYMBOL_MAP)
+ATOM_PATTERN: re.Pattern = re.compile(r'[P-Z](?:_[0-9]+)?')
+PREDICATE_PATTERN: re.Pattern = re.compile(r'[A-O](?:_[0-9]+)?')
+TERM_PATTERN: re.Pattern = re.compile(r'[a-z](?:_[0-9]+)?')
+
+
+class TokenStream:
+    """トークン列を種類と文字列の2つの配列で持ち、先頭から読み進める
+
+    同じトークン列を複数のパーサで読む場合は reset() で先頭に戻す。
+    """
+    def __init__(self, text: str):
+        self.types: list[TokenType] = []
+        self.values: list[str] = []
         self.pos = 0
-        self.tokens = self.tokenize(text)
-
-    def _build_map(self):
-        for token_type, symbols in TOKEN_DEFINITIONS.items():
-            for s in symbols:
-                # 重複チェック
-                if s in self.symbol_map:
-                    if self.symbol_map[s] != token_type:
-                        raise ValueError(f"定義エラー: 記号 '{s}' が重複しています")
-                self.symbol_map[s] = token_type
-
-    def _build_regex(self):
-        # tokenを切り分ける用のパターンを作成する
-        sorted_symbols = sorted(self.symbol_map.keys(), key=len, reverse=True)
-        escaped_symbols = [re.escape(s) for s in sorted_symbols]
-        ops_pattern = '|'.join(escaped_symbols)
-        atom_pattern = r'[P-Z](?:_[0-9]+)?'
-        return re.compile(f'\\s*({ops_pattern}|{atom_pattern})\\s*')
-
-    def tokenize(self, text:str) -> list[Token]:
-        raw_tokens = [t for t in self.pattern.split(text) if t]
-        results:list[Token] = []
-        # token作成
-        for raw in raw_tokens:
+        self._tokenize(text)
+        instrumentation.count("tokens", len(self.types))
+
+    @classmethod
+    def from_tokens(cls, types: list[TokenType], values: list[str]) -> "TokenStream":
+        """字句解析済みのトークン列から作る"""
+        stream = cls.__new__(cls)
+        stream.types = types
+        stream.values = values
+        stream.pos = 0
+        return stream
+
+    def _tokenize(self, text: str):
+        types = self.types
+        values = self.values
+        for raw in TOKEN_PATTERN.split(text):
+            if not raw:
+                continue
             # 1. マップにあれば演算子
-            if raw in self.symbol_map:
-                results.append(Token(self.symbol_map[raw], raw))
+            token_type = SYMBOL_MAP.get(raw)
+            if token_type is not None:
+                types.append(token_type)
             # 2. なければ原子文かチェック
-            elif re.match(r'^[P-Z](?:_[0-9]+)?$', raw):
-                results.append(Token(TokenType.ATOM, raw))
+            elif ATOM_PATTERN.fullmatch(raw):
+                types.append(TokenType.ATOM)
+            # 3. 述語論理の述語と項
+            elif PREDICATE_PATTERN.fullmatch(raw):
+                types.append(TokenType.PREDICATE)
+            elif TERM_PATTERN.fullmatch(raw):
+                types.append(TokenType.TERM)
             else:
                 raise ValueError(f"未知のトークン: '{raw}'")
-        return results
+            values.append(raw)
 
-    def peek(self):
-        if self.pos < len(self.tokens):
-            return self.tokens[self.pos]
-        else:
-            return None
+    def __len__(self) -> int:
+        return len(self.types)
 
-    def consume(self, expected_type:Optional[TokenType]=None) -> Token:
-        token = self.peek()
-        if token is None:
+    def reset(self):
+        self.pos = 0
+
+    def peek_type(self) -> Optional[TokenType]:
+        if self.pos < len(self.types):
+            return self.types[self.pos]
+        return None
+
+    def advance(self, expected_type: Optional[TokenType] = None) -> str:
+        """トークンを1つ読み進め、その文字列を返す"""
+        if self.pos >= len(self.types):
             raise ValueError("Unexpected EOF")
-        if expected_type and token.type != expected_type:
-            raise ValueError(f"Expected {expected_type.name} but got {token.type.name}")
+        token_type = self.types[self.pos]
+        if expected_type and token_type != expected_type:
+            raise ValueError(f"Expected {expected_type.name} but got {token_type.name}")
         self.pos += 1
-        return token
+        return self.values[self.pos - 1]
 
+    def peek(self) -> Optional[Token]:
+        if self.pos < len(self.types):
+            return Token(self.types[self.pos], self.values[self.pos])
+        else:
+            return None
 
-class StrictParser:
-    def __init__(self, lexer:LexerGenerator):
-        self.lexer = lexer
+    def consume(self, expected_type: Optional[TokenType] = None) -> Token:
+        token_type = self.peek_type()
+        value = self.advance(expected_type)
+        assert token_type is not None
+        return Token(token_type, value)
 
-    def parse(self) -> tree.Node:
-        ast = self._parse_wff()
-        if self.lexer.peek() is not None:
-            raise ValueError("Extra tokens at end")
-        return ast
 
-    def _parse_wff(self) -> tree.Node:
-        from tree import Atom, Not, And, Or, Implies, Equivalence
-        
-        token = self.lexer.peek()
-        if token is None:
-            raise ValueError("Empty")
-
-        if token.type == TokenType.ATOM:
-            self.lexer.consume()
-            return Atom(token.value)
-
-        if token.type == TokenType.NOT:
-            self.lexer.consume()
-            return Not(self._parse_wff())
-
-        if token.type == TokenType.LPAREN:
-            self.lexer.consume(TokenType.LPAREN)
-            left = self._parse_wff()
-            
-            op = self.lexer.consume()
-            right = self._parse_wff()
-            self.lexer.consume(TokenType.RPAREN)
-            
-            if op.type == TokenType.AND:
-                return And(left, right)
-            elif op.type == TokenType.OR:
-                return Or(left, right)
-            elif op.type == TokenType.IMPLIES:
-                return Implies(left, right)
-            elif op.type == TokenType.EQUIV:
-                return Equivalence(left, right)
-            else:
-                raise ValueError("Expected binary operator")
+class LexerGenerator(TokenStream):
+    """文字列をトークン列に分割する (tokens で Token のリストとしても参照できる)"""
+    def __init__(self, text:str):
+        self.symbol_map: dict[str, TokenType] = SYMBOL_MAP
+        self.pattern = TOKEN_PATTERN
+        super().__init__(text)
 
-        raise ValueError(f"Invalid formal token: {token.value}")
+    @property
+    def tokens(self) -> list[Token]:
+        return [Token(t, v) for t, v in zip(self.types, self.values)]
+
+    def tokenize(self, text:str) -> list[Token]:
+        stream = TokenStream(text)
+        return [Token(t, v) for t, v in zip(stream.types, stream.values)]
 
 
 class FormalParser:
     """公式な記号文のみをパースする"""
-    def __init__(self, lexer: LexerGenerator):
+    def __init__(self, lexer: TokenStream):
         self.lexer = lexer
 
     def parse(self) -> tree.Node:
         ast = self._parse_wff()
-        if self.lexer.peek() is not None:
+        if self.lexer.peek_type() is not None:
             raise ValueError("Extra tokens at end")
         return ast
 
     def _parse_wff(self) -> tree.Node:
-        from tree import Atom, Not, And, Or, Implies, Equivalence
-        
-        token = self.lexer.peek()
-        if token is None:
-            raise ValueError("Empty")
-
-        if token.type == TokenType.ATOM:
-            self.lexer.consume()
-            return Atom(token.value)
-
-        if token.type == TokenType.NOT:
-            self.lexer.consume()
-            return Not(self._parse_wff())
-
-        if token.type == TokenType.LPAREN:
-            self.lexer.consume(TokenType.LPAREN)
-            left = self._parse_wff()
-            
-            op = self.lexer.consume()
-            right = self._parse_wff()
-            self.lexer.consume(TokenType.RPAREN)
-            
-            if op.type == TokenType.AND:
-                return And(left, right)
-            elif op.type == TokenType.OR:
-                return Or(left, right)
-            elif op.type == TokenType.IMPLIES:
-                return Implies(left, right)
-            elif op.type == TokenType.EQUIV:
-                return Equivalence(left, right)
+        """記号文を1つパースする
+
+        再帰の代わりに、読みかけの構文をスタックに積む。
+        スタックの要素は _NOT (否定の途中)、_Bind (量化の途中)、_OPEN (括弧内の左辺の途中)、
+        または (左辺, 演算子) (括弧内の右辺の途中) のいずれか。
+        """
+        lexer = self.lexer
+        stack: list = []
+        while True:
+            # 記号文の先頭を読む
+            token_type = lexer.peek_type()
+            if token_type is None:
+                raise ValueError("Empty")
+
+            if token_type == TokenType.NOT:
+                lexer.advance()
+                stack.append(_NOT)
+                continue
+
+            if token_type == TokenType.LPAREN:
+                lexer.advance(TokenType.LPAREN)
+                stack.append(_OPEN)
+                continue
+
+            if token_type in QUANTIFIER_NODES:
+                stack.append(_read_quantifier(lexer))
+                continue
+
+            node: tree.Node
+            if token_type == TokenType.PREDICATE:
+                node = _read_predicate(lexer)
+            elif token_type == TokenType.ATOM:
+                node = tree.Atom(lexer.advance())
+            else:
+                raise ValueError(f"Invalid formal token: {lexer.values[lexer.pos]}")
+
+            # 読み終えた記号文を、読みかけの構文に渡していく
+            while stack:
+                frame = stack.pop()
+                if frame is _NOT:
+                    node = tree.Not(node)
+                elif isinstance(frame, _Bind):
+                    node = frame.node_type(frame.variable, node)
+                elif frame is _OPEN:
+                    # 左辺を読み終えたので演算子を読み、右辺へ進む
+                    op_type = lexer.peek_type()
+                    lexer.advance()
+                    stack.append((node, op_type))
+                    break
+                else:
+                    left, op_type = frame
+                    lexer.advance(TokenType.RPAREN)
+                    node_type = BINARY_NODES.get(op_type)
+                    if node_type is None:
+                        raise ValueError("Expected binary operator")
+                    node = node_type(left, node)
             else:
-                raise ValueError("Expected binary operator")
+                return node
+
 
-        raise ValueError(f"Invalid formal token: {token.value}")
+class StrictParser(FormalParser):
+    """FormalParser と同じ"""
 
 
 class InformalParser:
-    """非公式な記号文もパースする(優先度と左寄せ対応)"""
-    def __init__(self, lexer: LexerGenerator):
+    """非公式な記号文もパースする(優先度と左寄せ対応)
+
+    パースの途中で、入力がたまたま公式な記号文でもあったかを調べて is_formal に記録する。
+    公式な記号文であるのは、角括弧を使わず、丸括弧の内側にはちょうど1つ、
+    括弧の外側には1つも二項演算子が現れない場合である。
+
+    括弧で囲まれた部分は外側に依らずに読めるので、groups を渡すと、読み終えた括弧ごとに
+    開き括弧の位置 -> (閉じ括弧の次の位置, 括弧内の木, 括弧内が公式か) を記録する。
+    同じ位置の括弧が既に記録されていれば、読まずに記録した木を使う
+    (一部を書き換えたトークン列を読み直すとき、変わっていない括弧を読み飛ばせる)。
+    """
+    def __init__(self, lexer: TokenStream, groups: Optional[MutableMapping[int, tuple[int, tree.Node, bool]]] = None):
         self.lexer = lexer
+        self.groups = groups
         # 演算子の優先順位を定義 (値が大きいほど優先度が高い)
         self.precedence = {
             TokenType.EQUIV: 1,    # ↔ 最低優先度
@@ -198,115 +279,210 @@ class InformalParser:
             TokenType.OR: 2,       # ∨ 高優先度
             TokenType.AND: 2,      # ∧ 高優先度
         }
+        self.is_formal = True
+        # 括弧の深さごとの二項演算子の数 (先頭は括弧の外側)
+        self._group_ops: list[int] = []
+        # 読んでいる括弧ごとの (開き括弧の位置, 括弧の外側がそれまで公式だったか)
+        self._group_starts: list[tuple[int, bool]] = []
 
     def parse(self) -> tree.Node:
         """非公式な記号文をパースする"""
+        self.is_formal = True
+        self._group_ops = [0]
+        self._group_starts = []
         ast = self._parse_expr(0, None)
-        if self.lexer.peek() is not None:
+        if self.lexer.peek_type() is not None:
             raise ValueError("Extra tokens at end")
+        if self._group_ops.pop() != 0:
+            self.is_formal = False
         return ast
 
     def _parse_expr(self, min_precedence: int, last_op_type: Optional[TokenType] = None) -> tree.Node:
         """優先順位を考慮して式をパースする
         
+        再帰の代わりに、読みかけの構文をスタックに積む。スタックの要素は
+        _NOT (否定の途中)、_Bind (量化の途中)、閉じ括弧のトークン (括弧内の途中)、
+        または _Expr (二項演算子の列の途中) のいずれか。
+
         Args:
             min_precedence: この呼び出しで処理する最小の優先度
             last_op_type: 同じ優先度レベルで直前に使用された演算子の種類
                          (ANDとORの混在を防ぐため)
         """
-        from tree import Atom, Not, And, Or, Implies, Equivalence
-        
-        # 左辺をパース
-        left = self._parse_primary()
-        
-        # 二項演算子を処理
+        lexer = self.lexer
+        precedence_of = self.precedence
+        stack: list = [_Expr(min_precedence, last_op_type)]
         while True:
-            token = self.lexer.peek()
-            if token is None:
-                break
-            
-            # 閉じ括弧ならここで終了
-            if token.type in (TokenType.RPAREN, TokenType.RBRACKET):
+            # 一次式の先頭を読む
+            node = self._parse_primary_head(stack)
+            if node is None:
+                continue
+
+            # 読み終えた式を、読みかけの構文に渡していく
+            while stack:
+                frame = stack[-1]
+                if frame is _NOT:
+                    stack.pop()
+                    node = tree.Not(node)
+                    continue
+
+                if isinstance(frame, _Bind):
+                    stack.pop()
+                    node = frame.node_type(frame.variable, node)
+                    continue
+
+                if not isinstance(frame, _Expr):
+                    # 括弧内の式を読み終えた
+                    stack.pop()
+                    lexer.advance(frame)
+                    group_ops = self._group_ops.pop()
+                    if frame == TokenType.RBRACKET:
+                        # 角括弧は公式な記号文では使えない
+                        self.is_formal = False
+                    elif group_ops != 1:
+                        # 公式な記号文では括弧の内側にちょうど1つの二項演算子がある
+                        self.is_formal = False
+                    start, outer_formal = self._group_starts.pop()
+                    if self.groups is not None:
+                        self.groups[start] = (lexer.pos, node, self.is_formal)
+                    self.is_formal = outer_formal and self.is_formal
+                    continue
+
+                # 左辺または右辺を読み終えたので、ASTノードを構築する
+                if frame.op_type is None:
+                    frame.left = node
+                else:
+                    frame.left = BINARY_NODES[frame.op_type](frame.left, node)
+                    # 次のループのために演算子タイプを更新
+                    frame.last_op_type = frame.op_type
+                    frame.op_type = None
+
+                token_type = lexer.peek_type()
+                
+                # 入力の終わり・閉じ括弧など演算子でない場合、または優先度が低すぎる場合は終了
+                precedence = precedence_of.get(token_type)  # type: ignore[arg-type]
+                if precedence is None or precedence < frame.min_precedence:
+                    stack.pop()
+                    node = frame.left
+                    continue
+                
+                # 同じ優先度レベルで異なる演算子が混在していないかチェック
+                # ANDとORは同じ優先度(2)だが、混在してはいけない
+                if precedence == 2 and frame.last_op_type is not None:
+                    # 同じ優先度レベルで、前回と異なる演算子が来た場合
+                    if frame.last_op_type != token_type:
+                        # ANDとORの混在を検出
+                        if {frame.last_op_type, token_type} == {TokenType.AND, TokenType.OR}:
+                            raise ValueError(
+                                f"結合子∧と∨が同じ優先順位で同時に出現しています。括弧を使用してください。"
+                            )
+                
+                # 演算子を消費
+                lexer.advance()
+                self._group_ops[-1] += 1
+                frame.op_type = token_type
+                
+                # 左結合なので同じ優先度の演算子は precedence + 1 で右辺を読む
+                # ただし、同じ演算子タイプを渡して混在チェックができるようにする
+                if precedence == frame.min_precedence:
+                    # 同じ優先度レベルで続けている場合、演算子タイプを伝播
+                    stack.append(_Expr(precedence + 1, token_type))
+                else:
+                    # より高い優先度レベルに入る場合、演算子タイプをリセット
+                    stack.append(_Expr(precedence + 1, None))
                 break
-            
-            # 演算子でない、または優先度が低すぎる場合は終了
-            if token.type not in self.precedence:
-                break
-            
-            precedence = self.precedence[token.type]
-            if precedence < min_precedence:
-                break
-            
-            # 同じ優先度レベルで異なる演算子が混在していないかチェック
-            # ANDとORは同じ優先度(2)だが、混在してはいけない
-            if precedence == 2 and last_op_type is not None:
-                # 同じ優先度レベルで、前回と異なる演算子が来た場合
-                if last_op_type != token.type:
-                    # ANDとORの混在を検出
-                    if {last_op_type, token.type} == {TokenType.AND, TokenType.OR}:
-                        raise ValueError(
-                            f"結合子∧と∨が同じ優先順位で同時に出現しています。括弧を使用してください。"
-                        )
-            
-            # 演算子を消費
-            op = self.lexer.consume()
-            
-            # 左結合なので同じ優先度の演算子は precedence + 1 で再帰
-            # ただし、同じ演算子タイプを渡して混在チェックができるようにする
-            if precedence == min_precedence:
-                # 同じ優先度レベルで続けている場合、演算子タイプを伝播
-                right = self._parse_expr(precedence + 1, op.type)
             else:
-                # より高い優先度レベルに入る場合、演算子タイプをリセット
-                right = self._parse_expr(precedence + 1, None)
-            
-            # ASTノードを構築
-            if op.type == TokenType.AND:
-                left = And(left, right)
-            elif op.type == TokenType.OR:
-                left = Or(left, right)
-            elif op.type == TokenType.IMPLIES:
-                left = Implies(left, right)
-            elif op.type == TokenType.EQUIV:
-                left = Equivalence(left, right)
-            
-            # 次のループのために演算子タイプを更新
-            last_op_type = op.type
-        
-        return left
+                return node
 
-    def _parse_primary(self) -> tree.Node:
-        """一次式(原子文、否定、括弧で囲まれた式)をパースする"""
-        from tree import Atom, Not
-        
-        token = self.lexer.peek()
-        if token is None:
+    def _parse_primary_head(self, stack: list) -> Optional[tree.Node]:
+        """一次式(原子文、否定、量化、括弧で囲まれた式)の先頭のトークンを読む
+
+        原子文ならその節点を返す。否定・量化・括弧なら読みかけの構文をスタックに積んで None を返す。
+        """
+        lexer = self.lexer
+        token_type = lexer.peek_type()
+        if token_type is None:
             raise ValueError("Unexpected end of input")
         
         # 原子文
-        if token.type == TokenType.ATOM:
-            self.lexer.consume()
-            return Atom(token.value)
+        if token_type == TokenType.ATOM:
+            return tree.Atom(lexer.advance())
+
+        # 述語と項からなる原子式
+        if token_type == TokenType.PREDICATE:
+            return _read_predicate(lexer)
         
         # 否定
-        if token.type == TokenType.NOT:
-            self.lexer.consume()
-            return Not(self._parse_primary())
-        
-        # 括弧 ( )
-        if token.type == TokenType.LPAREN:
-            self.lexer.consume(TokenType.LPAREN)
-            # 括弧内は新しいスコープなので last_op_type をリセット
-            expr = self._parse_expr(0, None)
-            self.lexer.consume(TokenType.RPAREN)
-            return expr
+        if token_type == TokenType.NOT:
+            lexer.advance()
+            stack.append(_NOT)
+            return None
+
+        # 量化
+        if token_type in QUANTIFIER_NODES:
+            stack.append(_read_quantifier(lexer))
+            return None
         
-        # 角括弧 [ ]
-        if token.type == TokenType.LBRACKET:
-            self.lexer.consume(TokenType.LBRACKET)
+        # 括弧 ( ) と角括弧 [ ]
+        if token_type == TokenType.LPAREN or token_type == TokenType.LBRACKET:
+            if self.groups is not None and lexer.pos in self.groups:
+                # 記録済みの括弧は読み飛ばす
+                lexer.pos, node, formal = self.groups[lexer.pos]
+                self.is_formal = self.is_formal and formal
+                return node
+            self._group_starts.append((lexer.pos, self.is_formal))
+            self.is_formal = True
+            lexer.advance(token_type)
             # 括弧内は新しいスコープなので last_op_type をリセット
-            expr = self._parse_expr(0, None)
-            self.lexer.consume(TokenType.RBRACKET)
-            return expr
+            self._group_ops.append(0)
+            stack.append(TokenType.RPAREN if token_type == TokenType.LPAREN else TokenType.RBRACKET)
+            stack.append(_Expr(0, None))
+            return None
         
-        raise ValueError(f"Unexpected token: {token.value}")
+        raise ValueError(f"Unexpected token: {lexer.values[lexer.pos]}")
+
+
+# パーサのスタックに積む、否定の途中と括弧内の左辺の途中を表す印
+_NOT = object()
+_OPEN = object()
+
+
+class _Bind:
+    """パーサのスタックに積む、量化の途中 (量化子と変数を読み、作用域を読んでいる)"""
+    __slots__ = ("node_type", "variable")
+
+    def __init__(self, node_type: type, variable: str):
+        self.node_type = node_type
+        self.variable = variable
+
+
+def _read_quantifier(lexer: TokenStream) -> _Bind:
+    """量化子と変数を読む"""
+    node_type = QUANTIFIER_NODES[lexer.consume().type]
+    if lexer.peek_type() != TokenType.TERM:
+        raise ValueError("量化子の後には変数が必要です")
+    variable = lexer.advance()
+    if not tree.is_variable(variable):
+        raise ValueError(f"量化できるのは変数 ({tree.VARIABLES}) だけです: {variable}")
+    return _Bind(node_type, variable)
+
+
+def _read_predicate(lexer: TokenStream) -> tree.Node:
+    """述語とそれに続く項を読む"""
+    predicate = lexer.advance(TokenType.PREDICATE)
+    terms = []
+    while lexer.peek_type() == TokenType.TERM:
+        terms.append(lexer.advance())
+    return tree.Predicate(predicate, *terms)
+
+
+class _Expr:
+    """InformalParser で読みかけの二項演算子の列"""
+    __slots__ = ("min_precedence", "last_op_type", "left", "op_type")
+
+    def __init__(self, min_precedence: int, last_op_type: Optional[TokenType]):
+        self.min_precedence = min_precedence
+        self.last_op_type = last_op_type
+        self.left: Optional[tree.Node] = None
+        # 右辺を読んでいる途中の演算子 (左辺を読んでいる間は None)
+        self.op_type: Optional[TokenType] = None
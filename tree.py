@@ -1,17 +1,98 @@
+import threading
+import weakref
+from typing import Container, Iterator, Optional
+
+# 記号文の木の節点はすべて不変で、構造が同じ部分木は1つのオブジェクトを共有する。
+# (P->Q) を2回作っても同じオブジェクトが返るので、木は実際には共有された DAG になり、
+# 構造の比較は同一性の比較 (is) で済む。
+#
+# 機械生成された非常に深い記号文 (~~~~P や右に入れ子になった条件文) も扱えるように、
+# 木をたどる処理はすべて再帰を使わず明示的なスタックで行う。
+
+
+# 構造 -> 節点への弱参照 の表 (どこからも参照されなくなった節点は自動的に消える)
+_interned: dict = {}
+_intern_lock = threading.Lock()
+
+
+def _forget(ref: weakref.KeyedRef):
+    # 同じ構造の節点が作り直されている場合は消さない
+    if _interned.get(ref.key) is ref:
+        del _interned[ref.key]
+
+
 class Node:
-    def __init__(self):
+    __slots__ = ("_hash", "_atoms", "__weakref__")
+
+    def __init__(self, *args):
+        # 節点の中身は __new__ で設定する
         pass
-    
+
+    @classmethod
+    def _intern(cls, key: tuple, fields: dict) -> "Node":
+        """key と同じ構造の節点があればそれを、なければ fields で新しく作って返す"""
+        ref = _interned.get(key)
+        node = ref() if ref is not None else None
+        if node is None:
+            with _intern_lock:
+                ref = _interned.get(key)
+                node = ref() if ref is not None else None
+                if node is None:
+                    node = object.__new__(cls)
+                    for name, value in fields.items():
+                        object.__setattr__(node, name, value)
+                    object.__setattr__(node, "_hash", hash(key))
+                    _interned[key] = weakref.KeyedRef(node, _forget, key)
+        return node
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} は変更できません")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} は変更できません")
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    @property
+    def atoms(self) -> frozenset:
+        """部分木に含まれる原子文の集合 (最初に求めたときに節点に記録する)"""
+        try:
+            return self._atoms
+        except AttributeError:
+            pass
+        atoms: set = set()
+        seen: set = set()
+        stack: list = [self]
+        while stack:
+            node = stack.pop()
+            cached = getattr(node, "_atoms", None)
+            if cached is not None:
+                atoms |= cached
+            elif node not in seen:
+                seen.add(node)
+                if isinstance(node, Operator):
+                    stack.extend(node.args)
+        result = frozenset(atoms)
+        object.__setattr__(self, "_atoms", result)
+        return result
+
     def __repr__(self) -> str:
         raise NotImplementedError
-    
+
     def evaluate(self, env):
         raise NotImplementedError
 
 
 class Atom(Node):
-    def __init__(self, val):
-        self.value = val
+    __slots__ = ("value",)
+
+    def __new__(cls, val):
+        return cls._intern((cls, val), {"value": val, "_atoms": frozenset((val,))})
+
+    def __reduce__(self):
+        return (type(self), (self.value,))
+
     def __repr__(self) -> str:
         return f"{self.value}"
     def evaluate(self, env):
@@ -19,9 +100,15 @@ class Atom(Node):
 
 
 class Operator(Node):
-    def __init__(self, symbol, *args):
-        self.symbol = symbol
-        self.args = args
+    __slots__ = ("symbol", "args")
+
+    def __new__(cls, symbol, *args):
+        return cls._intern((cls, symbol) + args, {"symbol": symbol, "args": args})
+
+    def __reduce__(self):
+        if type(self) is Operator:
+            return (Operator, (self.symbol,) + self.args)
+        return (type(self), self.args)
 
     @property
     def left(self) -> Node:
@@ -34,59 +121,252 @@ class Operator(Node):
         return self.args[0]
 
     def __repr__(self):
-        if len(self.args) == 0:
-            return f"{self.symbol}"
-        if len(self.args) == 1:
-            return f"{self.symbol}{self.args[0]}"
-        if len(self.args) == 2:
-            return f"({self.args[0]}{self.symbol}{self.args[1]})"
-        else:
-            return f"({f' {self.symbol} '.join(map(str, self.args))})"
+        # 出力する文字列の断片と、これから展開する節点をスタックに積んで左から順に書き出す
+        parts = []
+        stack: list = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+            elif isinstance(item, Operator) and type(item).__repr__ is Operator.__repr__:
+                symbol, args = item.symbol, item.args
+                if len(args) == 0:
+                    stack.append(f"{symbol}")
+                elif len(args) == 1:
+                    stack += [args[0], f"{symbol}"]
+                elif len(args) == 2:
+                    stack += [")", args[1], f"{symbol}", args[0], "("]
+                else:
+                    stack.append(")")
+                    for idx in range(len(args) - 1, 0, -1):
+                        stack += [args[idx], f" {symbol} "]
+                    stack += [args[0], "("]
+            else:
+                parts.append(str(item))
+        return "".join(parts)
 
     def evaluate(self, env):
         return super().evaluate(env)
 
 
 class Not(Operator):
-    def __init__(self, child):
-        # "~","\u223C" 但しここでは"~"
-        super().__init__(chr(0x7E), child)
+    __slots__ = ()
+    # "~","\u223C" 但しここでは"~"
+    SYMBOL = chr(0x7E)
+
+    def __new__(cls, child):
+        return super().__new__(cls, cls.SYMBOL, child)
 
     def evaluate(self, env):
-        return not self.child.evaluate(env)
+        return _evaluate(self, env)
 
 
 class And(Operator):
-    def __init__(self, left, right):
-        # "∧","\u2227" 但しここでは"&"
-        super().__init__(chr(0x26), left, right)
+    __slots__ = ()
+    # "∧","\u2227" 但しここでは"&"
+    SYMBOL = chr(0x26)
+
+    def __new__(cls, left, right):
+        return super().__new__(cls, cls.SYMBOL, left, right)
 
     def evaluate(self, env):
-        return self.left.evaluate(env) and self.right.evaluate(env)
+        return _evaluate(self, env)
 
 
 class Or(Operator):
-    def __init__(self, left, right):
-        # "∨","\u2228" 但しここでは"|"
-        super().__init__(chr(0x7C), left, right)
-    
+    __slots__ = ()
+    # "∨","\u2228" 但しここでは"|"
+    SYMBOL = chr(0x7C)
+
+    def __new__(cls, left, right):
+        return super().__new__(cls, cls.SYMBOL, left, right)
+
     def evaluate(self, env):
-        return self.left.evaluate(env) or self.right.evaluate(env)
+        return _evaluate(self, env)
 
 
 class Implies(Operator):
-    def __init__(self, left, right):
-        # "\u2192" 但しここでは"->"
-        super().__init__(chr(0x2D)+chr(0x3E), left, right)
+    __slots__ = ()
+    # "\u2192" 但しここでは"->"
+    SYMBOL = chr(0x2D)+chr(0x3E)
+
+    def __new__(cls, left, right):
+        return super().__new__(cls, cls.SYMBOL, left, right)
 
     def evaluate(self, env):
-        return (not self.left.evaluate(env)) or self.right.evaluate(env)
+        return _evaluate(self, env)
 
 
 class Equivalence(Operator):
-    def __init__(self, left, right):
-        # "\u2194" 但しここでは"<->"
-        super().__init__(chr(0x3C)+chr(0x2D)+chr(0x3E), left, right)
+    __slots__ = ()
+    # "\u2194" 但しここでは"<->"
+    SYMBOL = chr(0x3C)+chr(0x2D)+chr(0x3E)
+
+    def __new__(cls, left, right):
+        return super().__new__(cls, cls.SYMBOL, left, right)
+
+    def evaluate(self, env):
+        return _evaluate(self, env)
+
+
+
+# 述語論理の語彙
+#   述語:   A, B, ..., O (下付き添字 A_1 なども可) の後に1つ以上の項を並べる (Fa, Gxy)
+#   項:     変数 u, v, ..., z と、個体定項 a, b, ..., t (下付き添字も可)
+#   量化子: ∀x (全称), ∃x (存在)。否定と同じく直後の記号文1つにかかる
+VARIABLES = "uvwxyz"
+
+
+def is_variable(term: str) -> bool:
+    """項が変数 (u-z) か"""
+    return term[0] in VARIABLES
+
+
+class Predicate(Atom):
+    """述語に項を並べた原子式 (value は Fab のような表記そのもの)"""
+    __slots__ = ("predicate", "terms")
+
+    def __new__(cls, predicate, *terms):
+        if not terms:
+            raise ValueError(f"述語 {predicate} の後には項が必要です")
+        value = predicate + "".join(terms)
+        return cls._intern((cls, predicate) + terms, {
+            "value": value, "predicate": predicate, "terms": terms, "_atoms": frozenset((value,)),
+        })
+
+    def __reduce__(self):
+        return (type(self), (self.predicate,) + self.terms)
+
+
+class Quantifier(Operator):
+    """量化子 (symbol は量化子の記号と変数をつなげたもの)"""
+    __slots__ = ()
+    SYMBOL = ""
+
+    def __new__(cls, variable, body):
+        return super().__new__(cls, cls.SYMBOL + variable, body)
+
+    def __reduce__(self):
+        return (type(self), (self.variable, self.child))
+
+    @property
+    def variable(self) -> str:
+        return self.symbol[len(self.SYMBOL):]
 
     def evaluate(self, env):
-        return self.left.evaluate(env) == self.right.evaluate(env)
+        raise ValueError("量化子を含む記号文は、文記号の真偽値だけでは評価できません")
+
+
+class Universal(Quantifier):
+    __slots__ = ()
+    # "∀","\u2200"
+    SYMBOL = chr(0x2200)
+
+
+class Existential(Quantifier):
+    __slots__ = ()
+    # "∃","\u2203"
+    SYMBOL = chr(0x2203)
+
+
+def has_quantifier(node: Node) -> bool:
+    """記号文が量化子を含むか"""
+    return any(isinstance(n, Quantifier) for n in postorder(node))
+
+def _evaluate(root: Node, env) -> object:
+    """記号文を明示的なスタックで評価する
+
+    各結合子は Python の not / and / or / == と同じく短絡評価し、同じ値を返す。
+    スタックの各要素は (節点, 結合子の種類, 状態, 左辺の値) で、
+    状態 1 は最初の引数を、状態 2 は右辺を評価している途中であることを表す。
+    """
+    kinds = _CONNECTIVE_KINDS
+    stack: list = []
+    push = stack.append
+    pop = stack.pop
+    node = root
+    while True:
+        # 最初の引数をたどって葉まで降りる
+        while True:
+            node_type = type(node)
+            if node_type is Atom:
+                value = env[node.value]
+                break
+            kind = kinds.get(node_type, False)
+            if kind is False:
+                kind = _connective(node_type)
+            if kind is Atom:
+                value = env[node.value]
+                break
+            if kind is None:
+                # 独自の評価方法を持つ節点
+                value = node.evaluate(env)
+                break
+            push((node, kind, 1, None))
+            node = node.args[0]
+
+        # 値を親に渡しながら、右辺を評価する必要がある節点まで戻る
+        while stack:
+            node, kind, state, saved = pop()
+            if state == 2:
+                if kind is Equivalence:
+                    value = saved == value
+                # And / Or / Implies は右辺の値がそのまま結果になる
+                continue
+            if kind is Not:
+                value = not value
+                continue
+            if kind is And:
+                if not value:
+                    continue
+            elif kind is Or:
+                if value:
+                    continue
+            elif kind is Implies:
+                if not value:
+                    value = True
+                    continue
+            push((node, kind, 2, value))
+            node = node.args[1]
+            break
+        else:
+            return value
+
+
+# 節点のクラス -> 評価方法が同じ基本のクラス (独自の evaluate を持つなら None)
+_CONNECTIVE_KINDS: dict = {}
+
+
+def _connective(node_type: type) -> Optional[type]:
+    kind = _CONNECTIVE_KINDS.get(node_type, False)
+    if kind is False:
+        kind = None
+        for base in (Atom, Not, And, Or, Implies, Equivalence):
+            if issubclass(node_type, base) and node_type.evaluate is base.evaluate:
+                kind = base
+                break
+        _CONNECTIVE_KINDS[node_type] = kind
+    return kind
+
+
+def postorder(root: Node, done: Optional[Container] = None) -> Iterator[Node]:
+    """部分木の節点を子が親より先になる順に1度ずつ返す
+
+    Args:
+        root: たどる木の根
+        done: 処理済みの節点の集まり。ここに含まれる節点とその子孫はたどらない
+    """
+    seen: set = set()
+    stack: list = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield node
+            continue
+        if node in seen or (done is not None and node in done):
+            continue
+        seen.add(node)
+        stack.append((node, True))
+        if isinstance(node, Operator):
+            for arg in reversed(node.args):
+                stack.append((arg, False))
@@ -0,0 +1,115 @@
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Union, overload
+
+import columns
+
+# 真偽値表を行の辞書のリストとして持たず、各前提と結論の列 (多倍長整数のビット列) だけを持つ。
+# 行は添字から必要になったときに作る。原子文の真偽値は行番号のビットそのものなので保持しない。
+
+
+class TruthTableRow(Mapping):
+    """真偽値表の1行 (辞書と同じく row[原子文], row["premise_0"], row["conclusion"] で引ける)"""
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "TruthTable", index: int):
+        self._table = table
+        self._index = index
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    def __getitem__(self, key: str) -> bool:
+        table = self._table
+        position = table._atom_positions.get(key)
+        if position is not None:
+            return bool((self._index >> (len(table.atoms) - 1 - position)) & 1)
+        column = table._columns.get(key)
+        if column is None:
+            raise KeyError(key)
+        return bool((column >> self._index) & 1)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table.keys)
+
+    def __len__(self) -> int:
+        return len(self._table.keys)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class TruthTable(Sequence):
+    """列から行を必要なときに作る真偽値表
+
+    行の並びと各行のキーは、従来の generate_truth_table の辞書のリストと同じ。
+
+    Args:
+        atoms: ソート済みの原子文
+        premise_columns: 各前提の列
+        conclusion_column: 結論の列
+    """
+    def __init__(self, atoms: List[str], premise_columns: List[int], conclusion_column: int):
+        self.atoms = list(atoms)
+        self.premise_columns = list(premise_columns)
+        self.conclusion_column = conclusion_column
+        self.keys = self.atoms + [f"premise_{idx}" for idx in range(len(premise_columns))] + ["conclusion"]
+        self._atom_positions = {atom: j for j, atom in enumerate(self.atoms)}
+        self._columns: Dict[str, int] = {
+            f"premise_{idx}": column for idx, column in enumerate(premise_columns)
+        }
+        self._columns["conclusion"] = conclusion_column
+        self._length = 1 << len(self.atoms)
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> TruthTableRow: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[TruthTableRow]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[TruthTableRow, List[TruthTableRow]]:
+        if isinstance(index, slice):
+            return [TruthTableRow(self, i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("真偽値表の行番号が範囲外です")
+        return TruthTableRow(self, index)
+
+    def __iter__(self) -> Iterator[TruthTableRow]:
+        for i in range(self._length):
+            yield TruthTableRow(self, i)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, TruthTable):
+            return (self.atoms, self.premise_columns, self.conclusion_column) == \
+                (other.atoms, other.premise_columns, other.conclusion_column)
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"TruthTable(atoms={self.atoms!r}, premises={len(self.premise_columns)}, rows={self._length})"
+
+    def page(self, number: int, size: int = 50) -> List[TruthTableRow]:
+        """number 番目 (0 始まり) のページの行を返す"""
+        if number < 0 or size <= 0:
+            raise ValueError("ページの番号は0以上、大きさは1以上で指定してください")
+        return self[number * size:(number + 1) * size]
+
+    def page_count(self, size: int = 50) -> int:
+        return -(-self._length // size)
+
+    def counterexample_column(self) -> int:
+        """全ての前提が真かつ結論が偽である行のビットが立った列"""
+        bad = self.conclusion_column ^ columns.table_mask(len(self.atoms))
+        for column in self.premise_columns:
+            bad &= column
+        return bad
+
+    def to_list(self) -> List[Dict[str, bool]]:
+        """従来の形式 (行の辞書のリスト) に変換する"""
+        return [dict(row) for row in self]